@@ -0,0 +1,159 @@
+import datetime as dt
+import json
+import logging
+import math
+from typing import Iterable
+
+from App.extensions import db
+from App.location_store import Ping, location_store, to_timestamp
+from App.models import Driver, DriverPing
+from App.utils.geo import validate_point
+from .stop import detect_arrivals
+
+logger = logging.getLogger(__name__)
+
+MAX_PINGS_PER_BATCH = 10000
+DEFAULT_REPLAY_LIMIT = 1000
+MAX_REPLAY_LIMIT = 10000
+
+'''
+CREATE
+'''
+def parse_ping(data, driver_id: int | None = None) -> Ping:
+    """
+    One ping from a decoded NDJSON line: {"driverId", "ts", "lat", "lon", "speed"}.
+    'ts' is epoch seconds or an ISO datetime (naive means UTC); 'speed' (m/s) is optional.
+    With driver_id given, 'driverId' may be left out but must match when present.
+    Raises ValueError on bad input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+
+    reported = data.get('driverId', driver_id)
+    if isinstance(reported, bool) or not isinstance(reported, int):
+        raise ValueError("'driverId' must be a driver id")
+    if driver_id is not None and reported != driver_id:
+        raise ValueError("'driverId' does not match the reporting driver")
+
+    ts = data.get('ts')
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        ts = float(ts)
+    elif isinstance(ts, str):
+        try:
+            ts = to_timestamp(dt.datetime.fromisoformat(ts))
+        except ValueError:
+            raise ValueError("'ts' must be epoch seconds or an ISO datetime")
+    else:
+        raise ValueError("'ts' must be epoch seconds or an ISO datetime")
+    if not math.isfinite(ts):
+        raise ValueError("'ts' must be epoch seconds or an ISO datetime")
+    ts = round(ts, 6)  # stored with microsecond precision
+
+    latitude, longitude = validate_point(data.get('lat'), data.get('lon'))
+
+    speed = data.get('speed')
+    if speed is not None:
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 <= speed < math.inf:
+            raise ValueError("'speed' must be a non-negative number (m/s)")
+        speed = float(speed)
+
+    return Ping(reported, ts, latitude, longitude, speed)
+
+def ingest_pings(lines: Iterable[bytes | str], driver_id: int | None = None) -> dict:
+    """
+    Buffer a batch of NDJSON pings in the location store, flushing it to driver_pings
+    when it is due, and record arrivals at stops whose geofence a ping enters.
+    Lines that fail to parse, or name an unknown driver, are skipped and reported
+    as {'line': n, 'error': ...}. One query checks the batch's driver ids.
+    Raises ValueError when the batch is larger than MAX_PINGS_PER_BATCH.
+    """
+    pings: list[tuple[int, Ping]] = []
+    rejected = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        if len(pings) + len(rejected) >= MAX_PINGS_PER_BATCH:
+            raise ValueError(f"A batch holds at most {MAX_PINGS_PER_BATCH} pings")
+        try:
+            pings.append((number, parse_ping(json.loads(line), driver_id)))
+        except ValueError as e:  # json.JSONDecodeError included
+            rejected.append({'line': number, 'error': str(e)})
+
+    ids = {ping.driver_id for _, ping in pings}
+    known = set(db.session.execute(db.select(Driver.id).where(Driver.id.in_(ids))).scalars()) if ids else set()
+
+    accepted = []
+    for number, ping in pings:
+        if ping.driver_id in known:
+            accepted.append(ping)
+        else:
+            rejected.append({'line': number, 'error': f"Driver {ping.driver_id} not found"})
+
+    location_store.record(accepted)
+    arrived = detect_arrivals(accepted)
+    if location_store.flush_due():
+        try:
+            location_store.flush()
+        except Exception:
+            # The pings are buffered (and kept for the next flush); failing the batch would only get it resent
+            logger.exception("Failed to write buffered pings")
+
+    rejected.sort(key=lambda item: item['line'])
+    return {'accepted': len(accepted), 'rejected': rejected, 'arrivals': arrived}
+
+'''
+GET
+'''
+def get_latest_ping(driver_id: int) -> Ping | None:
+    """
+    The driver's newest position: the newer of this process's latest ping and the newest
+    driver_pings row (one indexed lookup), so pings taken in by another worker count too.
+    """
+    row = db.session.execute(
+        db.select(DriverPing.recorded_at, DriverPing.latitude, DriverPing.longitude, DriverPing.speed)
+        .where(DriverPing.driver_id == driver_id)
+        .order_by(DriverPing.recorded_at.desc())
+        .limit(1)
+    ).first()
+    stored = Ping(driver_id, to_timestamp(row.recorded_at), row.latitude, row.longitude, row.speed) if row else None
+    buffered = location_store.latest(driver_id)
+    if stored is None or (buffered is not None and buffered.ts >= stored.ts):
+        return buffered
+    return stored
+
+def get_driver_pings(
+    driver_id: int,
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    limit: int = DEFAULT_REPLAY_LIMIT
+) -> list[Ping]:
+    """
+    Replay a driver's track in [start, end), oldest first, at most 'limit' pings:
+    driver_pings rows plus pings this process has not flushed yet.
+    """
+    stmt = (
+        db.select(DriverPing.recorded_at, DriverPing.latitude, DriverPing.longitude, DriverPing.speed)
+        .where(DriverPing.driver_id == driver_id)
+        .order_by(DriverPing.recorded_at, DriverPing.id)
+        .limit(limit)
+    )
+    if start is not None:
+        stmt = stmt.where(DriverPing.recorded_at >= start)
+    if end is not None:
+        stmt = stmt.where(DriverPing.recorded_at < end)
+
+    stored = [
+        Ping(driver_id, to_timestamp(recorded_at), latitude, longitude, speed)
+        for recorded_at, latitude, longitude, speed in db.session.execute(stmt)
+    ]
+
+    # A batch that committed while we read can show up in both; keep one copy
+    seen = set(stored)
+    buffered = location_store.unflushed(
+        driver_id,
+        to_timestamp(start) if start is not None else -math.inf,
+        to_timestamp(end) if end is not None else math.inf
+    )
+    merged = stored + [ping for ping in buffered if ping not in seen]
+    merged.sort(key=lambda ping: ping.ts)
+    return merged[:limit]
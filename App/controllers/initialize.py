@@ -11,8 +11,15 @@ def initialize():
     db.drop_all()
     db.create_all()
 
-    streets_str = ['Randy Street', 'Author Street', 'Murray Drive', 'Charles Avenue', 'Murray St.']
-    streets = [create_street(street) for street in streets_str]
+    # (name, latitude, longitude)
+    streets_geo = [
+        ('Randy Street', 10.6549, -61.4894),
+        ('Author Street', 10.6571, -61.4852),
+        ('Murray Drive', 10.6512, -61.4931),
+        ('Charles Avenue', 10.6603, -61.4978),
+        ('Murray St.', 10.6489, -61.5012),
+    ]
+    streets = [create_street(name, latitude, longitude) for name, latitude, longitude in streets_geo]
 
     driver_1 = create_driver('bob', 'bobpass', 'Bob', 'Swagger')
     driver_2 = create_driver('tuck', 'tuckpass', 'Tucker', 'Moore')
@@ -1,10 +1,33 @@
 from typing import List, Optional
 from App.extensions import db
-from App.models.notification import Notification
+from App.models.notification import (
+    Notification,
+    JSON_COLUMNS,
+    SEARCH_TABLE,
+    SEARCH_VECTOR_SQL,
+    SQLITE_SEARCH_DDL,
+    POSTGRES_SEARCH_DDL,
+    merge_newest,
+    serialize_notifications
+)
+from App.models.notification_receipt import NotificationReceipt
+from App.models.inbox_entry import InboxEntry
+from App.models.outbox_message import OutboxMessage
+from App.models.notification_counter import NotificationCounter, SCOPE_GLOBAL, SCOPE_STREET, SCOPE_TYPE, SCOPE_USER
 from App.models.street import Street
-from App.models.user import User
+from App.models.user import User, Resident
 from App.models.enums import NotificationType, NotificationCategory, NotificationPriority
+from App.notification_writer import notification_writer
+from App.inbox_fanout import inbox_fanout
 import datetime as dt
+import re
+import time
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class SearchNotSupported(Exception):
+    """Full-text search is not available on this database backend"""
 
 '''
 CREATE
@@ -12,17 +35,21 @@ CREATE
 def create_notification(
     message: str,
     notification_type: NotificationType,
-    street: Street | None = None,
+    street: Street | str | None = None,
     title: str | None = None,
     recipient: User | None = None,
     category: NotificationCategory | None = None,
     priority: NotificationPriority | None = None,
-    expires_in_hours: int | None = None
+    expires_in_hours: int | None = None,
+    commit: bool = True
 ) -> Notification:
     """
     Persist and return a Notification object with enhanced features.
     Maintains backward compatibility with old signature.
-    Note: expires_in_hours parameter is deprecated and ignored.
+    Notifications created with expires_in_hours disappear from reads once
+    expired and are deleted by purge_expired_notifications().
+    With commit=False the notification is buffered by the notification writer
+    and written when the caller's transaction commits (its id is unset until then).
     """
     # Generate title if not provided (backward compatibility)
     if title is None:
@@ -35,10 +62,12 @@ def create_notification(
         recipient=recipient,
         street=street,
         category=category,
-        priority=priority
+        priority=priority,
+        expires_in_hours=expires_in_hours
     )
-    db.session.add(notif)
-    db.session.commit()
+    notification_writer.add(notif)
+    if commit:
+        db.session.commit()
     return notif
 
 
@@ -49,7 +78,8 @@ def create_user_notification(
     notification_type: NotificationType = NotificationType.SYSTEM,
     category: NotificationCategory = NotificationCategory.GENERAL,
     priority: NotificationPriority = NotificationPriority.NORMAL,
-    expires_in_hours: int | None = None
+    expires_in_hours: int | None = None,
+    commit: bool = True
 ) -> Notification:
     """
     Create a notification for a specific user.
@@ -61,21 +91,23 @@ def create_user_notification(
         recipient=recipient,
         category=category,
         priority=priority,
-        expires_in_hours=expires_in_hours
+        expires_in_hours=expires_in_hours,
+        commit=commit
     )
 
 
 def create_street_notification(
     title: str,
     message: str,
-    street: Street,
+    street: Street | str,
     notification_type: NotificationType = NotificationType.SCHEDULE,
     category: NotificationCategory = NotificationCategory.SCHEDULE,
     priority: NotificationPriority = NotificationPriority.NORMAL,
-    expires_in_hours: int | None = 168  # 1 week default
+    expires_in_hours: int | None = 168,  # 1 week default
+    commit: bool = True
 ) -> Notification:
     """
-    Create a notification for all residents of a street.
+    Create a notification for all residents of a street (a Street or its name).
     """
     return create_notification(
         title=title,
@@ -84,7 +116,8 @@ def create_street_notification(
         street=street,
         category=category,
         priority=priority,
-        expires_in_hours=expires_in_hours
+        expires_in_hours=expires_in_hours,
+        commit=commit
     )
 
 
@@ -93,7 +126,8 @@ def create_system_notification(
     message: str,
     category: NotificationCategory = NotificationCategory.SYSTEM,
     priority: NotificationPriority = NotificationPriority.HIGH,
-    expires_in_hours: int | None = 24  # 1 day default
+    expires_in_hours: int | None = 24,  # 1 day default
+    commit: bool = True
 ) -> Notification:
     """
     Create a system-wide notification for all users.
@@ -104,7 +138,8 @@ def create_system_notification(
         notification_type=NotificationType.SYSTEM,
         category=category,
         priority=priority,
-        expires_in_hours=expires_in_hours
+        expires_in_hours=expires_in_hours,
+        commit=commit
     )
 
 
@@ -135,6 +170,8 @@ def get_notifications_by_street(street: Street, include_expired: bool = True) ->
     """
     stmt = db.select(Notification).where(Notification.street_name == street.name)
 
+    if not include_expired:
+        stmt = stmt.where(Notification.not_expired())
 
     stmt = stmt.order_by(Notification.created_at.desc())
     return list(db.session.execute(stmt).scalars().all())
@@ -161,113 +198,524 @@ def get_notifications_by_type(
     if street:
         conditions.append(Notification.street_name == street.name)
 
+    if not include_expired:
+        conditions.append(Notification.not_expired())
+
     stmt = db.select(Notification).where(db.and_(*conditions))
     stmt = stmt.order_by(Notification.created_at.desc())
     return list(db.session.execute(stmt).scalars().all())
 
 
+def _shared_conditions(user: User):
+    """
+    Predicates for the shared notifications a user can see:
+    global broadcasts and (for residents) their street.
+    """
+    # Global broadcasts carry neither a recipient nor a street
+    conditions = [
+        db.and_(
+            Notification.is_global == True,
+            Notification.street_name.is_(None)
+        )
+    ]
+
+    # Add street-specific notifications for residents
+    if hasattr(user, 'street_name') and user.street_name:
+        conditions.append(
+            db.and_(
+                Notification.street_name == user.street_name,
+                Notification.recipient_id.is_(None)
+            )
+        )
+
+    return conditions
+
+
+def _visibility_conditions(user: User, include_global: bool = True):
+    """
+    Build the OR'ed predicates for notifications a user can see:
+    direct messages, global broadcasts and (for residents) their street.
+    """
+    conditions = [Notification.recipient_id == user.id]
+
+    if include_global:
+        conditions.extend(_shared_conditions(user))
+
+    return conditions
+
+
+def _read_by(user: User):
+    """Correlated EXISTS against the (user_id, notification_id) receipt primary key"""
+    return (
+        db.select(NotificationReceipt.notification_id)
+        .where(
+            NotificationReceipt.user_id == user.id,
+            NotificationReceipt.notification_id == Notification.id
+        )
+        .exists()
+    )
+
+
 def get_notifications_by_user(
     user: User,
     include_global: bool = True,
     unread_only: bool = False,
-    limit: int = 50
+    limit: int = 50,
+    after: Optional[tuple[dt.datetime, int]] = None
 ) -> List[Notification]:
     """
     Get notifications for a specific user including global and street-specific ones.
+    Pass the (created_at, id) of the last row seen as 'after' to fetch the next page.
+    Each visibility condition is its own indexed top-N branch (see merge_newest).
     """
-    conditions = [Notification.recipient_id == user.id]
+    branches = []
+    for condition in _visibility_conditions(user, include_global):
+        branch = db.select(Notification.id, Notification.created_at).where(condition, Notification.not_expired())
+
+        # Filter by this user's read receipts, not the shared row flag
+        if unread_only:
+            branch = branch.where(~_read_by(user))
+        branches.append(branch)
+
+    newest = merge_newest(branches, limit=limit, after=after)
+    stmt = (
+        db.select(Notification)
+        .join(newest, Notification.id == newest.c.id)
+        .order_by(newest.c.created_at.desc(), newest.c.id.desc())
+    )
+    return list(db.session.execute(stmt).scalars().all())
 
-    # Include global notifications if requested
-    if include_global:
-        global_conditions = [Notification.is_global == True]
 
-        # Add street-specific global notifications for residents
+def get_unread_count(user: User, include_global: bool = True) -> int:
+    """
+    Get count of unread notifications for a user from the maintained counters:
+    direct + global + street totals minus the user's own reads (one primary-key lookup),
+    minus the unread notifications that have expired but are not purged yet (a range
+    scan of the expiry index, kept short by purge_expired_notifications).
+    """
+    user_scope = (SCOPE_USER, str(user.id))
+    scopes = [user_scope]
+
+    if include_global:
+        scopes.append((SCOPE_GLOBAL, ''))
         if hasattr(user, 'street_name') and user.street_name:
-            global_conditions.append(
-                db.and_(
-                    Notification.street_name == user.street_name,
-                    Notification.recipient_id.is_(None)
-                )
-            )
+            scopes.append((SCOPE_STREET, user.street_name))
 
-        conditions.append(db.or_(*global_conditions))
+    counters = NotificationCounter.get_counters(scopes)
+    user_counter = counters.get(user_scope)
 
-    stmt = db.select(Notification).where(db.or_(*conditions))
+    count = (user_counter.total - user_counter.read) if user_counter else 0
+    if include_global:
+        count += sum(counters[scope].total for scope in scopes[1:] if scope in counters)
+        count -= user_counter.shared_read if user_counter else 0
+
+    # Counters only shrink when expired rows are purged; until then they are hidden from reads
+    count -= db.session.scalar(
+        db.select(db.func.count(Notification.id)).where(
+            Notification.expires_at <= dt.datetime.utcnow(),
+            db.or_(*_visibility_conditions(user, include_global)),
+            ~_read_by(user)
+        )
+    ) or 0
 
-    # Filter by read status
-    if unread_only:
-        stmt = stmt.where(Notification.is_read == False)
+    return max(count, 0)
 
-    # Note: Expiration logic has been removed
 
-    stmt = stmt.order_by(Notification.created_at.desc()).limit(limit)
-    return list(db.session.execute(stmt).scalars().all())
+def recount_notification_counters() -> int:
+    """
+    Rebuild every maintained notification count from scratch (versions are kept).
+    Returns the number of counter rows written.
+    """
+    totals: dict[tuple[str, str], dict[str, int]] = {}
 
+    def add(scope: tuple[str, str], column: str, value: int) -> None:
+        totals.setdefault(scope, {'total': 0, 'read': 0, 'shared_read': 0})[column] = value
 
-def get_unread_count(user: User, include_global: bool = True) -> int:
-    """Get count of unread notifications for a user"""
-    # Start with user-specific unread notifications
-    user_conditions = db.and_(
-        Notification.recipient_id == user.id,
-        Notification.is_read == False
+    # Scope totals: one grouped query per scope kind
+    global_total = db.session.scalar(
+        db.select(db.func.count(Notification.id)).where(
+            Notification.recipient_id.is_(None),
+            Notification.street_name.is_(None)
+        )
+    )
+    add((SCOPE_GLOBAL, ''), 'total', global_total or 0)
+
+    street_totals = db.select(Notification.street_name, db.func.count(Notification.id)).where(
+        Notification.recipient_id.is_(None),
+        Notification.street_name.is_not(None)
+    ).group_by(Notification.street_name)
+    for street_name, total in db.session.execute(street_totals):
+        add((SCOPE_STREET, street_name), 'total', total)
+
+    type_totals = db.select(Notification.type, db.func.count(Notification.id)).group_by(Notification.type)
+    for notification_type, total in db.session.execute(type_totals):
+        add((SCOPE_TYPE, notification_type), 'total', total)
+
+    direct_totals = db.select(Notification.recipient_id, db.func.count(Notification.id)).where(
+        Notification.recipient_id.is_not(None)
+    ).group_by(Notification.recipient_id)
+    for recipient_id, total in db.session.execute(direct_totals):
+        add((SCOPE_USER, str(recipient_id)), 'total', total)
+
+    # Per-user reads, split into direct and shared receipts
+    direct_reads = (
+        db.select(NotificationReceipt.user_id, db.func.count())
+        .join(Notification, Notification.id == NotificationReceipt.notification_id)
+        .where(Notification.recipient_id == NotificationReceipt.user_id)
+        .group_by(NotificationReceipt.user_id)
     )
+    for user_id, read in db.session.execute(direct_reads):
+        add((SCOPE_USER, str(user_id)), 'read', read)
 
-    all_conditions = [user_conditions]
+    resident_street = (
+        db.select(Resident.street_name)
+        .where(Resident.id == NotificationReceipt.user_id)
+        .scalar_subquery()
+    )
+    shared_reads = (
+        db.select(NotificationReceipt.user_id, db.func.count())
+        .join(Notification, Notification.id == NotificationReceipt.notification_id)
+        .where(
+            Notification.recipient_id.is_(None),
+            db.or_(
+                Notification.street_name.is_(None),
+                Notification.street_name == resident_street
+            )
+        )
+        .group_by(NotificationReceipt.user_id)
+    )
+    for user_id, shared_read in db.session.execute(shared_reads):
+        add((SCOPE_USER, str(user_id)), 'shared_read', shared_read)
+
+    try:
+        db.session.execute(
+            db.update(NotificationCounter)
+            .values(total=0, read=0, shared_read=0)
+            .execution_options(synchronize_session=False)
+        )
+        existing = set(NotificationCounter.get_versions(totals.keys()))
+        for (scope, key), counts in totals.items():
+            if (scope, key) in existing:
+                db.session.execute(
+                    db.update(NotificationCounter)
+                    .where(NotificationCounter.scope == scope, NotificationCounter.key == key)
+                    .values(**counts)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                db.session.add(NotificationCounter(scope=scope, key=key, **counts))
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
 
-    # Include global notifications if requested
-    if include_global:
-        global_conditions = db.and_(
-            Notification.is_global == True,
-            Notification.is_read == False
+    return len(totals)
+
+
+def get_sync_position(user: Optional[User] = None) -> tuple[dt.datetime, int]:
+    """
+    Current (synced_at, last_id) position for incremental inbox sync.
+    Taken before reading so that concurrent writes are re-sent rather than missed.
+    With materialized inboxes last_id is the newest entry already fanned out to
+    the user, so notifications still waiting for fan-out are picked up next sync.
+    """
+    synced_at = dt.datetime.utcnow()
+    if user is not None and inbox_fanout.materialized:
+        last_id = db.session.scalar(
+            db.select(db.func.max(InboxEntry.notification_id)).where(InboxEntry.user_id == user.id)
+        ) or 0
+    else:
+        last_id = db.session.scalar(db.select(db.func.max(Notification.id))) or 0
+    return synced_at, last_id
+
+
+def search_notifications(
+    query: str,
+    user: Optional[User] = None,
+    notification_type: NotificationType | str | None = None,
+    street_name: Optional[str] = None,
+    start: Optional[dt.datetime] = None,
+    end: Optional[dt.datetime] = None,
+    limit: int = 50,
+    after: Optional[tuple[float, int]] = None
+) -> list[dict]:
+    """
+    Ranked full-text search over notification titles and messages (best match first).
+    Each result is the get_json() shape plus 'rank' (lower is better); pass the
+    (rank, id) of the last result as 'after' to fetch the next page.
+    With a user, only notifications that user can see are searched.
+    start is inclusive and end exclusive (on created_at).
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+
+        # Quote every term so user input never reaches the FTS5 query syntax
+        fts = table(SEARCH_TABLE, column('rowid'))
+        fts_query = ' '.join(f'"{term}"' for term in terms)
+        rank = func.bm25(literal_column(SEARCH_TABLE), 10.0, 1.0)  # title matches weigh more
+        stmt = (
+            db.select(*JSON_COLUMNS, rank.label('rank'))
+            .select_from(fts)
+            .join(Notification, Notification.id == fts.c.rowid)
+            .where(literal_column(SEARCH_TABLE).op('MATCH')(fts_query))
         )
-        all_conditions.append(global_conditions)
+    elif dialect == 'postgresql':
+        if not query.strip():
+            return []
+
+        vector = literal_column(SEARCH_VECTOR_SQL)
+        ts_query = func.websearch_to_tsquery(literal_column("'english'"), query)
+        rank = -func.ts_rank_cd(vector, ts_query)
+        stmt = db.select(*JSON_COLUMNS, rank.label('rank')).where(vector.op('@@')(ts_query))
+    else:
+        raise SearchNotSupported(f"Full-text search is not supported on '{dialect}'")
+
+    if user is not None:
+        conditions = _visibility_conditions(user)
+        if user.type == 'driver':
+            conditions.append(Notification.type.in_([NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value]))
+        stmt = stmt.where(db.or_(*conditions))
+
+    if notification_type:
+        stmt = stmt.where(Notification.type == getattr(notification_type, 'value', notification_type))
+    if street_name:
+        stmt = stmt.where(Notification.street_name == street_name)
+    if start:
+        stmt = stmt.where(Notification.created_at >= start)
+    if end:
+        stmt = stmt.where(Notification.created_at < end)
+    if after is not None:
+        stmt = stmt.where(db.tuple_(rank, Notification.id) > db.tuple_(*after))
+
+    rows = db.session.execute(stmt.order_by(rank, Notification.id).limit(limit)).all()
+
+    results = serialize_notifications(row[:-1] for row in rows)
+    for result, row in zip(results, rows):
+        result['rank'] = row[-1]
+    return results
+
+
+def rebuild_notification_search_index() -> None:
+    """Create the full-text index if missing (databases created before it existed) and repopulate it"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            db.session.execute(text(statement))
+        db.session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            db.session.execute(text(statement))
+    else:
+        raise SearchNotSupported(f"Full-text search is not supported on '{dialect}'")
 
-        # Add street-specific notifications for residents
-        if hasattr(user, 'street_name') and user.street_name:
-            street_conditions = db.and_(
-                Notification.street_name == user.street_name,
-                Notification.recipient_id.is_(None),
-                Notification.is_read == False
-            )
-            all_conditions.append(street_conditions)
+    db.session.commit()
 
-    stmt = db.select(db.func.count(Notification.id)).where(
-        db.or_(*all_conditions)
-    )
 
-    return db.session.scalar(stmt) or 0
+def rebuild_inbox_entries() -> int:
+    """
+    Materialize every missing inbox entry for unexpired notifications, e.g. after
+    switching a deployment to INBOX_FANOUT = 'write'. Returns the number written.
+    """
+    try:
+        written = inbox_fanout.rebuild()
+        db.session.commit()
+        return written
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
 
 
 def mark_notification_as_read(notification_id: int, user: Optional[User] = None) -> bool:
-    """Mark a notification as read"""
+    """
+    Record that a user read a notification. Without a user only direct notifications
+    can be marked (on behalf of their recipient); shared ones are refused, since their
+    read state is per resident.
+    """
     notification = db.session.get(Notification, notification_id)
     if not notification:
         return False
 
-    # Check permissions if user is provided
-    if user and notification.recipient_id and notification.recipient_id != user.id:
+    if user is None:
+        # Direct notifications are read on behalf of their recipient
+        if notification.recipient:
+            return notification.mark_as_read_by(notification.recipient)
         return False
 
-    return notification.mark_as_read()
+    # Check permissions: direct notifications can only be read by their recipient
+    if notification.recipient_id and notification.recipient_id != user.id:
+        return False
+
+    # Shared notifications can only be read by users who can see them
+    if notification.recipient_id is None:
+        visible = db.session.scalar(
+            db.select(db.literal(True)).where(
+                Notification.id == notification.id,
+                db.or_(*_shared_conditions(user))
+            )
+        )
+        if not visible:
+            return False
+
+    return notification.mark_as_read_by(user)
 
 
-def mark_all_notifications_as_read(user: User) -> int:
-    """Mark all unread notifications as read for a user"""
-    notifications = get_notifications_by_user(
-        user=user,
-        include_global=True,
-        unread_only=True,
-        limit=1000
-    )
+def mark_all_notifications_as_read(user: User, notification_ids: Optional[List[int]] = None) -> int:
+    """
+    Mark all unread notifications visible to a user as read in one transaction.
+    Receipts are written with one INSERT ... SELECT for direct and one for shared
+    notifications; pass notification_ids to restrict the operation to a multi-select.
+    Returns the number newly read; a failed write is rolled back and re-raised.
+    """
+    now = dt.datetime.utcnow()
+    conditions = [~_read_by(user)]
+
+    if notification_ids is not None:
+        if not notification_ids:
+            return 0
+        conditions.append(Notification.id.in_(notification_ids))
+
+    def write_receipts(visibility) -> int:
+        unread = db.select(
+            db.literal(user.id),
+            Notification.id,
+            db.literal(now, type_=db.DateTime)
+        ).where(visibility, *conditions)
+
+        result = db.session.execute(
+            db.insert(NotificationReceipt).from_select(
+                ['user_id', 'notification_id', 'read_at'], unread
+            )
+        )
+        return result.rowcount or 0
+
+    try:
+        direct = write_receipts(Notification.recipient_id == user.id)
+        shared = write_receipts(db.or_(*_shared_conditions(user)))
+
+        # Keep the row-level flag of direct notifications in sync (same transaction)
+        direct_stmt = (
+            db.update(Notification)
+            .where(Notification.recipient_id == user.id, Notification.is_read == False)
+            .values(is_read=True, read_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if notification_ids is not None:
+            direct_stmt = direct_stmt.where(Notification.id.in_(notification_ids))
+        db.session.execute(direct_stmt)
+
+        if direct or shared:
+            NotificationCounter.record_read(user.id, direct=direct, shared=shared)
+            inbox_fanout.mark_read(user.id, notification_ids)
+
+        db.session.commit()
+        return direct + shared
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def purge_expired_notifications(
+    batch_size: int = 500,
+    max_batches: int | None = None,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Delete expired notifications in bounded batches, one short transaction per batch,
+    so SQLite never holds its write lock for long. Receipts go with their notification
+    and the maintained counters are adjusted in the same transaction.
+    Returns the number of notifications deleted.
+    """
+    deleted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        now = dt.datetime.utcnow()
+        ids = list(db.session.execute(
+            db.select(Notification.id)
+            .where(Notification.expires_at <= now)
+            .order_by(Notification.expires_at)
+            .limit(batch_size)
+        ).scalars())
+
+        if not ids:
+            break
+
+        try:
+            # Scope totals to take back, grouped by the columns that decide the scope
+            scope_counts = db.session.execute(
+                db.select(
+                    Notification.type,
+                    Notification.recipient_id,
+                    Notification.street_name,
+                    db.func.count()
+                )
+                .where(Notification.id.in_(ids))
+                .group_by(Notification.type, Notification.recipient_id, Notification.street_name)
+            ).all()
+
+            # Per-user reads to take back, split into direct and shared receipts
+            is_direct = Notification.recipient_id.is_not(None)
+            read_counts = db.session.execute(
+                db.select(NotificationReceipt.user_id, is_direct, db.func.count())
+                .join(Notification, Notification.id == NotificationReceipt.notification_id)
+                .where(Notification.id.in_(ids))
+                .group_by(NotificationReceipt.user_id, is_direct)
+            ).all()
+
+            db.session.execute(
+                db.delete(NotificationReceipt)
+                .where(NotificationReceipt.notification_id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            inbox_fanout.delete(ids)
+            # Outbox messages carry their own snapshot and outlive the notification
+            db.session.execute(
+                db.update(OutboxMessage)
+                .where(OutboxMessage.notification_id.in_(ids))
+                .values(notification_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                db.delete(Notification)
+                .where(Notification.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+
+            totals: dict[tuple[str, str], int] = {}
+            for notification_type, recipient_id, street_name, count in scope_counts:
+                for scope in NotificationCounter.scopes_of(notification_type, recipient_id, street_name):
+                    totals[scope] = totals.get(scope, 0) + count
+            for (scope, key), count in sorted(totals.items()):
+                NotificationCounter.increment(scope, key, total=-count)
+
+            for user_id, direct, count in read_counts:
+                if direct:
+                    NotificationCounter.record_read(user_id, direct=-count)
+                else:
+                    NotificationCounter.record_read(user_id, shared=-count)
+
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+        deleted += len(ids)
+        batches += 1
 
-    count = 0
-    for notification in notifications:
-        if notification.mark_as_read():
-            count += 1
+        if len(ids) < batch_size:
+            break
+        if pause_seconds:
+            # Let other writers take the lock between batches
+            time.sleep(pause_seconds)
 
-    return count
+    return deleted
 
 
 def cleanup_expired_notifications() -> int:
-    """Delete expired notifications - deprecated function, returns 0 since expiration was removed"""
-    return 0
+    """Delete expired notifications (kept for backward compatibility)"""
+    return purge_expired_notifications()
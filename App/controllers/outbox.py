@@ -0,0 +1,45 @@
+from App.extensions import db
+from App.models.outbox_message import OutboxMessage
+from App.models.enums import OutboxStatus
+import datetime as dt
+from sqlalchemy.exc import SQLAlchemyError
+
+
+'''
+READ
+'''
+def get_outbox_summary() -> dict[str, dict[str, int]]:
+    """Message counts per channel and status, e.g. {'sms': {'pending': 3, 'delivered': 120}}"""
+    rows = db.session.execute(
+        db.select(OutboxMessage.channel, OutboxMessage.status, db.func.count())
+        .group_by(OutboxMessage.channel, OutboxMessage.status)
+        .order_by(OutboxMessage.channel, OutboxMessage.status)
+    ).all()
+
+    summary: dict[str, dict[str, int]] = {}
+    for channel, status, count in rows:
+        summary.setdefault(channel, {})[status] = count
+    return summary
+
+
+'''
+UPDATE
+'''
+def requeue_failed_outbox_messages(channel: str | None = None) -> int:
+    """Give messages that exhausted their attempts a fresh set of retries; returns how many"""
+    stmt = (
+        db.update(OutboxMessage)
+        .where(OutboxMessage.status == OutboxStatus.FAILED.value)
+        .values(status=OutboxStatus.PENDING.value, attempts=0, next_attempt_at=dt.datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if channel:
+        stmt = stmt.where(OutboxMessage.channel == channel)
+
+    try:
+        count = db.session.execute(stmt).rowcount or 0
+        db.session.commit()
+        return count
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
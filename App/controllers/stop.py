@@ -1,22 +1,34 @@
 import click
 
 from App.models import Driver, Street, Stop, NotificationType
+from App.models.stop import parse_scheduled_date
+from App.utils.geo import haversine_m
 from App.models.enums import NotificationCategory, NotificationPriority
 from App.extensions import db
 from .notification import create_street_notification
+from App.geofences import invalidate_on_commit
+from App.eta import stops_changed_on_commit
+from sqlalchemy import tuple_
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import lazyload
+from typing import Iterator
+import datetime as dt
+
+STREAM_BATCH_SIZE = 500
+MAX_BULK_STOPS = 1000
 
 '''
 CREATE
 '''
-def create_stop(driver: Driver, street: Street, scheduled_date: str) -> Stop | None:
+def create_stop(driver: Driver, street: Street, scheduled_date: str | dt.datetime) -> Stop | None:
     """
-    Create a stop for a street
+    Create a stop for a street. The stop and its notification are committed together.
     """
     try:
         new_stop = driver.schedule_stop(
             street=street,
-            date=scheduled_date
+            date=scheduled_date,
+            commit=False
         )
 
         if not new_stop:
@@ -30,12 +42,14 @@ def create_stop(driver: Driver, street: Street, scheduled_date: str) -> Stop | N
             notification_type=NotificationType.NEW,
             category=NotificationCategory.SCHEDULE,
             priority=NotificationPriority.HIGH,
-            expires_in_hours=168  # Expires in 1 week
+            expires_in_hours=168,  # Expires in 1 week
+            commit=False
         )
 
         if not new_notification:
             raise IntegrityError("Failed to create notification for stop.")
 
+        db.session.commit()
         return new_stop
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -43,6 +57,123 @@ def create_stop(driver: Driver, street: Street, scheduled_date: str) -> Stop | N
         return None
 
 
+def schedule_stops(driver: Driver, items: list[dict], create_streets: bool = False) -> list[dict]:
+    """
+    Schedule many stops for a driver in one transaction.
+    items are {'streetName', 'scheduledDate'} dicts; returns one result per item, in order,
+    with status 'created' (and stopId), 'exists', 'duplicate' (repeated in the batch) or 'invalid' (and error).
+    Streets and existing stops are checked with one query each and the stops are
+    written with one bulk INSERT; residents get one notification per street.
+    Unknown streets are invalid unless create_streets is set.
+    """
+    if len(items) > MAX_BULK_STOPS:
+        raise ValueError(f"At most {MAX_BULK_STOPS} stops can be scheduled at once")
+
+    results = []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        street_name = str(item.get('streetName') or '').strip()
+        result = {'index': index, 'streetName': street_name, 'scheduledDate': item.get('scheduledDate')}
+        results.append(result)
+        if not street_name or not item.get('scheduledDate'):
+            result.update(status='invalid', error="Missing streetName or scheduledDate")
+            continue
+        try:
+            result['date'] = parse_scheduled_date(item['scheduledDate'])
+        except ValueError as e:
+            result.update(status='invalid', error=str(e))
+
+    candidates = [r for r in results if 'date' in r]
+    names = {r['streetName'] for r in candidates}
+    known = set(db.session.execute(db.select(Street.name).where(Street.name.in_(names))).scalars()) if names else set()
+    pairs = {(r['streetName'], r['date']) for r in candidates}
+    existing = set(
+        db.session.execute(
+            db.select(Stop.street_name, Stop.scheduled_date)
+            .where(tuple_(Stop.street_name, Stop.scheduled_date).in_(pairs), Stop.has_arrived == False)
+        ).tuples()
+    ) if pairs else set()
+
+    new_streets, planned = set(), []
+    seen = set()
+    for result in candidates:
+        key = (result['streetName'], result['date'])
+        if result['streetName'] not in known and not create_streets:
+            result.update(status='invalid', error=f"Street '{result['streetName']}' not found")
+        elif key in existing:
+            result['status'] = 'exists'
+        elif key in seen:
+            result['status'] = 'duplicate'
+        else:
+            seen.add(key)
+            planned.append(result)
+            if result['streetName'] not in known:
+                new_streets.add(result['streetName'])
+
+    try:
+        if new_streets:
+            db.session.execute(db.insert(Street), [{'name': name} for name in sorted(new_streets)])
+
+        if planned:
+            now = dt.datetime.utcnow()
+            # Ids are matched back on (street, date), unique within the batch, rather than
+            # on parameter order, which would force row-at-a-time INSERTs on SQLite
+            inserted = db.session.execute(
+                db.insert(Stop).returning(Stop.id, Stop.street_name, Stop.scheduled_date),
+                [
+                    {
+                        'driver_id': driver.id, 'street_name': r['streetName'], 'scheduled_date': r['date'],
+                        'created_at': now, 'has_arrived': False
+                    }
+                    for r in planned
+                ]
+            ).all()
+            stop_ids = {(row.street_name, row.scheduled_date): row.id for row in inserted}
+
+            by_street: dict[str, list[dt.datetime]] = {}
+            for result in planned:
+                result.update(status='created', stopId=stop_ids[(result['streetName'], result['date'])])
+                by_street.setdefault(result['streetName'], []).append(result['date'])
+
+            # One notification per street listing its new stops, not one per stop
+            for street_name, dates in by_street.items():
+                create_street_notification(
+                    title="New Stops Scheduled" if len(dates) > 1 else "New Stop Scheduled",
+                    message=f"{driver.get_fullname()} has scheduled {_describe_dates(sorted(dates))} for {street_name}",
+                    street=street_name,
+                    notification_type=NotificationType.NEW,
+                    category=NotificationCategory.SCHEDULE,
+                    priority=NotificationPriority.HIGH,
+                    expires_in_hours=168,  # Expires in 1 week
+                    commit=False
+                )
+
+        # Bulk inserts skip the Stop mapper events
+        invalidate_on_commit(db.session, driver.id)
+        stops_changed_on_commit(db.session, driver.id)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    for result in results:
+        date = result.pop('date', None)
+        if date is not None:
+            result['scheduledDate'] = date.isoformat()
+    return results
+
+def _describe_dates(dates: list[dt.datetime], shown: int = 7) -> str:
+    """'a stop on 2025-09-14 07:30' or '3 stops on 2025-09-14, 2025-09-15 and 2025-09-16'"""
+    labels = [d.strftime('%Y-%m-%d') if d.time() == dt.time() else d.strftime('%Y-%m-%d %H:%M') for d in dates]
+    if len(labels) == 1:
+        return f"a stop on {labels[0]}"
+    if len(labels) > shown:
+        listed = f"{', '.join(labels[:shown])} and {len(labels) - shown} more"
+    else:
+        listed = f"{', '.join(labels[:-1])} and {labels[-1]}"
+    return f"{len(labels)} stops on {listed}"
+
+
 '''
 GET
 '''
@@ -52,15 +183,171 @@ def get_stop_by_id(id: str) -> Stop | None:
     """
     return db.session.query(Stop).filter_by(id=id).one_or_none()
 
-def stop_exists(street_name: str, scheduled_date: str) -> bool:
+def stop_exists(street_name: str, scheduled_date: str | dt.datetime) -> bool:
     """
     Check if a stop exists already
     """
+    scheduled_date = parse_scheduled_date(scheduled_date)
     return db.session.query(Stop).filter_by(street_name=street_name, scheduled_date=scheduled_date, has_arrived=False).first() is not None
 
 def get_all_stops() -> list[Stop]:
 
     return db.session.execute(db.select(Stop)).scalars().all()
+
+def _stops_query(
+    driver_id: int | None = None,
+    street_name: str | None = None,
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    status: str | None = None
+):
+    stmt = db.select(Stop).options(lazyload(Stop.driver))  # listing stops never needs the driver row
+    if driver_id is not None:
+        stmt = stmt.where(Stop.driver_id == driver_id)
+    if street_name:
+        stmt = stmt.where(Stop.street_name == street_name)
+    if start:
+        stmt = stmt.where(Stop.scheduled_date >= start)
+    if end:
+        stmt = stmt.where(Stop.scheduled_date < end)
+    if status == 'scheduled':
+        stmt = stmt.where(Stop.has_arrived == False)
+    elif status == 'completed':
+        stmt = stmt.where(Stop.has_arrived == True)
+    elif status:
+        raise ValueError("'status' must be 'scheduled' or 'completed'")
+    return stmt.order_by(Stop.scheduled_date, Stop.id)
+
+def get_stops(
+    driver_id: int | None = None,
+    street_name: str | None = None,
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    status: str | None = None,
+    limit: int | None = None,
+    after: tuple[dt.datetime, int] | None = None
+) -> list[Stop]:
+    """
+    Stops ordered by scheduled date. A driver or street filter with a date range
+    is one range scan of idx_stop_driver_scheduled / idx_stop_street_scheduled.
+    start is inclusive and end exclusive; status is 'scheduled' or 'completed'.
+    Pass the (scheduled_date, id) of the last stop seen as 'after' for the next page.
+    """
+    stmt = _stops_query(driver_id, street_name, start, end, status)
+    if after:
+        stmt = stmt.where(tuple_(Stop.scheduled_date, Stop.id) > tuple_(*after))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    return db.session.execute(stmt).scalars().all()
+
+def iter_stops(batch_size: int = STREAM_BATCH_SIZE, **filters) -> Iterator[Stop]:
+    """
+    Every stop matching get_stops' filters, fetched batch_size rows at a time
+    (a server-side cursor where the driver supports one) so exports run in constant memory.
+    """
+    stmt = _stops_query(**filters).execution_options(yield_per=batch_size)
+    yield from db.session.execute(stmt).scalars()
+
+
+def plan_driver_route(driver_id: int, day: dt.date, start: tuple[float, float] | None = None) -> dict:
+    """
+    A driver's unfinished stops on 'day' in visiting order, planned over street coordinates
+    (optionally from a start point). Stops on the same street are visited together;
+    stops on streets without coordinates are listed separately as 'unlocated'.
+    """
+    from App.route_planner import route_planner
+
+    day_start = dt.datetime.combine(day, dt.time())
+    stops = get_stops(driver_id=driver_id, start=day_start, end=day_start + dt.timedelta(days=1), status='scheduled')
+
+    names = {stop.street_name for stop in stops}
+    rows = db.session.execute(
+        db.select(Street.name, Street.latitude, Street.longitude)
+        .where(Street.name.in_(names), Street.latitude.is_not(None))
+    ).all() if names else []
+    located = {name: (latitude, longitude) for name, latitude, longitude in rows}
+
+    # Sorted so that the same set of streets maps to the same cached distance matrix
+    points = sorted(set(located.values()))
+    order, total = route_planner.plan(points, start)
+
+    at_point: dict[tuple[float, float], list[Stop]] = {}
+    unlocated = []
+    for stop in stops:
+        point = located.get(stop.street_name)
+        if point is None:
+            unlocated.append(stop.get_json())
+        else:
+            at_point.setdefault(point, []).append(stop)
+
+    route, previous = [], start
+    for index in order:
+        point = points[index]
+        leg = haversine_m(previous, point) if previous is not None else 0.0
+        for stop in at_point[point]:
+            route.append({**stop.get_json(), 'sequence': len(route) + 1, 'legDistance': round(leg, 1)})
+            leg = 0.0
+        previous = point
+
+    return {
+        'date': day.isoformat(),
+        'start': list(start) if start else None,
+        'distance': round(total, 1),
+        'stops': route,
+        'unlocated': unlocated
+    }
+
+def get_street_eta(street_name: str, now: dt.datetime | None = None) -> dict | None:
+    """
+    When a van should reach a street today: the earliest ETA among the street's open stops for
+    today, from each driver's latest ping and memoized route. None when no stop is open today.
+    'eta' is None while the driver has not reported a position or the street has no coordinates.
+    'now' is naive UTC; 'eta' and 'scheduledDate' are in the stops' timezone, named by 'timezone'.
+    """
+    from App.eta import eta_estimator
+    from App.utils.clock import timezone_name, to_local
+
+    now = now or dt.datetime.utcnow()
+    local_now = to_local(now)
+    day = local_now.date()
+    day_start = dt.datetime.combine(day, dt.time())
+    stops = get_stops(street_name=street_name, start=day_start, end=day_start + dt.timedelta(days=1), status='scheduled')
+    if not stops:
+        return None
+
+    best = None
+    for stop in stops:
+        etas = eta_estimator.estimate(stop.driver_id, day)
+        estimate = etas.get(stop.id) if etas else None
+        candidate = {
+            'street': street_name,
+            'stopId': stop.id,
+            'driverId': stop.driver_id,
+            'scheduledDate': stop.scheduled_date.isoformat(),
+            'timezone': timezone_name(local_now),
+            'eta': None,
+            'minutes': None,
+            'stopsBefore': None,
+            'distance': None
+        }
+        if estimate is not None:
+            eta = max(estimate.eta, now)  # a late van is due now, not in the past
+            candidate.update(
+                eta=to_local(eta).isoformat(timespec='seconds'),
+                minutes=round((eta - now).total_seconds() / 60),
+                stopsBefore=estimate.sequence - 1,
+                distance=round(estimate.distance, 1)
+            )
+
+        if best is None or _eta_sort_key(candidate) < _eta_sort_key(best):
+            best = candidate
+    return best
+
+def _eta_sort_key(candidate: dict) -> tuple:
+    # Known ETAs first (soonest), then by schedule
+    return candidate['eta'] is None, candidate['eta'] or '', candidate['scheduledDate']
+
 '''
 UPDATE
 '''
@@ -79,6 +366,69 @@ def complete_stop(id: str) -> None:
     db.session.add(stop)
     db.session.commit()
 
+def record_arrival(stop_id: int, driver_id: int | None = None) -> dict | None:
+    """
+    Arrival workflow in one transaction: complete the stop, notify its street and clear the
+    street's stop requests. The stop is claimed with a conditional UPDATE (has_arrived = false),
+    so of two concurrent arrivals only one wins. With driver_id given, the stop must be theirs.
+    Returns the completed stop's JSON; None when there is no such open stop.
+    """
+    from .stop_request import delete_stop_requests
+
+    conditions = [Stop.id == stop_id, Stop.has_arrived.is_(False)]
+    if driver_id is not None:
+        conditions.append(Stop.driver_id == driver_id)
+
+    try:
+        stop = db.session.execute(
+            db.update(Stop).where(*conditions).values(has_arrived=True).returning(Stop)
+        ).scalar_one_or_none()
+        if stop is None:
+            return None  # nothing was written; the caller's session is left as it was
+
+        create_street_notification(
+            title="Driver Arrived!",
+            message=f"'{stop.driver.get_fullname()}' has arrived at your street.",
+            street=stop.street_name,
+            notification_type=NotificationType.ARRIVED,
+            category=NotificationCategory.SERVICE,
+            priority=NotificationPriority.URGENT,
+            expires_in_hours=2,  # Expires in 2 hours
+            commit=False
+        )
+        delete_stop_requests(stop.street_name, commit=False)
+
+        # A bulk UPDATE skips the Stop mapper events that keep these caches current
+        invalidate_on_commit(db.session, stop.driver_id)
+        stops_changed_on_commit(db.session, stop.driver_id)
+
+        data = stop.get_json()
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    return data
+
+def detect_arrivals(pings) -> list[int]:
+    """
+    Check location pings against the geofences of each driver's open stops (oldest ping first)
+    and run the arrival workflow for every fence entered; returns the ids of the stops arrived at.
+    Pings are matched to stops on their date in the stops' timezone. Only a crossing queries the database.
+    """
+    from App.geofences import geofences
+    from App.utils.clock import to_local
+
+    if not geofences.enabled:
+        return []
+
+    arrived = []
+    for ping in sorted(pings, key=lambda ping: ping.ts):
+        day = to_local(ping.recorded_at).date()
+        for fence in geofences.entered(ping.driver_id, (ping.latitude, ping.longitude), day):
+            if record_arrival(fence.stop_id, ping.driver_id):
+                arrived.append(fence.stop_id)
+    return arrived
+
 '''
 DELETE
 '''
@@ -20,9 +20,10 @@ def stop_request_exists(street_name: str) -> bool:
 '''
 DELETE
 '''
-def delete_stop_requests(street_name: str) -> None:
+def delete_stop_requests(street_name: str, commit: bool = True) -> None:
     """
     Delete all stop requests for a street
     """
     db.session.query(StopRequest).filter_by(street_name=street_name).delete()
-    db.session.commit()
+    if commit:
+        db.session.commit()
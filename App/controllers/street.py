@@ -2,6 +2,9 @@ from App.models import Street
 from App.extensions import db
 from sqlalchemy.exc import SQLAlchemyError
 
+MAX_NEAREST = 50
+MAX_RADIUS = 50000  # meters
+
 '''
 GET
 '''
@@ -26,15 +29,50 @@ def get_all_streets_json() -> list[dict[str, str]]:
         return []
     return [street.get_json() for street in streets]
 
+def get_nearest_streets(latitude: float, longitude: float, k: int = 1, max_distance: float | None = None) -> list[tuple[str, float]]:
+    """
+    The k streets nearest a point as (name, meters), nearest first, from the in-memory street index.
+    Raises ValueError on bad coordinates, k or max_distance.
+    """
+    from App.street_index import street_index
+    from App.utils.geo import validate_point  # App.utils imports the user controller
+
+    point = validate_point(latitude, longitude)
+    if not 1 <= k <= MAX_NEAREST:
+        raise ValueError(f"'k' must be between 1 and {MAX_NEAREST}")
+    if max_distance is not None and not 0 < max_distance <= MAX_RADIUS:
+        raise ValueError(f"'max_distance' must be between 0 and {MAX_RADIUS} meters")
+    return street_index.nearest(point, k=k, max_distance=max_distance)
+
+def get_streets_within(latitude: float, longitude: float, radius: float) -> list[tuple[str, float]]:
+    """
+    Streets within radius meters of a point as (name, meters), nearest first.
+    Raises ValueError on bad coordinates or radius.
+    """
+    from App.street_index import street_index
+    from App.utils.geo import validate_point
+
+    point = validate_point(latitude, longitude)
+    if not 0 < radius <= MAX_RADIUS:
+        raise ValueError(f"'radius' must be a positive number of meters, at most {MAX_RADIUS}")
+    return street_index.within(point, radius)
+
 '''
 CREATE
 '''
-def create_street(street: str) -> Street | None:
+def create_street(
+    street: str,
+    latitude: float | None = None,
+    longitude: float | None = None,
+    path: list | None = None
+) -> Street | None:
     """
-    Create a new street
+    Create a new street, optionally with its coordinates and polyline ([[lat, lon], ...]).
+    Raises ValueError on bad coordinates.
     """
     try:
         new_street = Street(name=street)
+        _apply_geodata(new_street, latitude, longitude, path)
         db.session.add(new_street)
         db.session.commit()
         return new_street
@@ -43,3 +81,39 @@ def create_street(street: str) -> Street | None:
         # log or re-raise depending on context
         print(f"Failed to create street '{street}': {e}")
         return None
+
+'''
+UPDATE
+'''
+def set_street_geodata(
+    street: Street,
+    latitude: float | None = None,
+    longitude: float | None = None,
+    path: list | None = None
+) -> Street:
+    """
+    Set a street's coordinates and/or polyline. Raises ValueError on bad coordinates.
+    """
+    _apply_geodata(street, latitude, longitude, path)
+    try:
+        db.session.commit()
+        return street
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+def _apply_geodata(street: Street, latitude, longitude, path) -> None:
+    from App.utils.geo import validate_point
+
+    if path is not None:
+        if not isinstance(path, (list, tuple)) or len(path) < 2:
+            raise ValueError("'path' must be a list of at least two [lat, lon] points")
+        if not all(isinstance(vertex, (list, tuple)) and len(vertex) == 2 for vertex in path):
+            raise ValueError("'path' points must be [lat, lon] pairs")
+        street.path = [list(validate_point(*vertex)) for vertex in path]
+        if latitude is None and longitude is None:
+            # Reference point defaults to the middle vertex
+            latitude, longitude = street.path[len(street.path) // 2]
+
+    if latitude is not None or longitude is not None:
+        street.latitude, street.longitude = validate_point(latitude, longitude)
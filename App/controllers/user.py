@@ -1,7 +1,9 @@
 import click
+from flask import current_app
 from App.models import User, Driver, Street, Resident, DriverStatus
 from App.extensions import db
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from App.inbox_fanout import inbox_fanout
 from .street import get_street_by_string
 
 '''
@@ -23,6 +25,7 @@ def create_driver(username, password, first_name, last_name) -> Driver | None:
         )
         db.session.add(new_driver)
         db.session.commit()
+        inbox_fanout.submit_backfill(current_app._get_current_object(), new_driver.id)
         return new_driver
     except IntegrityError:
         click.secho(f"[ERROR]: User already exists with that username.", fg="red")
@@ -43,6 +46,7 @@ def create_resident(username: str, password: str, first_name: str, last_name: st
         )
         db.session.add(new_resident)
         db.session.commit()
+        inbox_fanout.submit_backfill(current_app._get_current_object(), new_resident.id)
         return new_resident
     except IntegrityError:
         click.secho(f"[ERROR]: User already exists with that username.", fg="red")
@@ -117,3 +121,25 @@ def get_all_users_json() -> list[dict[str, str]]:
 
 def get_driver_by_id(driver_id: str) -> Driver | None:
     return db.session.query(Driver).filter_by(id=driver_id).one_or_none()
+
+def get_driver_status(driver_id: int) -> dict | None:
+    """
+    Status and location from the in-memory driver state (at most a primary-key lookup once it is loaded)
+    """
+    from App.driver_state import driver_state
+
+    state = driver_state.get(driver_id)
+    return state.get_json(driver_id) if state else None
+
+'''
+UPDATE
+'''
+def update_driver_status(driver_id: int, status: str | None = None, location: str | None = None) -> dict | None:
+    """
+    Set status and/or location in the driver state, written to the database per DRIVER_STATE_DURABILITY.
+    Returns None for an unknown driver; raises ValueError on a bad status or an empty update.
+    """
+    from App.driver_state import driver_state
+
+    state = driver_state.update(driver_id, status=status, location=location)
+    return state.get_json(driver_id) if state else None
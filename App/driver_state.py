@@ -0,0 +1,294 @@
+import atexit
+import datetime as dt
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from App.extensions import db
+from App.events import hub, DRIVERS_CHANNEL
+from App.models.enums import DriverStatus
+from App.models.user import Driver
+
+logger = logging.getLogger(__name__)
+
+# Key under Session.info where ORM writes to drivers wait for their transaction to commit
+PENDING_DRIVER_STATE_KEY = 'pending_driver_state'
+
+DURABILITY_DEFERRED = 'deferred'  # coalesce in memory, write every flush_interval seconds and at exit
+DURABILITY_IMMEDIATE = 'immediate'  # write (and commit) on every update
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+DEFAULT_TTL = 5.0  # seconds a clean entry is served before it is re-read from the database
+
+VALID_STATUSES = {status.value for status in DriverStatus}
+
+
+class DriverState(NamedTuple):
+    status: str
+    location: str | None
+    updated_at: dt.datetime | None
+
+    def get_json(self, driver_id: int) -> dict:
+        """Same shape as Driver.get_status_dict"""
+        return {
+            'id': driver_id,
+            'status': self.status,
+            'currentLocation': self.location,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class DriverStateCache:
+    """
+    In-memory hot copy of every driver's status and location.
+
+    The cache is loaded with one query on first use. After that a read only
+    touches the database (one primary-key lookup) for a driver it has not seen,
+    such as one created by another process, or for an entry that is older
+    than `ttl` seconds and has no pending update. The TTL bounds how stale
+    one worker's copy gets when other workers update drivers and no
+    EVENT_BROKER_URL relays their updates. Updates land in memory, are published to live subscribers
+    straight away and, with DRIVER_STATE_DURABILITY = 'deferred', are
+    coalesced per driver and written to the drivers table every
+    `flush_interval` seconds and at exit; 'immediate' writes each update
+    before returning. Conflicts resolve last-writer-wins on updated_at, both
+    in memory and in the flush's conditional UPDATE, so a stale worker never
+    overwrites a newer row. ORM writes to drivers (the CLI, admin) are picked
+    up after they commit, and with EVENT_BROKER_URL set so are updates made
+    by other workers.
+    """
+
+    def __init__(
+        self,
+        durability: str = DURABILITY_DEFERRED,
+        flush_interval: float | None = DEFAULT_FLUSH_INTERVAL,
+        ttl: float | None = DEFAULT_TTL
+    ):
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+        self.clear()
+
+    def init_app(self, app) -> None:
+        durability = app.config.get('DRIVER_STATE_DURABILITY', self.durability)
+        if durability not in (DURABILITY_DEFERRED, DURABILITY_IMMEDIATE):
+            raise ValueError(f"DRIVER_STATE_DURABILITY must be '{DURABILITY_DEFERRED}' or '{DURABILITY_IMMEDIATE}'")
+        self.durability = durability
+        interval = app.config.get('DRIVER_STATE_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_interval = float(interval) if interval else None
+        ttl = app.config.get('DRIVER_STATE_TTL', self.ttl)
+        self.ttl = float(ttl) if ttl else None
+        self.clear()
+
+        if app.config.get('EVENT_BROKER_URL') and self._listener is None:
+            self._listener = threading.Thread(target=self._apply_relayed_updates, name='driver-state-events', daemon=True)
+            self._listener.start()
+        if self.durability == DURABILITY_DEFERRED and not app.config.get('TESTING'):
+            atexit.register(self._flush_at_exit, app)
+
+    def clear(self) -> None:
+        """Forget everything; the next read reloads from the database"""
+        with self._lock:
+            self._states: dict[int, DriverState] = {}
+            self._dirty: set[int] = set()
+            self._read_at: dict[int, float] = {}  # monotonic time each entry was read from the database
+            self._loaded = False
+
+    # -- reads -----------------------------------------------------------------
+
+    def get(self, driver_id: int) -> DriverState | None:
+        self._ensure_loaded()
+        if self._stale(driver_id):
+            return self._refresh(driver_id)
+        return self._states.get(driver_id)
+
+    # -- writes ----------------------------------------------------------------
+
+    def update(self, driver_id: int, status: str | None = None, location: str | None = None) -> DriverState | None:
+        """
+        Set a driver's status and/or location; None when there is no such driver.
+        Raises ValueError for an unknown status or an empty update.
+        """
+        if not status and not location:
+            raise ValueError("Provide a status and/or a location")
+        if status and status not in VALID_STATUSES:
+            raise ValueError(f"'status' must be one of: {', '.join(sorted(VALID_STATUSES))}")
+
+        self._ensure_loaded()
+        if self._stale(driver_id):
+            self._refresh(driver_id)
+        with self._lock:
+            current = self._states.get(driver_id)
+            if current is None:
+                return None
+            state = DriverState(status or current.status, location or current.location, dt.datetime.utcnow())
+            self._states[driver_id] = state
+            self._dirty.add(driver_id)
+
+        hub.publish([DRIVERS_CHANNEL], 'driver_status', state.get_json(driver_id))
+        if self.durability == DURABILITY_IMMEDIATE:
+            self.flush()
+        return state
+
+    def pending_count(self) -> int:
+        return len(self._dirty)
+
+    def flush(self) -> int:
+        """Write coalesced updates with one executemany UPDATE and commit; returns how many drivers"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                rows = [
+                    {'driver_id': driver_id, 'new_status': state.status, 'new_location': state.location, 'updated_at': state.updated_at}
+                    for driver_id in dirty
+                    if (state := self._states.get(driver_id)) is not None
+                ]
+            if not rows:
+                return 0
+
+            table = Driver.__table__
+            stmt = (
+                table.update()
+                .where(
+                    table.c.id == db.bindparam('driver_id'),
+                    db.or_(table.c.status_updated_at.is_(None), table.c.status_updated_at <= db.bindparam('updated_at'))
+                )
+                .values(
+                    status=db.bindparam('new_status'),
+                    current_location=db.bindparam('new_location'),
+                    status_updated_at=db.bindparam('updated_at')
+                )
+            )
+            try:
+                db.session.execute(stmt, rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._dirty |= dirty
+                raise
+            return len(rows)
+
+    def apply(self, driver_id: int, state: DriverState | None) -> bool:
+        """Take a state written elsewhere (None: the driver was deleted) unless ours is newer"""
+        with self._lock:
+            if not self._loaded:
+                return False
+            if state is None:
+                self._dirty.discard(driver_id)
+                return self._states.pop(driver_id, None) is not None
+
+            current = self._states.get(driver_id)
+            if current is not None and current.updated_at and state.updated_at and state.updated_at <= current.updated_at:
+                return False  # older, or our own update echoed back by the broker
+            self._states[driver_id] = state
+            self._read_at[driver_id] = time.monotonic()
+            self._dirty.discard(driver_id)
+            return True
+
+    # -- loading and background work -------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        rows = db.session.execute(
+            db.select(Driver.id, Driver.status, Driver.current_location, Driver.status_updated_at)
+        ).all()
+        read_at = time.monotonic()
+        with self._lock:
+            if not self._loaded:
+                self._states = {id: DriverState(status, location, updated_at) for id, status, location, updated_at in rows}
+                self._read_at = dict.fromkeys(self._states, read_at)
+                self._loaded = True
+
+    def _stale(self, driver_id: int) -> bool:
+        """Unknown here, or clean and older than the TTL"""
+        if driver_id not in self._states:
+            return True
+        if self.ttl is None or driver_id in self._dirty:
+            return False
+        return time.monotonic() - self._read_at.get(driver_id, 0.0) > self.ttl
+
+    def _refresh(self, driver_id: int) -> DriverState | None:
+        """Re-read one driver's row; the newer of it and our entry wins"""
+        row = db.session.execute(
+            db.select(Driver.status, Driver.current_location, Driver.status_updated_at).where(Driver.id == driver_id)
+        ).first()
+        with self._lock:
+            self._read_at[driver_id] = time.monotonic()
+            current = self._states.get(driver_id)
+            if row is None:
+                if driver_id not in self._dirty:
+                    self._states.pop(driver_id, None)
+                    self._read_at.pop(driver_id, None)
+                    return None
+                return current
+
+            state = DriverState(*row)
+            if current is not None and current.updated_at and state.updated_at and state.updated_at < current.updated_at:
+                return current  # ours is newer (not flushed yet, or relayed ahead of its writer's flush)
+            self._states[driver_id] = state
+            self._dirty.discard(driver_id)
+            return state
+
+    def _apply_relayed_updates(self) -> None:
+        """Apply driver_status events relayed by the broker from other workers"""
+        subscription = hub.subscribe([DRIVERS_CHANNEL])
+        while True:
+            message = subscription.get(timeout=30)
+            if message is None or message.get('event') != 'driver_status':
+                continue
+            data = message['data']
+            updated_at = dt.datetime.fromisoformat(data['updatedAt']) if data.get('updatedAt') else None
+            self.apply(data['id'], DriverState(data['status'], data.get('currentLocation'), updated_at))
+
+    def _flush_at_exit(self, app) -> None:
+        try:
+            with app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception("Failed to write driver states at exit")
+
+
+driver_state = DriverStateCache()
+
+
+@event.listens_for(Driver, 'after_insert')
+@event.listens_for(Driver, 'after_update')
+def _queue_driver_state(mapper, connection, driver):
+    session = object_session(driver)
+    if session is None:
+        return
+    attrs = inspect(driver).attrs
+    updated_at = driver.status_updated_at
+    if (attrs.status.history.has_changes() or attrs.current_location.history.has_changes()) \
+            and not attrs.status_updated_at.history.has_changes():
+        updated_at = dt.datetime.utcnow()  # set directly (admin, scripts) without a clock
+    session.info.setdefault(PENDING_DRIVER_STATE_KEY, {})[driver.id] = DriverState(
+        driver.status, driver.current_location, updated_at
+    )
+
+
+@event.listens_for(Driver, 'after_delete')
+def _queue_driver_removal(mapper, connection, driver):
+    session = object_session(driver)
+    if session is not None:
+        session.info.setdefault(PENDING_DRIVER_STATE_KEY, {})[driver.id] = None
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_driver_state(session):
+    for driver_id, state in session.info.pop(PENDING_DRIVER_STATE_KEY, {}).items():
+        driver_state.apply(driver_id, state)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_driver_state(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_DRIVER_STATE_KEY, None)
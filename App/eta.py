@@ -0,0 +1,144 @@
+import datetime as dt
+import threading
+from typing import NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from App.extensions import db
+from App.models.stop import Stop
+from App.models.street import Street
+
+# Key under Session.info where drivers whose stops changed wait for the transaction to commit
+PENDING_ETA_KEY = 'pending_eta_drivers'
+ALL_DRIVERS = None  # pending marker: street geodata changed, every memoized route is stale
+
+DEFAULT_SPEED = 6.0  # meters per second (~22 km/h through residential streets)
+DEFAULT_STOP_SECONDS = 300  # time spent serving each stop before the next
+
+
+class StopEta(NamedTuple):
+    stop_id: int
+    street_name: str
+    sequence: int  # 1 = the next stop
+    distance: float  # meters from the driver's position along the planned route
+    eta: dt.datetime  # UTC
+
+
+class EtaEstimator:
+    """
+    ETAs for a driver's remaining stops of the day, from their latest ping
+    (buffered in this process or already in driver_pings, whichever is newer).
+
+    The remaining stops are put in visiting order by the route planner
+    (whose street-to-street distance matrices are cached per set of streets)
+    and turned into arrival times at a configured average speed plus a fixed
+    time per stop. The result for every stop on the route is memoized per
+    driver and reused until the inputs change: a newer ping from the driver,
+    a commit touching their stops (a completion, a new or deleted stop) or
+    a street being moved. Polling residents share one computation per change.
+    """
+
+    def __init__(self, speed: float = DEFAULT_SPEED, stop_seconds: float = DEFAULT_STOP_SECONDS):
+        self.speed = speed
+        self.stop_seconds = stop_seconds
+        self._lock = threading.Lock()
+        self.clear()
+
+    def init_app(self, app) -> None:
+        self.speed = float(app.config.get('ETA_SPEED', self.speed))
+        self.stop_seconds = float(app.config.get('ETA_STOP_SECONDS', self.stop_seconds))
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions: dict[int, int] = {}  # stop-sequence version per driver
+            self._streets_version = 0  # bumped when street geodata changes
+            self._memo: dict[int, tuple[tuple, dict[int, StopEta]]] = {}
+
+    def stops_changed(self, driver_id: int | None = None) -> None:
+        """Forget one driver's ETAs (None: everyone's)"""
+        with self._lock:
+            if driver_id is None:
+                self._streets_version += 1
+                self._memo.clear()
+            else:
+                self._versions[driver_id] = self._versions.get(driver_id, 0) + 1
+                self._memo.pop(driver_id, None)
+
+    def estimate(self, driver_id: int, day: dt.date) -> dict[int, StopEta] | None:
+        """ETAs of the driver's open, located stops on 'day' by stop id; None before their first ping"""
+        from App.controllers.driver_ping import get_latest_ping
+
+        ping = get_latest_ping(driver_id)
+        if ping is None:
+            return None
+
+        with self._lock:
+            key = (day, self._streets_version, self._versions.get(driver_id, 0), ping.ts)
+            cached = self._memo.get(driver_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        from App.controllers.stop import plan_driver_route
+
+        plan = plan_driver_route(driver_id, day, start=(ping.latitude, ping.longitude))
+        etas, distance, elapsed = {}, 0.0, 0.0
+        for stop in plan['stops']:
+            distance += stop['legDistance']
+            elapsed += stop['legDistance'] / self.speed
+            etas[stop['id']] = StopEta(
+                stop['id'],
+                stop['streetName'],
+                stop['sequence'],
+                distance,
+                ping.recorded_at + dt.timedelta(seconds=elapsed)
+            )
+            elapsed += self.stop_seconds
+
+        with self._lock:
+            if key[1:3] == (self._streets_version, self._versions.get(driver_id, 0)):  # not invalidated while planning
+                self._memo[driver_id] = (key, etas)
+        return etas
+
+
+eta_estimator = EtaEstimator()
+
+
+def stops_changed_on_commit(session, driver_id: int | None) -> None:
+    """Drop a driver's memoized ETAs (None: everyone's) once this transaction commits; for Core/bulk writes to stops"""
+    session.info.setdefault(PENDING_ETA_KEY, set()).add(driver_id)
+
+
+@event.listens_for(Stop, 'after_insert')
+@event.listens_for(Stop, 'after_update')
+@event.listens_for(Stop, 'after_delete')
+def _queue_stop_change(mapper, connection, stop):
+    session = object_session(stop)
+    if session is not None:
+        stops_changed_on_commit(session, stop.driver_id)
+
+
+@event.listens_for(Street, 'after_update')
+def _queue_street_change(mapper, connection, street):
+    session = object_session(street)
+    if session is not None:
+        stops_changed_on_commit(session, ALL_DRIVERS)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_etas(session):
+    pending = session.info.pop(PENDING_ETA_KEY, None)
+    if not pending:
+        return
+    if ALL_DRIVERS in pending:
+        eta_estimator.stops_changed()
+    else:
+        for driver_id in pending:
+            eta_estimator.stops_changed(driver_id)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_etas(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_ETA_KEY, None)
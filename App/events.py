@@ -0,0 +1,284 @@
+import hmac
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import Hashable, Iterable
+
+from sqlalchemy import event
+
+from App.extensions import db
+
+# Key under Session.info where events wait for their transaction to commit
+PENDING_EVENTS_KEY = 'pending_hub_events'
+
+# Channel every user subscribes to for driver status changes
+DRIVERS_CHANNEL = ('drivers', '')
+
+# Broker wire format: an HMAC-SHA256 answer to a random challenge, then
+# length-prefixed JSON messages. Only plain socket calls are used, so under
+# gunicorn's gevent workers (monkey-patched sockets) a hub waiting on the
+# broker yields to other greenlets instead of blocking the worker.
+CHALLENGE_SIZE = 32
+WELCOME = b'\x01'  # sent once the answer checks out
+HANDSHAKE_TIMEOUT = 5.0
+MAX_MESSAGE_SIZE = 1 << 20
+_LENGTH = struct.Struct('!I')
+
+
+def parse_address(url: str) -> tuple[str, int]:
+    """'host:port' -> (host, port)"""
+    host, _, port = url.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+def _recv_exactly(sock, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return bytes(data)
+
+
+def send_message(sock, message: dict) -> None:
+    payload = json.dumps(message).encode()
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def recv_message(sock) -> dict:
+    """Next message from a broker connection; channels come back as tuples"""
+    (size,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f'message of {size} bytes is too large')
+    message = json.loads(_recv_exactly(sock, size))
+    message['channels'] = [tuple(channel) if isinstance(channel, list) else channel for channel in message['channels']]
+    return message
+
+
+def _digest(authkey: bytes, challenge: bytes) -> bytes:
+    return hmac.new(authkey, challenge, 'sha256').digest()
+
+
+def _shutdown(sock) -> None:
+    """Close a socket, waking any thread blocked in accept() or recv() on it"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # not connected (or already shut down)
+    sock.close()
+
+
+class Subscription:
+    """A bounded per-connection event queue"""
+
+    def __init__(self, channels: Iterable[Hashable], maxsize: int = 256):
+        self.channels = set(channels)
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, message: dict) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # Slow consumer: drop the event and tell the client to resync its inbox
+            self.overflowed = True
+
+    def get(self, timeout: float | None = None) -> dict | None:
+        """Next message, or None if nothing arrived within the timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """
+    In-process pub/sub hub for live updates.
+
+    Events are published after the triggering transaction commits. When
+    EVENT_BROKER_URL is configured the hub relays every event through an
+    EventBroker so that subscribers in other worker processes see it too.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[Hashable, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._broker: socket.socket | None = None
+        self._broker_lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        url = app.config.get('EVENT_BROKER_URL')
+        if not url:
+            return
+
+        authkey = str(app.config.get('EVENT_BROKER_AUTHKEY') or app.config['SECRET_KEY']).encode()
+        thread = threading.Thread(
+            target=self._run_broker_client,
+            args=(parse_address(url), authkey),
+            name='event-hub-broker',
+            daemon=True
+        )
+        thread.start()
+
+    def subscribe(self, channels: Iterable[Hashable], maxsize: int = 256) -> Subscription:
+        subscription = Subscription(channels, maxsize=maxsize)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channels: Iterable[Hashable], event_name: str, data: dict) -> None:
+        """Publish immediately (use publish_on_commit for database-backed events)"""
+        message = {'channels': list(channels), 'event': event_name, 'data': data}
+
+        broker = self._broker
+        if broker is not None:
+            try:
+                with self._broker_lock:
+                    send_message(broker, message)
+                return  # the broker echoes it back to every hub, this one included
+            except (OSError, ValueError):
+                self._broker = None
+
+        self._dispatch(message)
+
+    def publish_on_commit(self, session, channels: Iterable[Hashable], event_name: str, data: dict) -> None:
+        """Queue an event that is only published if the session's transaction commits"""
+        session.info.setdefault(PENDING_EVENTS_KEY, []).append((list(channels), event_name, data))
+
+    def _dispatch(self, message: dict) -> None:
+        with self._lock:
+            targets = set()
+            for channel in message['channels']:
+                targets.update(self._subscribers.get(channel, ()))
+
+        for subscription in targets:
+            subscription.put(message)
+
+    def _run_broker_client(self, address: tuple[str, int], authkey: bytes, retry_seconds: float = 2.0) -> None:
+        """Keep a connection to the broker open and dispatch whatever it relays"""
+        while True:
+            try:
+                connection = socket.create_connection(address, timeout=HANDSHAKE_TIMEOUT)
+            except OSError:
+                time.sleep(retry_seconds)
+                continue
+
+            try:
+                connection.sendall(_digest(authkey, _recv_exactly(connection, CHALLENGE_SIZE)))
+                if _recv_exactly(connection, len(WELCOME)) != WELCOME:
+                    raise ValueError('unexpected handshake reply')
+                connection.settimeout(None)
+                self._broker = connection
+                while True:
+                    self._dispatch(recv_message(connection))
+            except (EOFError, OSError, ValueError):
+                pass
+            finally:
+                self._broker = None
+                connection.close()
+            time.sleep(retry_seconds)  # the broker went away (or refused our key)
+
+
+class EventBroker:
+    """
+    Local stand-in for a message broker: relays every message it receives
+    to every connected hub (one connection per gunicorn worker). Hubs must
+    answer an HMAC challenge keyed with the shared authkey before they are
+    relayed anything.
+    """
+
+    def __init__(self, address: tuple[str, int], authkey: bytes):
+        self._listener = socket.create_server(address)
+        self._authkey = authkey
+        self._connections: dict = {}
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._listener.getsockname()[:2]
+
+    def serve_forever(self) -> None:
+        while True:
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                return  # listener closed
+            threading.Thread(target=self._relay, args=(connection,), daemon=True).start()
+
+    def close(self) -> None:
+        _shutdown(self._listener)
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            _shutdown(connection)
+
+    def _authenticate(self, connection) -> bool:
+        challenge = os.urandom(CHALLENGE_SIZE)
+        connection.settimeout(HANDSHAKE_TIMEOUT)
+        connection.sendall(challenge)
+        answer = _recv_exactly(connection, len(challenge))
+        if not hmac.compare_digest(answer, _digest(self._authkey, challenge)):
+            return False
+        connection.sendall(WELCOME)
+        connection.settimeout(None)
+        return True
+
+    def _relay(self, connection) -> None:
+        try:
+            if not self._authenticate(connection):
+                return
+            with self._lock:
+                self._connections[connection] = threading.Lock()
+
+            while True:
+                message = recv_message(connection)
+                with self._lock:
+                    targets = list(self._connections.items())
+                for target, send_lock in targets:
+                    try:
+                        with send_lock:
+                            send_message(target, message)
+                    except OSError:
+                        self._drop(target)
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            self._drop(connection)
+
+    def _drop(self, connection) -> None:
+        with self._lock:
+            self._connections.pop(connection, None)
+        _shutdown(connection)
+
+
+hub = EventHub()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_committed_events(session):
+    for channels, event_name, data in session.info.pop(PENDING_EVENTS_KEY, []):
+        hub.publish(channels, event_name, data)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_rolled_back_events(session, previous_transaction):
+    # Savepoint rollbacks keep the outer transaction (and its events) alive
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_EVENTS_KEY, None)
@@ -6,7 +6,7 @@ from flask_cors import CORS
 
 # Initialize extensions
 db = SQLAlchemy()
-migrate = Migrate()
+migrate = Migrate(render_as_batch=True)  # SQLite can only ALTER columns by copying the table
 jwt = JWTManager()
 
 def init_extensions(app):
@@ -30,4 +30,44 @@ def init_extensions(app):
     setup_jwt_handlers(jwt)
     add_auth_context(app)
 
+    # Live update hub (optionally relayed across workers by a broker)
+    from App.events import hub
+    hub.init_app(app)
+
+    # Write-behind notification buffer (flushed when each transaction commits)
+    from App.notification_writer import notification_writer
+    notification_writer.init_app(app)
+
+    # Inbox strategy: fan out on read (default) or materialize inboxes on write
+    from App.inbox_fanout import inbox_fanout
+    inbox_fanout.init_app(app)
+
+    # Transactional outbox for external delivery channels (drained by `flask outbox worker`)
+    from App.outbox import outbox
+    outbox.init_app(app)
+
+    # In-memory grid of street coordinates for nearest-street lookups (loaded on first use)
+    from App.street_index import street_index
+    street_index.init_app(app)
+
+    # Hot driver status/location: served from memory, written behind to drivers
+    from App.driver_state import driver_state
+    driver_state.init_app(app)
+
+    # Driver GPS pings: per-driver ring buffers, flushed in bulk to driver_pings
+    from App.location_store import location_store
+    location_store.init_app(app)
+
+    # Arrival geofences around the streets of each driver's open stops (checked per ping)
+    from App.geofences import geofences
+    geofences.init_app(app)
+
+    # Route planner (caches distance matrices per set of streets)
+    from App.route_planner import route_planner
+    route_planner.init_app(app)
+
+    # Memoized ETAs per driver (recomputed after a new ping or a stop change)
+    from App.eta import eta_estimator
+    eta_estimator.init_app(app)
+
     return app
@@ -0,0 +1,202 @@
+import datetime as dt
+import math
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from App.events import hub
+from App.extensions import db
+from App.models.stop import Stop
+from App.models.street import Street
+from App.utils.clock import local_today
+from App.utils.geo import METERS_PER_DEGREE, Point, point_shape_m
+
+# Key under Session.info where drivers whose stops changed wait for the transaction to commit
+PENDING_FENCES_KEY = 'pending_geofences'
+ALL_DRIVERS = None  # pending marker: street geodata changed, every fence set is stale
+
+# Hub channel for stale fence sets, relayed to the other workers by the event broker
+GEOFENCES_CHANNEL = ('geofences', '')
+
+DEFAULT_RADIUS = 75.0  # meters around a street's point or polyline
+DEFAULT_TTL = 30.0  # seconds a fence set is trusted without hearing about changes
+
+
+class Fence(NamedTuple):
+    stop_id: int
+    street_name: str
+    day: dt.date  # the stop only fires on pings from its scheduled day (in the stops' timezone)
+    shape: tuple[Point, ...]
+    bounds: tuple[float, float, float, float]  # min/max latitude and longitude, padded by the radius
+
+
+class GeofenceIndex:
+    """
+    Per-driver geofences around the streets of each driver's open stops.
+
+    A driver's fence set is built with one query on their first ping and
+    kept until their stops (or street geodata) change. Checking a ping is a
+    bounding-box test per fence plus an exact distance for the few it falls
+    in, so it costs O(open stops) and never queries the database. A fence
+    fires when the driver enters it: the first ping inside after one outside
+    (or the first ping seen).
+
+    Changes committed by this process drop the affected sets right away. Those
+    made by other workers arrive through the event hub when EVENT_BROKER_URL
+    is set; otherwise a set is rebuilt once it is older than `ttl` seconds.
+    """
+
+    def __init__(self, radius: float = DEFAULT_RADIUS, enabled: bool = True, ttl: float | None = DEFAULT_TTL):
+        self.radius = radius
+        self.enabled = enabled
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+        self.clear()
+
+    def init_app(self, app) -> None:
+        self.radius = float(app.config.get('GEOFENCE_RADIUS', self.radius))
+        self.enabled = bool(app.config.get('GEOFENCE_ARRIVALS', self.enabled))
+        ttl = app.config.get('GEOFENCE_TTL', self.ttl)
+        self.ttl = float(ttl) if ttl else None
+        self.clear()
+
+        if app.config.get('EVENT_BROKER_URL') and self._listener is None:
+            self._listener = threading.Thread(target=self._apply_relayed_changes, name='geofence-events', daemon=True)
+            self._listener.start()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fences: dict[int, list[Fence]] = {}
+            self._loaded_at: dict[int, float] = {}  # monotonic time each set was built
+            self._inside: dict[int, set[int]] = {}  # stop ids each driver was inside at their last ping
+            self._generation = 0  # bumped by invalidate, so a load that raced one is not kept
+
+    def invalidate(self, driver_id: int | None = None) -> None:
+        """Rebuild one driver's fences (or everyone's) at their next ping"""
+        with self._lock:
+            self._generation += 1
+            if driver_id is None:
+                self._fences.clear()
+            else:
+                self._fences.pop(driver_id, None)
+
+    def fences(self, driver_id: int) -> list[Fence]:
+        fences = self._fences.get(driver_id)
+        if fences is None or self._expired(driver_id):
+            generation = self._generation
+            fences = self._load(driver_id)
+            with self._lock:
+                if generation == self._generation:
+                    self._fences[driver_id] = fences
+                    self._loaded_at[driver_id] = time.monotonic()
+        return fences
+
+    def _expired(self, driver_id: int) -> bool:
+        return self.ttl is not None and time.monotonic() - self._loaded_at.get(driver_id, 0.0) > self.ttl
+
+    def entered(self, driver_id: int, point: Point, day: dt.date) -> list[Fence]:
+        """Fences for 'day' that the driver is inside at point but was not at their previous ping"""
+        inside = []
+        lat, lon = point
+        for fence in self.fences(driver_id):
+            if fence.day != day:
+                continue
+            min_lat, max_lat, min_lon, max_lon = fence.bounds
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon and point_shape_m(point, fence.shape) <= self.radius:
+                inside.append(fence)
+
+        with self._lock:
+            before = self._inside.get(driver_id, set())
+            self._inside[driver_id] = {fence.stop_id for fence in inside}
+        return [fence for fence in inside if fence.stop_id not in before]
+
+    def _load(self, driver_id: int) -> list[Fence]:
+        since = dt.datetime.combine(local_today() - dt.timedelta(days=1), dt.time())
+        rows = db.session.execute(
+            db.select(Stop.id, Stop.street_name, Stop.scheduled_date, Street)
+            .join(Street, Street.name == Stop.street_name)
+            .where(
+                Stop.driver_id == driver_id,
+                Stop.has_arrived.is_(False),
+                Stop.scheduled_date >= since,
+                Street.latitude.is_not(None) | Street.path.is_not(None)
+            )
+        ).all()
+
+        fences = []
+        for stop_id, street_name, scheduled_date, street in rows:
+            shape = tuple(street.shape)
+            if shape:
+                fences.append(Fence(stop_id, street_name, scheduled_date.date(), shape, self._bounds(shape)))
+        return fences
+
+    def _bounds(self, shape: tuple[Point, ...]) -> tuple[float, float, float, float]:
+        lats = [lat for lat, _ in shape]
+        lons = [lon for _, lon in shape]
+        dlat = self.radius / METERS_PER_DEGREE
+        dlon = self.radius / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(min(89.0, max(map(abs, lats)) + dlat)))))
+        return min(lats) - dlat, max(lats) + dlat, min(lons) - dlon, max(lons) + dlon
+
+    def _apply_relayed_changes(self) -> None:
+        """Drop the fence sets that other workers reported stale through the broker"""
+        subscription = hub.subscribe([GEOFENCES_CHANNEL])
+        while True:
+            message = subscription.get(timeout=30)
+            if message is None or message.get('event') != 'geofences_stale':
+                continue
+            driver_ids = message['data']['driverIds']
+            if driver_ids is None:
+                self.invalidate()
+            else:
+                for driver_id in driver_ids:
+                    self.invalidate(driver_id)
+
+
+geofences = GeofenceIndex()
+
+
+def invalidate_on_commit(session, driver_id: int | None) -> None:
+    """Rebuild a driver's fences (None: everyone's) once this transaction commits; for Core/bulk writes to stops"""
+    session.info.setdefault(PENDING_FENCES_KEY, set()).add(driver_id)
+
+
+@event.listens_for(Stop, 'after_insert')
+@event.listens_for(Stop, 'after_update')
+@event.listens_for(Stop, 'after_delete')
+def _queue_stop_change(mapper, connection, stop):
+    session = object_session(stop)
+    if session is not None:
+        invalidate_on_commit(session, stop.driver_id)
+
+
+@event.listens_for(Street, 'after_update')
+def _queue_street_change(mapper, connection, street):
+    session = object_session(street)
+    if session is not None:
+        invalidate_on_commit(session, ALL_DRIVERS)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_fences(session):
+    pending = session.info.pop(PENDING_FENCES_KEY, None)
+    if not pending:
+        return
+    if ALL_DRIVERS in pending:
+        geofences.invalidate()
+        driver_ids = None
+    else:
+        driver_ids = sorted(pending)
+        for driver_id in driver_ids:
+            geofences.invalidate(driver_id)
+    # Other workers drop theirs too (this one again, harmlessly, when the broker echoes it)
+    hub.publish([GEOFENCES_CHANNEL], 'geofences_stale', {'driverIds': driver_ids})
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_fences(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_FENCES_KEY, None)
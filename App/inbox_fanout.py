@@ -0,0 +1,293 @@
+import logging
+import queue
+import threading
+import time
+from typing import Iterable
+
+from flask import current_app
+from sqlalchemy import and_, event
+
+from App.extensions import db
+from App.models.enums import NotificationType
+from App.models.inbox_entry import InboxEntry
+from App.models.notification import Notification
+from App.models.notification_counter import NotificationCounter, SCOPE_USER
+from App.models.notification_receipt import NotificationReceipt
+from App.models.user import Driver, Resident
+
+logger = logging.getLogger(__name__)
+
+# Inbox read strategies (INBOX_FANOUT config)
+FANOUT_ON_READ = 'read'    # inboxes are queried from the notifications table (default)
+FANOUT_ON_WRITE = 'write'  # inboxes are materialized into inbox_entries as notifications are created
+FANOUT_MODES = (FANOUT_ON_READ, FANOUT_ON_WRITE)
+
+# Key under Session.info where shared notifications wait for their transaction to commit
+PENDING_FANOUT_KEY = 'pending_inbox_fanout'
+
+DEFAULT_BACKFILL_LIMIT = 500
+DEFAULT_BATCH_SIZE = 200
+MAX_ATTEMPTS = 3
+
+# Notification types every driver sees, whoever they were addressed to
+DRIVER_TYPES = (NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value)
+
+
+class InboxFanout:
+    """
+    Fan-out-on-write inboxes.
+
+    In 'write' mode every new notification is copied into a compact
+    (user_id, notification_id, created_at, is_read) entry per user who can see
+    it, so reading an inbox is one range scan of that user's entries.
+    Direct notifications are fanned out inside the creating transaction;
+    street, global and driver-wide notifications are fanned out after commit
+    by a background thread, which bumps the affected inbox versions when done.
+    New users are backfilled with their most recent visible notifications.
+
+    In 'read' mode (the default) nothing is materialized and inboxes are
+    queried from the notifications table directly.
+    """
+
+    def __init__(
+        self,
+        mode: str = FANOUT_ON_READ,
+        backfill_limit: int = DEFAULT_BACKFILL_LIMIT,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        self.mode = mode
+        self.backfill_limit = backfill_limit
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        mode = app.config.get('INBOX_FANOUT', self.mode)
+        if mode not in FANOUT_MODES:
+            raise ValueError(f"INBOX_FANOUT must be one of {', '.join(FANOUT_MODES)}, not '{mode}'")
+        self.mode = mode
+        self.backfill_limit = int(app.config.get('INBOX_BACKFILL_LIMIT', self.backfill_limit))
+        self.batch_size = int(app.config.get('INBOX_FANOUT_BATCH_SIZE', self.batch_size))
+
+    @property
+    def materialized(self) -> bool:
+        return self.mode == FANOUT_ON_WRITE
+
+    # -- writing entries (caller's transaction) --------------------------------
+
+    def fan_out(self, notification_ids: Iterable[int], direct_only: bool = False) -> int:
+        """Write the missing entries of the given notifications; returns how many were written"""
+        notification_ids = list(notification_ids)
+        if not notification_ids:
+            return 0
+
+        audiences = self._audiences(direct_only=direct_only)
+        return self._insert(audiences, Notification.id.in_(notification_ids))
+
+    def backfill(self, user_id: int, limit: int | None = None) -> int:
+        """
+        Write a user's missing entries for notifications that have not expired,
+        newest first and at most 'limit' per branch (street, global, direct, ...)
+        """
+        written = 0
+        for audience, user_column in self._audiences():
+            stmt = audience.where(user_column == user_id, Notification.not_expired())
+            if limit is not None:
+                stmt = stmt.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit)
+            written += self._insert_from(stmt)
+        return written
+
+    def rebuild(self) -> int:
+        """Write every missing entry for notifications that have not expired (e.g. after switching to 'write')"""
+        return self._insert(self._audiences(), Notification.not_expired())
+
+    def mark_read(self, user_id: int, notification_ids: Iterable[int] | None = None) -> None:
+        """Flag a user's entries as read (all of them unless notification_ids is given)"""
+        if not self.materialized:
+            return
+
+        stmt = (
+            db.update(InboxEntry)
+            .where(InboxEntry.user_id == user_id, InboxEntry.is_read == False)
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
+        if notification_ids is not None:
+            stmt = stmt.where(InboxEntry.notification_id.in_(list(notification_ids)))
+        db.session.execute(stmt)
+
+    def mark_unread(self, notification_id: int) -> None:
+        """A coalesced notification re-surfaced: it is unread again for everyone"""
+        if not self.materialized:
+            return
+
+        db.session.execute(
+            db.update(InboxEntry)
+            .where(InboxEntry.notification_id == notification_id, InboxEntry.is_read == True)
+            .values(is_read=False)
+            .execution_options(synchronize_session=False)
+        )
+
+    def delete(self, notification_ids: Iterable[int]) -> None:
+        """Drop the entries of deleted notifications (done in either mode, in case it changed)"""
+        db.session.execute(
+            db.delete(InboxEntry)
+            .where(InboxEntry.notification_id.in_(list(notification_ids)))
+            .execution_options(synchronize_session=False)
+        )
+
+    def _audiences(self, direct_only: bool = False) -> list:
+        """(select of entry rows, user id column) for each way a user can see a notification"""
+        residents = Resident.__table__
+        drivers = Driver.__table__
+
+        def rows(users, visible):
+            is_read = (
+                db.select(NotificationReceipt.user_id)
+                .where(NotificationReceipt.user_id == users.c.id, NotificationReceipt.notification_id == Notification.id)
+                .exists()
+            )
+            already = (
+                db.select(InboxEntry.user_id)
+                .where(InboxEntry.user_id == users.c.id, InboxEntry.notification_id == Notification.id)
+                .exists()
+            )
+            stmt = (
+                db.select(users.c.id, Notification.id, Notification.created_at, is_read)
+                .select_from(Notification)
+                .join(users, visible)
+                .where(~already)
+            )
+            return stmt, users.c.id
+
+        # Same branches as Resident._inbox_branches(), each joined on its own index
+        audiences = [rows(residents, Notification.recipient_id == residents.c.id)]
+        if not direct_only:
+            audiences += [
+                rows(residents, and_(Notification.recipient_id.is_(None), Notification.street_name == residents.c.street_name)),
+                rows(residents, and_(Notification.recipient_id.is_(None), Notification.street_name.is_(None))),
+                rows(drivers, Notification.type.in_(DRIVER_TYPES)),
+            ]
+        return audiences
+
+    def _insert(self, audiences: list, *criteria) -> int:
+        return sum(self._insert_from(stmt.where(*criteria)) for stmt, _ in audiences)
+
+    @staticmethod
+    def _insert_from(stmt) -> int:
+        result = db.session.execute(
+            db.insert(InboxEntry).from_select(['user_id', 'notification_id', 'created_at', 'is_read'], stmt)
+        )
+        return result.rowcount or 0
+
+    # -- scheduling ------------------------------------------------------------
+
+    def on_created(self, session, notifications: Iterable[Notification]) -> None:
+        """
+        Called by the notification writer inside the creating transaction:
+        direct entries are written now, shared ones are queued for after commit.
+        """
+        if not self.materialized:
+            return
+
+        direct, shared = [], []
+        for notification in notifications:
+            if notification.recipient_id is not None:
+                direct.append(notification.id)
+            if notification.recipient_id is None or notification.type in DRIVER_TYPES:
+                shared.append(notification.id)
+
+        self.fan_out(direct, direct_only=True)
+        if shared:
+            session.info.setdefault(PENDING_FANOUT_KEY, []).extend(shared)
+
+    def submit_backfill(self, app, user_id: int) -> None:
+        """Backfill a new user's inbox in the background"""
+        if self.materialized:
+            self._submit(app, [('backfill', user_id)])
+
+    def wait(self) -> None:
+        """Block until everything queued so far has been fanned out"""
+        self._queue.join()
+
+    def _submit(self, app, tasks: list[tuple[str, int]]) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='inbox-fanout', daemon=True)
+                self._thread.start()
+        for kind, value in tasks:
+            self._queue.put((app, kind, value))
+
+    def _run(self) -> None:
+        while True:
+            tasks = [self._queue.get()]
+            # Coalesce whatever else is waiting into the same transaction
+            while len(tasks) < self.batch_size:
+                try:
+                    tasks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                by_app: dict = {}
+                for app, kind, value in tasks:
+                    by_app.setdefault(app, []).append((kind, value))
+                for app, work in by_app.items():
+                    self._process(app, work)
+            finally:
+                for _ in tasks:
+                    self._queue.task_done()
+
+    def _process(self, app, work: list[tuple[str, int]]) -> None:
+        notification_ids = [value for kind, value in work if kind == 'fanout']
+        user_ids = [value for kind, value in work if kind == 'backfill']
+
+        with app.app_context():
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    self.fan_out(notification_ids)
+                    for user_id in user_ids:
+                        self.backfill(user_id, limit=self.backfill_limit)
+                    self._bump_versions(notification_ids, user_ids)
+                    db.session.commit()
+                    return
+                except Exception:
+                    db.session.rollback()
+                    if attempt == MAX_ATTEMPTS:
+                        # Entries can be rebuilt with `flask notifications rebuild-inbox`
+                        logger.exception("Inbox fan-out failed for notifications %s, users %s", notification_ids, user_ids)
+                        return
+                    time.sleep(0.1 * attempt)
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def _bump_versions(notification_ids: list[int], user_ids: list[int]) -> None:
+        """New entries change inboxes whose version already moved at commit: move it again"""
+        scopes = [(SCOPE_USER, str(user_id)) for user_id in user_ids]
+        if notification_ids:
+            rows = db.session.execute(
+                db.select(Notification.type, Notification.recipient_id, Notification.street_name)
+                .where(Notification.id.in_(notification_ids))
+                .distinct()
+            ).all()
+            for row in rows:
+                scopes += NotificationCounter.scopes_of(*row)
+        NotificationCounter.bump(scopes)
+
+
+inbox_fanout = InboxFanout()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _fan_out_committed_notifications(session):
+    notification_ids = session.info.pop(PENDING_FANOUT_KEY, None)
+    if notification_ids:
+        inbox_fanout._submit(current_app._get_current_object(), [('fanout', i) for i in notification_ids])
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_fanout(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_FANOUT_KEY, None)
@@ -0,0 +1,76 @@
+import logging
+import threading
+from typing import Callable
+
+from App.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """
+    Run a function every `interval` seconds on a daemon thread, inside an
+    app context. The scoped session is removed after every run so each run
+    starts with a fresh transaction.
+    """
+
+    def __init__(self, app, name: str, interval: float, func: Callable[[], object]):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> 'PeriodicJob':
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self) -> None:
+        with self.app.app_context():
+            try:
+                self.func()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Periodic job %s failed", self.name)
+            finally:
+                db.session.remove()
+
+    def run_forever(self) -> None:
+        """Run now and then every interval in the calling thread, e.g. a dedicated CLI process"""
+        self.run_once()
+        self._run()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def init_jobs(app) -> list[PeriodicJob]:
+    """
+    Start the flush jobs for this process's in-memory buffers (pings, deferred
+    driver state). Only called by create_app when BACKGROUND_JOBS is set, as it
+    is for the gunicorn workers that serve requests; CLI commands and tests
+    leave it off. Cluster-wide maintenance such as the notification purge runs
+    from its own command instead (flask notifications purge --every).
+    """
+    jobs: list[PeriodicJob] = []
+
+    from App.location_store import location_store
+    if location_store.flush_interval:
+        jobs.append(PeriodicJob(app, 'ping-flush', location_store.flush_interval, location_store.flush))
+
+    from App.driver_state import driver_state, DURABILITY_DEFERRED
+    if driver_state.durability == DURABILITY_DEFERRED and driver_state.flush_interval:
+        jobs.append(PeriodicJob(app, 'driver-state-flush', driver_state.flush_interval, driver_state.flush))
+
+    for job in jobs:
+        job.start()
+    app.extensions['periodic_jobs'] = jobs
+    return jobs
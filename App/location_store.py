@@ -0,0 +1,278 @@
+import datetime as dt
+import logging
+import math
+import threading
+from array import array
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from App.extensions import db
+from App.models.driver_ping import DriverPing
+from App.models.user import Driver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RING_SIZE = 720  # pings kept in memory per driver (an hour at one every 5 seconds)
+DEFAULT_FLUSH_SIZE = 2000  # unflushed pings that trigger a write from the ingesting request
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds between background flushes
+DEFAULT_MAX_PENDING = 100000  # unflushed pings kept while the database is unavailable; the oldest go first
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_NO_SPEED = math.nan  # arrays hold floats only; a missing speed is stored as NaN
+
+
+class Ping(NamedTuple):
+    driver_id: int
+    ts: float  # seconds since the epoch, UTC
+    latitude: float
+    longitude: float
+    speed: float | None = None
+
+    @property
+    def recorded_at(self) -> dt.datetime:
+        return _EPOCH + dt.timedelta(seconds=self.ts)
+
+    def get_json(self) -> dict:
+        return {
+            'driverId': self.driver_id,
+            'ts': self.recorded_at.isoformat(),
+            'lat': self.latitude,
+            'lon': self.longitude,
+            'speed': self.speed
+        }
+
+
+def to_timestamp(value: dt.datetime) -> float:
+    """Seconds since the epoch for a naive-UTC or aware datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH).total_seconds()
+
+
+class PingRing:
+    """Fixed-capacity ring of one driver's most recent pings, in arrival order, in flat float arrays"""
+
+    __slots__ = ('capacity', 'ts', 'lat', 'lon', 'speed', 'start', 'size', 'newest')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array('d', bytes(8 * capacity))
+        self.lat = array('d', bytes(8 * capacity))
+        self.lon = array('d', bytes(8 * capacity))
+        self.speed = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+        self.newest = -1  # slot of the ping with the latest timestamp
+
+    def append(self, ts: float, lat: float, lon: float, speed: float) -> None:
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+
+        evicted_newest = slot == self.newest
+        self.ts[slot], self.lat[slot], self.lon[slot], self.speed[slot] = ts, lat, lon, speed
+        if evicted_newest:
+            # Only when every later arrival was older (a late burst): rescan
+            self.newest = max(self._slots(), key=self.ts.__getitem__)
+        elif self.newest < 0 or ts >= self.ts[self.newest]:
+            self.newest = slot
+
+    def ping(self, driver_id: int, slot: int) -> Ping:
+        speed = self.speed[slot]
+        return Ping(driver_id, self.ts[slot], self.lat[slot], self.lon[slot], None if math.isnan(speed) else speed)
+
+    def _slots(self):
+        return ((self.start + i) % self.capacity for i in range(self.size))
+
+    def since(self, driver_id: int, ts: float) -> list[Ping]:
+        return sorted(
+            (self.ping(driver_id, slot) for slot in self._slots() if self.ts[slot] >= ts),
+            key=lambda p: p.ts
+        )
+
+
+class LocationStore:
+    """
+    Compact in-memory store for high-frequency driver GPS pings.
+
+    Every ping goes into its driver's ring buffer (recent track and latest
+    position, answered without the database) and onto a pending batch kept
+    in parallel arrays. The batch is written to the append-only driver_pings
+    table with one executemany INSERT when it reaches `flush_size`, and
+    otherwise every `flush_interval` seconds by a background job. Pings
+    still waiting to be written are merged into replay queries, so history
+    reads never miss them in this process. When the bulk INSERT fails, pings
+    of drivers that no longer exist are dropped and the rest are written one
+    by one, so a bad row cannot hold back the rows behind it. Only when the
+    database is unavailable is the batch kept for the next flush, up to
+    `max_pending` pings.
+    """
+
+    def __init__(
+        self,
+        ring_size: int = DEFAULT_RING_SIZE,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        flush_interval: float | None = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ):
+        self.ring_size = ring_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.clear()
+
+    def init_app(self, app) -> None:
+        self.ring_size = int(app.config.get('PING_RING_SIZE', self.ring_size))
+        self.flush_size = int(app.config.get('PING_FLUSH_SIZE', self.flush_size))
+        interval = app.config.get('PING_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_interval = float(interval) if interval else None
+        self.max_pending = int(app.config.get('PING_MAX_PENDING', self.max_pending))
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop rings and unflushed pings (tests, re-init)"""
+        with self._lock:
+            self._rings: dict[int, PingRing] = {}
+            self._pending = self._empty_batch()
+            self._flushing = self._empty_batch()
+
+    @staticmethod
+    def _empty_batch() -> tuple[array, ...]:
+        # driver ids, then ts, lat, lon, speed
+        return array('q'), array('d'), array('d'), array('d'), array('d')
+
+    # -- writes ----------------------------------------------------------------
+
+    def record(self, pings: Iterable[Ping]) -> int:
+        """Buffer validated pings; returns how many. Call flush() when flush_due()"""
+        count = 0
+        with self._lock:
+            rings, (drivers, tss, lats, lons, speeds) = self._rings, self._pending
+            for driver_id, ts, lat, lon, speed in pings:
+                speed = _NO_SPEED if speed is None else speed
+                ring = rings.get(driver_id)
+                if ring is None:
+                    ring = rings[driver_id] = PingRing(self.ring_size)
+                ring.append(ts, lat, lon, speed)
+                drivers.append(driver_id)
+                tss.append(ts)
+                lats.append(lat)
+                lons.append(lon)
+                speeds.append(speed)
+                count += 1
+        return count
+
+    def pending_count(self) -> int:
+        return len(self._pending[0])
+
+    def flush_due(self) -> bool:
+        return self.pending_count() >= self.flush_size
+
+    def flush(self) -> int:
+        """Write every unflushed ping with one bulk INSERT and commit; returns how many"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, self._empty_batch()
+                self._flushing = batch
+            drivers, tss, lats, lons, speeds = batch
+            if not drivers:
+                return 0
+
+            rows = [
+                {
+                    'driver_id': drivers[i],
+                    'recorded_at': _EPOCH + dt.timedelta(seconds=tss[i]),
+                    'latitude': lats[i],
+                    'longitude': lons[i],
+                    'speed': None if math.isnan(speeds[i]) else speeds[i]
+                }
+                for i in range(len(drivers))
+            ]
+            try:
+                written = self._write(rows)
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    # Put the batch back in front of anything that arrived meanwhile
+                    for kept, arrived in zip(batch, self._pending):
+                        kept.extend(arrived)
+                    overflow = len(batch[0]) - self.max_pending
+                    if overflow > 0:
+                        for column in batch:
+                            del column[:overflow]
+                    self._pending, self._flushing = batch, self._empty_batch()
+                if overflow > 0:
+                    logger.warning("Dropped %d unflushed pings over PING_MAX_PENDING", overflow)
+                raise
+
+            with self._lock:
+                self._flushing = self._empty_batch()
+            return written
+
+    def _write(self, rows: list[dict]) -> int:
+        """Insert and commit rows, isolating any that cannot be written; returns how many were"""
+        try:
+            db.session.execute(db.insert(DriverPing), rows)
+            db.session.commit()
+            return len(rows)
+        except (IntegrityError, DataError) as e:
+            db.session.rollback()
+            logger.warning("Bulk write of %d pings failed, writing them one by one: %s", len(rows), e.orig)
+
+        # Pings of drivers deleted since they were taken in have nowhere to go
+        ids = {row['driver_id'] for row in rows}
+        known = set(db.session.execute(db.select(Driver.id).where(Driver.id.in_(ids))).scalars())
+
+        written = 0
+        for row in rows:
+            if row['driver_id'] not in known:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(DriverPing), [row])
+                written += 1
+            except (IntegrityError, DataError):
+                pass
+        db.session.commit()
+
+        if written < len(rows):
+            logger.warning("Dropped %d pings that could not be written", len(rows) - written)
+        return written
+
+    # -- reads -----------------------------------------------------------------
+
+    def latest(self, driver_id: int) -> Ping | None:
+        """Newest ping (by timestamp) received by this process for the driver"""
+        with self._lock:
+            ring = self._rings.get(driver_id)
+            if ring is None or ring.size == 0:
+                return None
+            return ring.ping(driver_id, ring.newest)
+
+    def recent(self, driver_id: int, since: dt.datetime | None = None) -> list[Ping]:
+        """The driver's buffered track (oldest first), optionally from 'since'"""
+        with self._lock:
+            ring = self._rings.get(driver_id)
+            if ring is None:
+                return []
+            return ring.since(driver_id, to_timestamp(since) if since else -math.inf)
+
+    def unflushed(self, driver_id: int, start: float, end: float) -> list[Ping]:
+        """Pings for the driver in [start, end) that are not in driver_pings yet"""
+        found = []
+        with self._lock:
+            for drivers, tss, lats, lons, speeds in (self._flushing, self._pending):
+                for i in range(len(drivers)):
+                    if drivers[i] == driver_id and start <= tss[i] < end:
+                        speed = speeds[i]
+                        found.append(Ping(driver_id, tss[i], lats[i], lons[i], None if math.isnan(speed) else speed))
+        return found
+
+
+location_store = LocationStore()
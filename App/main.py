@@ -6,6 +6,7 @@ from werkzeug.datastructures import  FileStorage
 
 from App.extensions import init_extensions, jwt
 from App.config import load_config
+from App.jobs import init_jobs
 from App.views import views, setup_admin
 
 def add_views(app):
@@ -25,6 +26,10 @@ def create_app(overrides={}):
     # Setup admin
     setup_admin(app)
 
+    # Buffer flush jobs, only in processes that serve requests (FLASK_BACKGROUND_JOBS)
+    if app.config.get('BACKGROUND_JOBS'):
+        init_jobs(app)
+
     # JWT error handlers
     @jwt.invalid_token_loader
     @jwt.unauthorized_loader
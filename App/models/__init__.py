@@ -3,4 +3,9 @@ from .enums import DriverStatus, NotificationType
 from .stop import Stop
 from .street import Street
 from .stop_request import StopRequest
-from .notification import Notification
\ No newline at end of file
+from .notification import Notification
+from .notification_receipt import NotificationReceipt
+from .notification_counter import NotificationCounter
+from .inbox_entry import InboxEntry
+from .outbox_message import OutboxMessage
+from .driver_ping import DriverPing
@@ -0,0 +1,39 @@
+from App.extensions import db
+import datetime as dt
+from sqlalchemy import Index
+
+
+class DriverPing(db.Model):
+    """
+    Append-only history of driver GPS positions. Rows are written in bulk by
+    the location store (never one ORM object per ping) and only read back by
+    time-range replay queries.
+    """
+    __tablename__ = 'driver_pings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id', ondelete='CASCADE'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)  # UTC, as reported by the van
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    speed = db.Column(db.Float, nullable=True)  # meters per second
+
+    __table_args__ = (
+        Index('idx_driver_pings_driver_recorded', 'driver_id', 'recorded_at'),
+    )
+
+    def __init__(self, driver_id: int, recorded_at: dt.datetime, latitude: float, longitude: float, speed: float | None = None):
+        self.driver_id = driver_id
+        self.recorded_at = recorded_at
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+
+    def get_json(self) -> dict:
+        return {
+            'driverId': self.driver_id,
+            'ts': self.recorded_at.isoformat() if self.recorded_at else None,
+            'lat': self.latitude,
+            'lon': self.longitude,
+            'speed': self.speed
+        }
@@ -37,3 +37,16 @@ class NotificationPriority(Enum):
     NORMAL: str = "normal"
     HIGH: str = "high"
     URGENT: str = "urgent"
+
+
+class DeliveryChannel(Enum):
+    SMS: str = "sms"
+    EMAIL: str = "email"
+    PUSH: str = "push"
+
+
+class OutboxStatus(Enum):
+    PENDING: str = "pending"
+    SENDING: str = "sending"
+    DELIVERED: str = "delivered"
+    FAILED: str = "failed"
@@ -0,0 +1,36 @@
+from App.extensions import db
+import datetime as dt
+from sqlalchemy import Index
+
+
+class InboxEntry(db.Model):
+    """
+    Materialized inbox row: one per (user, visible notification), written only
+    when inboxes fan out on write (INBOX_FANOUT = 'write'). created_at is the
+    notification's, so a page of an inbox is one (user_id, created_at, id) range scan.
+    """
+    __tablename__ = 'inbox_entries'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index('idx_inbox_entries_user_created', 'user_id', 'created_at', 'notification_id'),
+        Index('idx_inbox_entries_notification', 'notification_id'),
+    )
+
+    def __init__(self, user_id: int, notification_id: int, created_at: dt.datetime, is_read: bool = False):
+        self.user_id = user_id
+        self.notification_id = notification_id
+        self.created_at = created_at
+        self.is_read = is_read
+
+    def get_json(self) -> dict:
+        return {
+            'userId': self.user_id,
+            'notificationId': self.notification_id,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'isRead': self.is_read
+        }
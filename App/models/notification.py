@@ -1,9 +1,13 @@
 from App.extensions import db
 from .street import Street
 from .enums import NotificationType, NotificationPriority, NotificationCategory
+from .notification_receipt import NotificationReceipt
+from .notification_counter import NotificationCounter
+from App.events import hub
 import datetime as dt
-from typing import TYPE_CHECKING, Optional
-from sqlalchemy import Index
+from operator import attrgetter
+from typing import TYPE_CHECKING, Iterable, Optional
+from sqlalchemy import DDL, Index, event, or_, tuple_, union_all
 
 if TYPE_CHECKING:
     from .user import User
@@ -32,15 +36,35 @@ class Notification(db.Model):
     # Timestamps
     created_at = db.Column(db.DateTime, nullable=False)
     read_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)  # null never expires
+
+    # Coalescing: repeats of the same street event within a window fold into one row
+    coalesce_key = db.Column(db.String(300), nullable=True)  # street|type|window, null never coalesces
+    occurrences = db.Column(db.Integer, nullable=False, default=1)
+    last_seen_at = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     recipient = db.relationship('User', backref='notifications', lazy='joined')
 
-    # Indexes for performance
+    # Indexes for performance (id is the keyset tie-breaker for pagination).
+    # Each inbox branch walks one (key, created_at, id) index newest-first; the
+    # trailing columns cover the branch filters so the walk never visits the table.
     __table_args__ = (
-        Index('idx_notifications_recipient', 'recipient_id', 'is_read'),
-        Index('idx_notifications_street', 'street_name', 'created_at'),
-        Index('idx_notifications_type', 'type', 'created_at'),
+        # Partial: only direct rows, so shared-row branches (recipient_id IS NULL) never pick them
+        Index(
+            'idx_notifications_recipient', 'recipient_id', 'is_read',
+            sqlite_where=db.text('recipient_id IS NOT NULL'),
+            postgresql_where=db.text('recipient_id IS NOT NULL')
+        ),
+        Index(
+            'idx_notifications_recipient_created', 'recipient_id', 'created_at', 'id', 'expires_at',
+            sqlite_where=db.text('recipient_id IS NOT NULL'),
+            postgresql_where=db.text('recipient_id IS NOT NULL')
+        ),
+        Index('idx_notifications_street', 'street_name', 'created_at', 'id', 'recipient_id', 'expires_at'),
+        Index('idx_notifications_type', 'type', 'created_at', 'id', 'expires_at'),
+        Index('idx_notifications_expires', 'expires_at'),
+        Index('idx_notifications_coalesce', 'coalesce_key', unique=True),
     )
 
     def __init__(
@@ -49,9 +73,10 @@ class Notification(db.Model):
         message: str,
         notification_type: NotificationType,
         recipient: Optional['User'] = None,
-        street: Optional[Street] = None,
+        street: Optional[Street | str] = None,  # a Street or just its name
         category: Optional[NotificationCategory] = None,
-        priority: Optional[NotificationPriority] = None
+        priority: Optional[NotificationPriority] = None,
+        expires_in_hours: Optional[int] = None
     ):
         self.title = title
         self.message = message
@@ -71,12 +96,24 @@ class Notification(db.Model):
 
         # Street context
         if street:
-            self.street_name = street.name
+            self.street_name = street if isinstance(street, str) else street.name
 
         # Timestamps
         self.created_at = dt.datetime.utcnow()
+        self.expires_at = self.created_at + dt.timedelta(hours=expires_in_hours) if expires_in_hours else None
+        self.last_seen_at = self.created_at
+        self.occurrences = 1
         self.is_read = False
 
+    @staticmethod
+    def not_expired(now: Optional[dt.datetime] = None):
+        """SQL predicate excluding notifications past their expiry"""
+        now = now or dt.datetime.utcnow()
+        return or_(Notification.expires_at.is_(None), Notification.expires_at > now)
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= dt.datetime.utcnow()
+
     def mark_as_read(self) -> bool:
         """Mark notification as read"""
         if not self.is_read:
@@ -91,69 +128,250 @@ class Notification(db.Model):
                 return False
         return True
 
+    def mark_as_read_by(self, user: 'User') -> bool:
+        """Record a read receipt for one user without touching other recipients"""
+        if db.session.get(NotificationReceipt, (user.id, self.id)):
+            return True
+
+        now = dt.datetime.utcnow()
+        db.session.add(NotificationReceipt(user_id=user.id, notification_id=self.id, read_at=now))
+
+        # Direct notifications keep the row-level flag in sync for older clients
+        if self.recipient_id == user.id and not self.is_read:
+            self.is_read = True
+            self.read_at = now
+            db.session.add(self)
+
+        try:
+            # Reads change this user's inbox version and unread count but nobody else's
+            direct = self.recipient_id == user.id
+            NotificationCounter.record_read(user.id, direct=int(direct), shared=int(not direct))
+
+            from App.inbox_fanout import inbox_fanout
+            inbox_fanout.mark_read(user.id, [self.id])
+            db.session.commit()
+            return True
+        except Exception:
+            db.session.rollback()
+            return False
+
+    def publish_on_commit(self) -> None:
+        """Push this notification to live subscribers once the current transaction commits"""
+        hub.publish_on_commit(db.session, NotificationCounter.scopes_for(self), 'notification', self.get_json())
+
     def get_age_in_minutes(self) -> int:
         """Get notification age in minutes"""
         return int((dt.datetime.utcnow() - self.created_at).total_seconds() / 60)
 
-    def get_json(self) -> dict:
-        return {
-            'id': self.id,
-            'type': self.type,
-            'category': self.category,
-            'priority': self.priority,
-            'title': self.title,
-            'message': self.message,
-            'streetName': self.street_name,
-            'recipientId': self.recipient_id,
-            'recipientType': self.recipient_type,
-            'isRead': self.is_read,
-            'isGlobal': self.is_global,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'readAt': self.read_at.isoformat() if self.read_at else None,
-            'ageInMinutes': self.get_age_in_minutes()
-        }
+    def get_json(self, read_at: Optional[dt.datetime] = None) -> dict:
+        """Serialize the notification; read_at is the viewing user's receipt time, if any"""
+        return serialize_notifications([(*_json_values(self), read_at)])[0]
 
     def to_api_dict(self) -> dict:
         """Enhanced API serialization for notifications"""
-        return {
-            'id': self.id,
-            'type': self.type,
-            'category': self.category,
-            'priority': self.priority,
-            'title': self.title,
-            'message': self.message,
-            'streetName': self.street_name,
-            'recipient': {
-                'id': self.recipient.id,
-                'name': self.recipient.get_fullname(),
-                'type': self.recipient.type
-            } if self.recipient else None,
-            'isRead': self.is_read,
-            'isGlobal': self.is_global,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'readAt': self.read_at.isoformat() if self.read_at else None,
-            'ageInMinutes': self.get_age_in_minutes(),
-            'formattedCreatedAt': self.format_created_at()
-        }
+        return serialize_notifications_api([self])[0]
 
     def format_created_at(self) -> str:
         """Format created_at for display"""
-        if not self.created_at:
-            return ""
-
-        now = dt.datetime.utcnow()
-        diff = now - self.created_at
-
-        if diff.days > 0:
-            return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hour{'s' if hours > 1 else ''} ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-        else:
-            return "Just now"
+        return _format_age(self.created_at, dt.datetime.utcnow())
 
     def to_string(self):
         return f"[Created {self.created_at}]\t{self.message}"
+
+
+# Columns the batch serializers read, in row order. Select these (plus an
+# optional receipt read_at) to serialize a list without loading ORM objects.
+JSON_COLUMNS = (
+    Notification.id,
+    Notification.type,
+    Notification.category,
+    Notification.priority,
+    Notification.title,
+    Notification.message,
+    Notification.street_name,
+    Notification.recipient_id,
+    Notification.recipient_type,
+    Notification.is_read,
+    Notification.is_global,
+    Notification.created_at,
+    Notification.read_at,
+    Notification.expires_at,
+    Notification.occurrences,
+    Notification.last_seen_at,
+)
+
+_json_values = attrgetter(*(column.key for column in JSON_COLUMNS))
+_MINUTE = dt.timedelta(minutes=1)
+
+
+def merge_newest(branches: list, limit: Optional[int] = None, after: Optional[tuple[dt.datetime, int]] = None):
+    """
+    Newest-first top-N over several disjoint branches, each a select of
+    (Notification.id, Notification.created_at) with its own WHERE clause.
+    Every branch is keyset-filtered, ordered and limited on its own so it can
+    walk its index; the branches are then merged with UNION ALL and cut to
+    the overall top-N. Returns a subquery with 'id' and 'created_at' columns.
+    """
+    newest_first = (Notification.created_at.desc(), Notification.id.desc())
+
+    parts = []
+    for branch in branches:
+        if after is not None:
+            branch = branch.where(tuple_(Notification.created_at, Notification.id) < tuple_(*after))
+        branch = branch.order_by(*newest_first)
+        if limit is not None:
+            branch = branch.limit(limit)
+        # SQLite rejects ORDER BY/LIMIT directly inside a compound select
+        part = branch.subquery()
+        parts.append(db.select(part.c.id, part.c.created_at))
+
+    merged = (parts[0] if len(parts) == 1 else union_all(*parts)).subquery()
+    stmt = db.select(merged.c.id, merged.c.created_at).order_by(merged.c.created_at.desc(), merged.c.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt.subquery('newest')
+
+
+def _format_age(created_at: Optional[dt.datetime], now: dt.datetime) -> str:
+    if not created_at:
+        return ""
+
+    diff = now - created_at
+
+    if diff.days > 0:
+        return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
+    elif diff.seconds > 3600:
+        hours = diff.seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    elif diff.seconds > 60:
+        minutes = diff.seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+    else:
+        return "Just now"
+
+
+def serialize_notifications(rows: Iterable, now: Optional[dt.datetime] = None) -> list[dict]:
+    """
+    Serialize many notifications in the get_json() shape with a single "now".
+    Rows are Notification objects or tuples of JSON_COLUMNS values, optionally
+    followed by the viewing user's receipt read_at.
+    """
+    now = now or dt.datetime.utcnow()
+    width = len(JSON_COLUMNS)
+    result = []
+    append = result.append
+
+    for row in rows:
+        if isinstance(row, Notification):
+            row = _json_values(row)
+        (
+            id, type, category, priority, title, message, street_name, recipient_id,
+            recipient_type, is_read, is_global, created_at, row_read_at, expires_at,
+            occurrences, last_seen_at
+        ) = row[:width]
+        read_at = (row[width] if len(row) > width else None) or row_read_at
+
+        append({
+            'id': id,
+            'type': type,
+            'category': category,
+            'priority': priority,
+            'title': title,
+            'message': message,
+            'streetName': street_name,
+            'recipientId': recipient_id,
+            'recipientType': recipient_type,
+            'isRead': is_read or read_at is not None,
+            'isGlobal': is_global,
+            'createdAt': created_at.isoformat() if created_at else None,
+            'readAt': read_at.isoformat() if read_at else None,
+            'expiresAt': expires_at.isoformat() if expires_at else None,
+            'occurrences': occurrences,
+            'lastSeenAt': last_seen_at.isoformat() if last_seen_at else None,
+            'ageInMinutes': (now - created_at) // _MINUTE if created_at else 0
+        })
+
+    return result
+
+
+def serialize_notifications_api(rows: Iterable, now: Optional[dt.datetime] = None) -> list[dict]:
+    """
+    Serialize many notifications in the to_api_dict() shape with a single "now".
+    Rows are Notification objects or tuples of JSON_COLUMNS values followed by
+    the recipient's full name (None when there is no recipient).
+    """
+    now = now or dt.datetime.utcnow()
+    width = len(JSON_COLUMNS)
+    result = []
+    append = result.append
+
+    for row in rows:
+        if isinstance(row, Notification):
+            recipient = row.recipient
+            recipient_name = recipient.get_fullname() if recipient else None
+            row = _json_values(row)
+        else:
+            recipient_name = row[width] if len(row) > width else None
+        (
+            id, type, category, priority, title, message, street_name, recipient_id,
+            recipient_type, is_read, is_global, created_at, read_at, expires_at,
+            occurrences, last_seen_at
+        ) = row[:width]
+
+        append({
+            'id': id,
+            'type': type,
+            'category': category,
+            'priority': priority,
+            'title': title,
+            'message': message,
+            'streetName': street_name,
+            'recipient': {
+                'id': recipient_id,
+                'name': recipient_name,
+                'type': recipient_type
+            } if recipient_name is not None else None,
+            'isRead': is_read,
+            'isGlobal': is_global,
+            'createdAt': created_at.isoformat() if created_at else None,
+            'readAt': read_at.isoformat() if read_at else None,
+            'expiresAt': expires_at.isoformat() if expires_at else None,
+            'occurrences': occurrences,
+            'lastSeenAt': last_seen_at.isoformat() if last_seen_at else None,
+            'ageInMinutes': (now - created_at) // _MINUTE if created_at else 0,
+            'formattedCreatedAt': _format_age(created_at, now)
+        })
+
+    return result
+
+
+# Full-text search over title + message.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# Postgres: a GIN index on the tsvector expression below (queries must use the same expression).
+SEARCH_TABLE = 'notifications_fts'
+SEARCH_VECTOR_SQL = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(message, ''))"
+
+SQLITE_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, message, content='notifications', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON notifications BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, message) VALUES (new.id, new.title, new.message); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON notifications BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, message) VALUES ('delete', old.id, old.title, old.message); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, message ON notifications BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, message) VALUES ('delete', old.id, old.title, old.message); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, message) VALUES (new.id, new.title, new.message); END",
+)
+POSTGRES_SEARCH_DDL = (
+    f"CREATE INDEX IF NOT EXISTS idx_notifications_search ON notifications USING gin (({SEARCH_VECTOR_SQL}))",
+)
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Notification.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(Notification.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+event.listen(
+    Notification.__table__,
+    'before_drop',
+    DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect='sqlite')
+)
@@ -0,0 +1,118 @@
+from App.extensions import db
+from typing import TYPE_CHECKING
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+
+if TYPE_CHECKING:
+    from .notification import Notification
+
+# Scopes a notification (or a read) can change
+SCOPE_GLOBAL = 'global'
+SCOPE_STREET = 'street'
+SCOPE_TYPE = 'type'
+SCOPE_USER = 'user'
+
+
+class NotificationCounter(db.Model):
+    """
+    Per-scope change version and maintained counts (global, street, notification type or user).
+
+    total       - notifications in the scope (for user rows: direct notifications)
+    read        - user rows only: direct notifications the user has read
+    shared_read - user rows only: street/global notifications the user has read
+                  (of their current street: moving a resident moves these too)
+    """
+    __tablename__ = 'notification_counters'
+
+    scope = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True, default='')
+    version = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    read = db.Column(db.Integer, nullable=False, default=0)
+    shared_read = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, scope: str, key: str = '', version: int = 0, total: int = 0, read: int = 0, shared_read: int = 0):
+        self.scope = scope
+        self.key = key
+        self.version = version
+        self.total = total
+        self.read = read
+        self.shared_read = shared_read
+
+    @staticmethod
+    def scopes_for(notification: 'Notification') -> list[tuple[str, str]]:
+        """Scopes whose inboxes see the given notification"""
+        return NotificationCounter.scopes_of(notification.type, notification.recipient_id, notification.street_name)
+
+    @staticmethod
+    def scopes_of(notification_type: str, recipient_id: int | None, street_name: str | None) -> list[tuple[str, str]]:
+        """Scopes for a notification given its raw column values"""
+        scopes = [(SCOPE_TYPE, notification_type)]
+
+        if recipient_id is not None:
+            scopes.append((SCOPE_USER, str(recipient_id)))
+        elif street_name:
+            scopes.append((SCOPE_STREET, street_name))
+        else:
+            scopes.append((SCOPE_GLOBAL, ''))
+
+        return scopes
+
+    @staticmethod
+    def increment(scope: str, key: str = '', **deltas: int) -> None:
+        """
+        Bump a scope's version and add the given deltas to its counters
+        inside the caller's transaction. Missing rows are created; the
+        caller is responsible for committing.
+        """
+        values = {'version': NotificationCounter.version + 1}
+        for column, delta in deltas.items():
+            if delta:
+                values[column] = getattr(NotificationCounter, column) + delta
+
+        stmt = (
+            db.update(NotificationCounter)
+            .where(NotificationCounter.scope == scope, NotificationCounter.key == key)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.execute(stmt).rowcount:
+            return
+
+        try:
+            with db.session.begin_nested():
+                row = {'scope': scope, 'key': key, 'version': 1, 'total': 0, 'read': 0, 'shared_read': 0}
+                db.session.execute(db.insert(NotificationCounter).values(**{**row, **deltas}))
+        except IntegrityError:
+            # Another transaction created the row first
+            db.session.execute(stmt)
+
+    @staticmethod
+    def bump(scopes) -> None:
+        """Increment the version of each scope without changing its counts"""
+        for scope, key in sorted(set(scopes)):
+            NotificationCounter.increment(scope, key)
+
+    @staticmethod
+    def record_read(user_id: int, direct: int = 0, shared: int = 0) -> None:
+        """Count newly written read receipts for a user"""
+        NotificationCounter.increment(SCOPE_USER, str(user_id), read=direct, shared_read=shared)
+
+    @staticmethod
+    def get_counters(scopes) -> dict[tuple[str, str], 'NotificationCounter']:
+        """Fetch several scope rows with one primary-key lookup query"""
+        scopes = list(scopes)
+        if not scopes:
+            return {}
+
+        stmt = (
+            db.select(NotificationCounter)
+            .where(tuple_(NotificationCounter.scope, NotificationCounter.key).in_(scopes))
+            .execution_options(populate_existing=True)  # counters are updated with Core statements
+        )
+        return {(row.scope, row.key): row for row in db.session.execute(stmt).scalars()}
+
+    @staticmethod
+    def get_versions(scopes) -> dict[tuple[str, str], int]:
+        """Fetch the versions of several scopes with one primary-key lookup query"""
+        return {scope: row.version for scope, row in NotificationCounter.get_counters(scopes).items()}
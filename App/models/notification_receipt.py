@@ -0,0 +1,29 @@
+from App.extensions import db
+import datetime as dt
+from sqlalchemy import Index
+
+
+class NotificationReceipt(db.Model):
+    """Per-user read receipt for a notification (shared street/global rows included)"""
+    __tablename__ = 'notification_receipts'
+
+    # Composite primary key doubles as the (user, notification) lookup index
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='CASCADE'), primary_key=True)
+    read_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('idx_notification_receipts_notification', 'notification_id'),
+    )
+
+    def __init__(self, user_id: int, notification_id: int, read_at: dt.datetime | None = None):
+        self.user_id = user_id
+        self.notification_id = notification_id
+        self.read_at = read_at or dt.datetime.utcnow()
+
+    def get_json(self) -> dict:
+        return {
+            'userId': self.user_id,
+            'notificationId': self.notification_id,
+            'readAt': self.read_at.isoformat() if self.read_at else None
+        }
@@ -0,0 +1,54 @@
+from App.extensions import db
+from .enums import DeliveryChannel, OutboxStatus
+import datetime as dt
+from sqlalchemy import Index
+
+
+class OutboxMessage(db.Model):
+    """
+    Transactional outbox: one row per notification and external delivery channel,
+    written in the same transaction as the notification and drained by `flask outbox worker`.
+
+    next_attempt_at is when a pending message is due, and for a message being
+    sent the end of the worker's lease (an expired lease is claimed again).
+    """
+    __tablename__ = 'outbox_messages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='SET NULL'), nullable=True)
+    channel = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)  # notification snapshot; the transport resolves addresses
+    status = db.Column(db.String(20), nullable=False, default=OutboxStatus.PENDING.value)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_outbox_messages_due', 'status', 'next_attempt_at', 'id'),
+        Index('idx_outbox_messages_notification', 'notification_id'),
+    )
+
+    def __init__(self, channel: DeliveryChannel | str, payload: dict, notification_id: int | None = None):
+        self.channel = getattr(channel, 'value', channel)
+        self.payload = payload
+        self.notification_id = notification_id
+        self.status = OutboxStatus.PENDING.value
+        self.attempts = 0
+        self.created_at = dt.datetime.utcnow()
+        self.next_attempt_at = self.created_at
+
+    def get_json(self) -> dict:
+        return {
+            'id': self.id,
+            'notificationId': self.notification_id,
+            'channel': self.channel,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'lastError': self.last_error,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'nextAttemptAt': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'deliveredAt': self.delivered_at.isoformat() if self.delivered_at else None
+        }
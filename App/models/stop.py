@@ -1,39 +1,58 @@
 from App.extensions import db
 from .street import Street
 from typing import TYPE_CHECKING
+from sqlalchemy import Index
 import datetime as dt
 
 if TYPE_CHECKING:
     from .user import Driver
 
 
+def parse_scheduled_date(value: str | dt.date | dt.datetime) -> dt.datetime:
+    """ISO date ('2025-09-14') or datetime ('2025-09-14 07:30') -> datetime. Raises ValueError."""
+    if isinstance(value, dt.datetime):
+        return value
+    if isinstance(value, dt.date):
+        return dt.datetime.combine(value, dt.time())
+    try:
+        return dt.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"'{value}' is not an ISO date or datetime (e.g. 2025-09-14 or 2025-09-14 07:30)")
+
+
 class Stop(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     street_name = db.Column(db.String(255), nullable=False)
-    scheduled_date = db.Column(db.String(27), nullable=False)
-    created_at = db.Column(db.String(27), nullable=False)
+    scheduled_date = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
     has_arrived = db.Column(db.Boolean, nullable=False, default=False)
 
     # Relationships
     driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=False)
     driver = db.relationship('Driver', back_populates='stops', lazy='joined')
 
-    def __init__(self, driver: 'Driver', street: Street, scheduled_date: str):
+    # Range scans for a driver's or a street's stops between two dates
+    __table_args__ = (
+        Index('idx_stop_driver_scheduled', 'driver_id', 'scheduled_date'),
+        Index('idx_stop_street_scheduled', 'street_name', 'scheduled_date'),
+    )
+
+    def __init__(self, driver: 'Driver', street: Street, scheduled_date: str | dt.date | dt.datetime):
         self.driver_id = driver.id
         self.street_name = street.name
-        self.scheduled_date = scheduled_date
+        self.scheduled_date = parse_scheduled_date(scheduled_date)
 
         # Defaults
         self.has_arrived = False
-        self.created_at = dt.datetime.utcnow().isoformat()
+        self.created_at = dt.datetime.utcnow()
 
     def get_json(self) -> dict[str, any]:
         return {
             'id': self.id,
             'driverId': self.driver_id,
             'streetName': self.street_name,
-            'scheduledDate': self.scheduled_date,
-            'createdAt': self.created_at,
+            'scheduledDate': self.scheduled_date.isoformat() if self.scheduled_date else None,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
             'hasArrived': self.has_arrived
         }
 
@@ -47,8 +66,8 @@ class Stop(db.Model):
                 'name': self.driver.get_fullname()
             } if self.driver else None,
             'streetName': self.street_name,
-            'scheduledDate': self.scheduled_date,
-            'createdAt': self.created_at,
+            'scheduledDate': self.scheduled_date.isoformat() if self.scheduled_date else None,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
             'hasArrived': self.has_arrived,
             'status': 'completed' if self.has_arrived else 'scheduled'
         }
@@ -72,4 +91,5 @@ class Stop(db.Model):
         return self.complete()
 
     def to_string(self):
-        return f"A stop is scheduled for the street '{self.street_name}' at '{self.scheduled_date}'" if not self.has_arrived else f"A stop was made at '{self.scheduled_date}' on street '{self.street_name}'"
+        scheduled = self.scheduled_date.isoformat(sep=' ', timespec='minutes')
+        return f"A stop is scheduled for the street '{self.street_name}' at '{scheduled}'" if not self.has_arrived else f"A stop was made at '{scheduled}' on street '{self.street_name}'"
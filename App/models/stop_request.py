@@ -8,7 +8,7 @@ if TYPE_CHECKING:
 class StopRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     street_name = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.String(27), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
 
     # Relationships
     resident_id = db.Column(db.Integer, db.ForeignKey('residents.id'), nullable=False)
@@ -17,12 +17,12 @@ class StopRequest(db.Model):
     def __init__(self, resident: 'Resident'):
         self.resident_id = resident.id
         self.street_name = resident.street_name
-        self.created_at = datetime.utcnow().isoformat()
+        self.created_at = datetime.utcnow()
 
     def get_json(self) -> dict[str, str]:
         return {
             'id': self.id,
             'resident_id': self.resident_id,
             'street_name': self.street_name,
-            'created_at': self.created_at
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -3,10 +3,32 @@ from App.extensions import db
 class Street(db.Model):
     name = db.Column(db.String(255), primary_key=True)
 
-    def __init__(self, name: str):
+    # Geodata (WGS84 degrees): a reference point and optionally the street's polyline
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    path = db.Column(db.JSON(none_as_null=True), nullable=True)  # [[lat, lon], ...]
+
+    def __init__(self, name: str, latitude: float | None = None, longitude: float | None = None, path: list | None = None):
         self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.path = path
+
+    @property
+    def shape(self) -> list[tuple[float, float]]:
+        """The polyline if there is one, else the reference point; empty without geodata"""
+        if self.path and len(self.path) >= 2:
+            return [(float(lat), float(lon)) for lat, lon in self.path]
+        if self.latitude is not None and self.longitude is not None:
+            return [(self.latitude, self.longitude)]
+        return []
 
-    def get_json(self) -> dict[str, str]:
-        return {
+    def get_json(self) -> dict[str, any]:
+        data = {
             'name': self.name
         }
+        if self.latitude is not None:
+            data.update(latitude=self.latitude, longitude=self.longitude)
+        if self.path:
+            data['path'] = self.path
+        return data
@@ -1,14 +1,19 @@
 import click
+import datetime as dt
 from werkzeug.security import check_password_hash, generate_password_hash
 from App.extensions import db
-from .enums import DriverStatus, NotificationType
+from .enums import DriverStatus, NotificationType, NotificationCategory, NotificationPriority
 from .street import Street
 from .stop import Stop
-from .notification import Notification
+from .notification import Notification, JSON_COLUMNS as NOTIFICATION_JSON_COLUMNS, serialize_notifications, merge_newest
+from .notification_receipt import NotificationReceipt
+from .notification_counter import NotificationCounter, SCOPE_GLOBAL, SCOPE_STREET, SCOPE_TYPE, SCOPE_USER
+from .inbox_entry import InboxEntry
 from abc import abstractmethod
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_, and_
+from sqlalchemy import event, or_, and_, tuple_, case, null, union_all
 from .stop_request import StopRequest
+from App.events import hub, DRIVERS_CHANNEL
 
 
 class User(db.Model):
@@ -70,10 +75,191 @@ class User(db.Model):
         pass
 
     @abstractmethod
-    def get_inbox_data(self, filter: str | None = None) -> list[dict]:
+    def get_inbox_data(
+        self,
+        filter: str | None = None,
+        limit: int | None = None,
+        after: tuple[dt.datetime, int] | None = None,
+        since: tuple[dt.datetime, int] | None = None
+    ) -> list[dict]:
         """Get inbox data as structured list for API responses"""
         pass
 
+    def get_inbox_scopes(self) -> list[tuple[str, str]]:
+        """Change-version scopes that feed this user's inbox"""
+        return [(SCOPE_USER, str(self.id)), (SCOPE_GLOBAL, '')]
+
+    def get_stream_channels(self) -> list[tuple[str, str]]:
+        """Live event channels: everything feeding the inbox plus driver status changes"""
+        return [*self.get_inbox_scopes(), DRIVERS_CHANNEL]
+
+    def get_inbox_version(self) -> str:
+        """Opaque version of this user's inbox; changes whenever its content or read state does"""
+        scopes = self.get_inbox_scopes()
+        versions = NotificationCounter.get_versions(scopes)
+        return ".".join(str(versions.get(scope, 0)) for scope in scopes)
+
+    def _inbox_json(
+        self,
+        branches: list,
+        limit: int | None = None,
+        after: tuple[dt.datetime, int] | None = None,
+        since: tuple[dt.datetime, int] | None = None
+    ) -> list[dict]:
+        """
+        Serialize inbox notifications (newest first) with this user's own read receipts.
+        'branches' are disjoint predicates (direct, street, global, ...). Each becomes
+        its own index walk and the newest rows are merged with UNION ALL (merge_newest),
+        instead of one OR'ed filter that planners answer with a full scan.
+        Only the serialized columns are selected; no Notification objects are loaded.
+        Pages are keyed on (created_at, id) so each page is an index range scan.
+        'since' is a (synced_at, last_id) sync position: only notifications created
+        after last_id, folded into again (a coalesced repeat keeps its id) or read by this
+        user after synced_at are returned.
+        With INBOX_FANOUT = 'write' the inbox is read from this user's inbox_entries instead.
+        """
+        own_receipt = and_(
+            NotificationReceipt.notification_id == Notification.id,
+            NotificationReceipt.user_id == self.id,
+        )
+
+        from App.inbox_fanout import inbox_fanout
+        if inbox_fanout.materialized:
+            return self._materialized_inbox_json(branches, own_receipt, limit=limit, after=after, since=since)
+
+        selects = []
+        for condition in branches:
+            branch = db.select(Notification.id, Notification.created_at).where(condition, Notification.not_expired())
+            if since is not None:
+                synced_at, last_id = since
+                branch = branch.outerjoin(NotificationReceipt, own_receipt).where(
+                    or_(Notification.id > last_id, Notification.last_seen_at > synced_at,
+                        NotificationReceipt.read_at > synced_at)
+                )
+            selects.append(branch)
+
+        newest = merge_newest(selects, limit=limit, after=after)
+        stmt = (
+            db.select(*NOTIFICATION_JSON_COLUMNS, NotificationReceipt.read_at)
+            .select_from(newest)
+            .join(Notification, Notification.id == newest.c.id)
+            .outerjoin(NotificationReceipt, own_receipt)
+            .order_by(newest.c.created_at.desc(), newest.c.id.desc())
+        )
+        return serialize_notifications(db.session.execute(stmt).all())
+
+    @abstractmethod
+    def _inbox_branches(self) -> list:
+        """Disjoint predicates that together select every notification in this user's inbox"""
+        pass
+
+    def get_inbox_summary(self) -> dict:
+        """
+        Total and unread counts per category and per priority, plus the newest
+        urgent notification, computed by one statement: the visible rows are a
+        CTE (one index walk per inbox branch, or this user's inbox_entries with
+        INBOX_FANOUT = 'write') that is grouped by (category, priority) and
+        UNION ALL'ed with its newest urgent row.
+        """
+        from App.inbox_fanout import inbox_fanout
+
+        own_receipt = and_(
+            NotificationReceipt.notification_id == Notification.id,
+            NotificationReceipt.user_id == self.id,
+        )
+        columns = (Notification.id, Notification.category, Notification.priority, Notification.created_at)
+
+        if inbox_fanout.materialized:
+            visible = (
+                db.select(*columns, case((InboxEntry.is_read, 0), else_=1).label('unread'))
+                .select_from(InboxEntry)
+                .join(Notification, Notification.id == InboxEntry.notification_id)
+                .where(InboxEntry.user_id == self.id, Notification.not_expired())
+            )
+        else:
+            unread = case((NotificationReceipt.user_id.is_(None), 1), else_=0).label('unread')
+            visible = union_all(*(
+                db.select(*columns, unread).outerjoin(NotificationReceipt, own_receipt).where(branch, Notification.not_expired())
+                for branch in self._inbox_branches()
+            ))
+        visible = visible.cte('visible')
+
+        detail = (*NOTIFICATION_JSON_COLUMNS, NotificationReceipt.read_at)
+        grouped = (
+            db.select(
+                visible.c.category,
+                visible.c.priority,
+                db.func.count().label('total'),
+                db.func.sum(visible.c.unread).label('unread'),
+                *(db.cast(null(), column.type) for column in detail)  # typed, so the union keeps result processing
+            )
+            .group_by(visible.c.category, visible.c.priority)
+        )
+        # Wrapped in a subquery: SQLite rejects ORDER BY/LIMIT directly inside a compound select
+        urgent = (
+            db.select(*detail)
+            .select_from(visible)
+            .join(Notification, Notification.id == visible.c.id)
+            .outerjoin(NotificationReceipt, own_receipt)
+            .where(visible.c.priority == NotificationPriority.URGENT.value)
+            .order_by(visible.c.created_at.desc(), visible.c.id.desc())
+            .limit(1)
+            .subquery()
+        )
+        newest_urgent = db.select(*(db.cast(null(), column.type) for column in grouped.selected_columns[:4]), *urgent.c)
+
+        summary = {
+            'total': 0,
+            'unread': 0,
+            'byCategory': {c.value: {'total': 0, 'unread': 0} for c in NotificationCategory},
+            'byPriority': {p.value: {'total': 0, 'unread': 0} for p in NotificationPriority},
+            'latestUrgent': None,
+        }
+        for row in db.session.execute(union_all(grouped, newest_urgent)).all():
+            category, priority, total, unread = row[:4]
+            if total is None:
+                summary['latestUrgent'] = serialize_notifications([row[4:]])[0]
+                continue
+            summary['total'] += total
+            summary['unread'] += unread
+            for group, key in (('byCategory', category), ('byPriority', priority)):
+                bucket = summary[group].setdefault(key, {'total': 0, 'unread': 0})
+                bucket['total'] += total
+                bucket['unread'] += unread
+        return summary
+
+    def _materialized_inbox_json(
+        self,
+        branches: list,
+        own_receipt,
+        limit: int | None = None,
+        after: tuple[dt.datetime, int] | None = None,
+        since: tuple[dt.datetime, int] | None = None
+    ) -> list[dict]:
+        """
+        Fan-out-on-write inbox: one walk of idx_inbox_entries_user_created.
+        Entries already are exactly what this user can see; the branches only
+        narrow them down (type filters).
+        """
+        stmt = (
+            db.select(*NOTIFICATION_JSON_COLUMNS, NotificationReceipt.read_at)
+            .select_from(InboxEntry)
+            .join(Notification, Notification.id == InboxEntry.notification_id)
+            .outerjoin(NotificationReceipt, own_receipt)
+            .where(InboxEntry.user_id == self.id, or_(*branches), Notification.not_expired())
+        )
+        if since is not None:
+            synced_at, last_id = since
+            stmt = stmt.where(or_(Notification.id > last_id, Notification.last_seen_at > synced_at,
+                                  NotificationReceipt.read_at > synced_at))
+        if after is not None:
+            stmt = stmt.where(tuple_(InboxEntry.created_at, InboxEntry.notification_id) < tuple_(*after))
+
+        stmt = stmt.order_by(InboxEntry.created_at.desc(), InboxEntry.notification_id.desc())
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return serialize_notifications(db.session.execute(stmt).all())
+
     def __repr__(self):
         return f"<User {self.id} {self.get_fullname()}>"
 
@@ -82,6 +268,7 @@ class Driver(User):
     id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
     status = db.Column(db.String(), nullable=False, default=DriverStatus.INACTIVE.value)
     current_location = db.Column(db.String(255))
+    status_updated_at = db.Column(db.DateTime, nullable=True)  # last-writer-wins clock for status/location
 
     # Relationships
     stops = db.relationship('Stop', back_populates='driver', cascade='all, delete-orphan', lazy='selectin')
@@ -114,21 +301,23 @@ class Driver(User):
         return {
             'id': self.id,
             'status': self.status,
-            'currentLocation': self.current_location
+            'currentLocation': self.current_location,
+            'updatedAt': self.status_updated_at.isoformat() if self.status_updated_at else None
         }
 
     def get_current_status(self) -> str:
         """Get the current status and location of the driver"""
         return f'{self.get_fullname()} is currently {self.status} at {self.current_location}'
 
-    def schedule_stop(self, street: Street, date: str) -> Stop | None:
-        """Schedule a stop for a given street"""
+    def schedule_stop(self, street: Street, date: str, commit: bool = True) -> Stop | None:
+        """Schedule a stop for a given street (commit=False leaves it to the caller's transaction)"""
         try:
             # Create a stop
             new_stop = Stop(self, street, date)
 
             db.session.add(new_stop)
-            db.session.commit()
+            if commit:
+                db.session.commit()
 
             return new_stop
         except SQLAlchemyError as e:
@@ -150,12 +339,11 @@ class Driver(User):
             click.secho(f"[ERROR]: Stop id '{stop_id}' has already been completed.", fg="red")
             return False
 
-        stop.complete()
+        if not stop.complete():
+            click.secho(f"[ERROR]: Failed to complete stop id '{stop_id}'.", fg="red")
+            return False
 
         click.secho(f"Successfully completed stop id '{stop_id}'.", fg="green")
-
-        db.session.add(stop)
-        db.session.commit()
         return True
 
     def update_status(self, driver_status: str | None = None, where: str | None = None) -> bool:
@@ -173,10 +361,27 @@ class Driver(User):
         if where:
             self.current_location = where
 
+        self.status_updated_at = dt.datetime.utcnow()
         db.session.add(self)
+        hub.publish_on_commit(db.session, [DRIVERS_CHANNEL], 'driver_status', self.get_status_dict())
         db.session.commit()
         return True
 
+    def get_inbox_scopes(self) -> list[tuple[str, str]]:
+        """Drivers see every requested/confirmed notification plus their own reads"""
+        return [
+            (SCOPE_USER, str(self.id)),
+            (SCOPE_TYPE, NotificationType.REQUESTED.value),
+            (SCOPE_TYPE, NotificationType.CONFIRMED.value),
+        ]
+
+    def _inbox_branches(self) -> list:
+        """One branch per driver notification type, so each walks idx_notifications_type"""
+        return [
+            Notification.type == NotificationType.REQUESTED.value,
+            Notification.type == NotificationType.CONFIRMED.value,
+        ]
+
     def view_inbox(self, filter: str | None = None) -> None:
         """View stop request notifications"""
         notifications: list[Notification] = []
@@ -185,6 +390,7 @@ class Driver(User):
             notifications = (
                 db.session.query(Notification)
                 .filter(Notification.type.in_([NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value]))
+                .filter(Notification.not_expired())
                 .order_by(Notification.created_at.asc()) # newest last
                 .all()
             )
@@ -192,6 +398,7 @@ class Driver(User):
             notifications = (
                 db.session.query(Notification)
                 .filter_by(type=filter)
+                .filter(Notification.not_expired())
                 .order_by(Notification.created_at.asc()) # newest last
                 .all()
             )
@@ -203,29 +410,25 @@ class Driver(User):
         for notif in notifications:
             print(notif.to_string())
 
-    def get_inbox_data(self, filter: str | None = None) -> list[dict]:
+    def get_inbox_data(
+        self,
+        filter: str | None = None,
+        limit: int | None = None,
+        after: tuple[dt.datetime, int] | None = None,
+        since: tuple[dt.datetime, int] | None = None
+    ) -> list[dict]:
         """Get inbox data as structured list for API responses"""
-        notifications: list[Notification] = []
-
         # Default to "all" if no filter provided
         if filter is None or filter == "all":
-            notifications = (
-                db.session.query(Notification)
-                .filter(Notification.type.in_([NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value]))
-                .order_by(Notification.created_at.desc())
-                .all()
-            )
+            branches = self._inbox_branches()
         # Check if filter is a valid notification type for drivers
         elif filter in [NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value]:
-            notifications = (
-                db.session.query(Notification)
-                .filter_by(type=filter)
-                .order_by(Notification.created_at.desc())
-                .all()
-            )
+            branches = [Notification.type == filter]
+        else:
+            # If invalid filter, return empty list
+            return []
 
-        # If invalid filter, return empty list
-        return [notif.get_json() for notif in notifications]
+        return self._inbox_json(branches, limit=limit, after=after, since=since)
 
     def __repr__(self):
         return f"<Driver {self.id} {self.get_fullname()}>"
@@ -233,7 +436,8 @@ class Driver(User):
 class Resident(User):
     __tablename__ = 'residents'
     id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
-    street_name = db.Column(db.String(255))
+    # street fan-out joins on it; active_history keeps the old street for _move_shared_reads
+    street_name = db.column_property(db.Column(db.String(255), index=True), active_history=True)
 
     # Relationships
     stop_requests = db.relationship('StopRequest', back_populates='resident', cascade='all, delete-orphan', lazy='selectin')
@@ -271,11 +475,11 @@ class Resident(User):
             return False
 
         db.session.add(new_request)
-        db.session.commit()
 
-        # Create notification for drivers
+        # Create notification for drivers (written in the same transaction as the request)
         from .street import Street
         from App.models.enums import NotificationCategory, NotificationPriority
+        from App.notification_writer import notification_writer
 
         street_obj = db.session.query(Street).filter_by(name=self.street_name).first()
 
@@ -287,11 +491,40 @@ class Resident(User):
             category=NotificationCategory.SERVICE,
             priority=NotificationPriority.NORMAL
         )
-        db.session.add(notification)
+        notification_writer.add(notification)
         db.session.commit()
 
         return True
 
+    def get_inbox_scopes(self) -> list[tuple[str, str]]:
+        """Residents see their street, global broadcasts and their own direct notifications"""
+        return [
+            (SCOPE_USER, str(self.id)),
+            (SCOPE_GLOBAL, ''),
+            (SCOPE_STREET, self.street_name or ''),
+        ]
+
+    def _inbox_branches(self) -> list:
+        """
+        Disjoint predicates for street notifications, global broadcasts and
+        notifications addressed to this resident (each served by its own index)
+        """
+        return [
+            and_(
+                Notification.street_name == self.street_name,
+                Notification.recipient_id.is_(None),
+            ),
+            and_(
+                Notification.street_name.is_(None),
+                Notification.recipient_id.is_(None),
+            ),
+            Notification.recipient_id == self.id,
+        ]
+
+    def _visibility_filter(self):
+        """Street notifications, global broadcasts and notifications addressed to this resident"""
+        return or_(*self._inbox_branches())
+
     def view_inbox(self, filter: str | None = None) -> None:
         """View stop notifications"""
         notifications: list[Notification] = []
@@ -299,12 +532,8 @@ class Resident(User):
         if filter == "all":
             notifications = (
                 db.session.query(Notification)
-                .filter(
-                    or_(
-                        Notification.street_name == self.street_name,
-                        Notification.street_name.is_(None),
-                    )
-                )
+                .filter(self._visibility_filter())
+                .filter(Notification.not_expired())
                 .order_by(Notification.created_at.asc())  # newest last
                 .all()
             )
@@ -317,13 +546,11 @@ class Resident(User):
                 db.session.query(Notification)
                 .filter(
                     and_(
-                        or_(
-                            Notification.street_name == self.street_name,
-                            Notification.street_name.is_(None),
-                        ),
+                        self._visibility_filter(),
                         Notification.type == filter,
                     )
                 )
+                .filter(Notification.not_expired())
                 .order_by(Notification.created_at.asc())  # newest last
                 .all()
             )
@@ -335,40 +562,55 @@ class Resident(User):
         for notif in notifications:
             print(notif.to_string())
 
-    def get_inbox_data(self, filter: str | None = None) -> list[dict]:
+    def get_inbox_data(
+        self,
+        filter: str | None = None,
+        limit: int | None = None,
+        after: tuple[dt.datetime, int] | None = None,
+        since: tuple[dt.datetime, int] | None = None
+    ) -> list[dict]:
         """Get inbox data as structured list for API responses"""
-        notifications: list[Notification] = []
-
         if filter is None or filter == "all":
-            notifications = (
-                db.session.query(Notification)
-                .filter(
-                    or_(
-                        Notification.street_name == self.street_name,
-                        Notification.street_name.is_(None),
-                    )
-                )
-                .order_by(Notification.created_at.desc())
-                .all()
-            )
+            branches = self._inbox_branches()
         elif filter in [
             NotificationType.REQUESTED.value,
             NotificationType.CONFIRMED.value,
             NotificationType.ARRIVED.value,
         ]:
-            notifications = (
-                db.session.query(Notification)
-                .filter(
-                    and_(
-                        or_(
-                            Notification.street_name == self.street_name,
-                            Notification.street_name.is_(None),
-                        ),
-                        Notification.type == filter,
-                    )
-                )
-                .order_by(Notification.created_at.desc())
-                .all()
+            branches = [and_(branch, Notification.type == filter) for branch in self._inbox_branches()]
+        else:
+            return []
+
+        return self._inbox_json(branches, limit=limit, after=after, since=since)
+
+
+@event.listens_for(Resident, 'after_update')
+def _move_shared_reads(mapper, connection, target):
+    """
+    shared_read only counts reads of the resident's own street (and global ones):
+    when they move, trade their reads on the old street for those on the new one.
+    """
+    history = db.inspect(target).attrs.street_name.history
+    if not history.deleted:
+        return
+
+    def street_reads(street_name):
+        if not street_name:
+            return 0
+        return connection.scalar(
+            db.select(db.func.count())
+            .select_from(NotificationReceipt)
+            .join(Notification, Notification.id == NotificationReceipt.notification_id)
+            .where(
+                NotificationReceipt.user_id == target.id,
+                Notification.recipient_id.is_(None),
+                Notification.street_name == street_name
             )
+        )
 
-        return [notif.get_json() for notif in notifications]
+    delta = street_reads(target.street_name) - street_reads(history.deleted[0])
+    connection.execute(
+        db.update(NotificationCounter)
+        .where(NotificationCounter.scope == SCOPE_USER, NotificationCounter.key == str(target.id))
+        .values(shared_read=NotificationCounter.shared_read + delta, version=NotificationCounter.version + 1)
+    )
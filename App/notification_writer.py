@@ -0,0 +1,246 @@
+import datetime as dt
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from App.extensions import db
+from App.models.enums import NotificationType
+from App.models.notification import Notification
+from App.models.notification_counter import NotificationCounter
+from App.models.notification_receipt import NotificationReceipt
+from App.outbox import outbox
+
+# Key under Session.info where notifications wait for the transaction to end
+PENDING_NOTIFICATIONS_KEY = 'pending_notifications'
+
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_COALESCE_WINDOW = 900  # seconds
+
+# Street notification types whose repeats fold into one row per window. Only requests
+# qualify: each confirmation names its own driver and date, so they are kept apart
+COALESCED_TYPES = {NotificationType.REQUESTED.value}
+
+_EPOCH = dt.datetime(1970, 1, 1)
+
+
+class NotificationWriter:
+    """
+    Write-behind buffer for new notifications.
+
+    Notifications added during a transaction are held on the session and
+    written with one bulk INSERT (plus one counter update per scope) just
+    before the transaction commits, so they land atomically with whatever
+    triggered them. A rollback discards the buffer.
+
+    Street notifications of a COALESCED_TYPES type are keyed on
+    (street, type, coalesce window). A repeat inside the same window bumps
+    the existing row's occurrences and last_seen_at instead of adding a row,
+    and makes it unread again for anyone who had already read it.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        flush_interval: float | None = None,
+        coalesce_window: int = DEFAULT_COALESCE_WINDOW
+    ):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.coalesce_window = coalesce_window
+
+    def init_app(self, app) -> None:
+        self.max_batch_size = int(app.config.get('NOTIFICATION_WRITER_MAX_BATCH_SIZE', self.max_batch_size))
+        interval = app.config.get('NOTIFICATION_WRITER_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_interval = float(interval) if interval else None
+        self.coalesce_window = int(app.config.get('NOTIFICATION_COALESCE_WINDOW', self.coalesce_window))
+
+    def coalesce_key_for(self, notification: Notification) -> str | None:
+        """'street|type|window' for coalescible notifications, otherwise None"""
+        if (
+            self.coalesce_window <= 0
+            or notification.type not in COALESCED_TYPES
+            or notification.recipient_id is not None
+            or not notification.street_name
+        ):
+            return None
+
+        seen_at = notification.last_seen_at or notification.created_at
+        window = int((seen_at - _EPOCH).total_seconds()) // self.coalesce_window
+        return f'{notification.street_name}|{notification.type}|{window}'
+
+    def add(self, notification: 'Notification', session=None) -> 'Notification':
+        """Buffer a notification until the current transaction commits"""
+        session = session or db.session
+        pending = session.info.setdefault(PENDING_NOTIFICATIONS_KEY, [])
+        pending.append(notification)
+
+        # Bound memory for large producers: write early, still inside the transaction
+        if len(pending) >= self.max_batch_size:
+            self.flush(session)
+        return notification
+
+    def flush(self, session=None) -> int:
+        """Write buffered notifications now (without committing); returns how many"""
+        session = session or db.session
+        pending = session.info.pop(PENDING_NOTIFICATIONS_KEY, None)
+        if not pending:
+            return 0
+
+        fresh, heads, duplicates = [], {}, []
+        for notification in pending:
+            key = self.coalesce_key_for(notification)
+            if key is None:
+                fresh.append(notification)
+            elif key in heads:
+                # Repeat within this batch: fold it into the first one
+                head = heads[key]
+                head.occurrences += notification.occurrences
+                head.last_seen_at = max(head.last_seen_at, notification.last_seen_at)
+                duplicates.append((notification, head))
+            else:
+                notification.coalesce_key = key
+                heads[key] = notification
+
+        session.add_all(fresh)
+        session.flush()  # same-table rows go out as one multi-row INSERT
+
+        created = list(fresh)
+        for head in heads.values():
+            if self._fold(session, head):
+                continue
+            try:
+                with session.begin_nested():
+                    session.add(head)
+            except IntegrityError:
+                # Another transaction inserted the same event first
+                self._fold(session, head)
+            else:
+                created.append(head)
+
+        for duplicate, head in duplicates:
+            duplicate.id = head.id
+            duplicate.occurrences = head.occurrences
+
+        totals = Counter()
+        for notification in created:
+            totals.update(NotificationCounter.scopes_for(notification))
+        for (scope, key), count in sorted(totals.items()):
+            NotificationCounter.increment(scope, key, total=count)
+
+        for notification in created:
+            notification.publish_on_commit()
+
+        # External deliveries (SMS/email/push) commit or roll back with the notifications;
+        # folded repeats are not sent again
+        outbox.enqueue(session, created)
+
+        # Materialized inboxes (INBOX_FANOUT = 'write') get their entries
+        from App.inbox_fanout import inbox_fanout
+        inbox_fanout.on_created(session, created)
+        return len(pending)
+
+    def _fold(self, session, notification: Notification) -> bool:
+        """Fold a notification into the existing row with its coalesce key, if there is one"""
+        row = session.execute(
+            db.update(Notification)
+            .where(Notification.coalesce_key == notification.coalesce_key)
+            .values(
+                occurrences=Notification.occurrences + notification.occurrences,
+                last_seen_at=notification.last_seen_at
+            )
+            .returning(Notification.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            return False
+
+        existing = session.get(Notification, row.id, populate_existing=True)
+
+        # A repeat re-surfaces the event: drop earlier reads (coalesced rows are always shared)
+        readers = session.execute(
+            db.delete(NotificationReceipt)
+            .where(NotificationReceipt.notification_id == existing.id)
+            .returning(NotificationReceipt.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        for user_id in readers:
+            NotificationCounter.record_read(user_id, shared=-1)
+
+        from App.inbox_fanout import inbox_fanout
+        inbox_fanout.mark_unread(existing.id)
+
+        NotificationCounter.bump(NotificationCounter.scopes_for(existing))
+        existing.publish_on_commit()
+
+        # The caller's object stays transient but reports the row it was folded into
+        notification.id = existing.id
+        notification.occurrences = existing.occurrences
+        return True
+
+    def discard(self, session=None) -> None:
+        (session or db.session).info.pop(PENDING_NOTIFICATIONS_KEY, None)
+
+    def batch(self, max_batch_size: int | None = None, flush_interval: float | None = None) -> 'NotificationBatch':
+        """Commit-as-you-go buffer for background producers (jobs, CLI commands)"""
+        return NotificationBatch(
+            self,
+            max_batch_size or self.max_batch_size,
+            flush_interval if flush_interval is not None else self.flush_interval
+        )
+
+
+class NotificationBatch:
+    """
+    Commits buffered notifications every `max_batch_size` notifications or
+    once `flush_interval` seconds have passed since the last commit (checked
+    as notifications are added). Whatever is left is committed on exit, or
+    rolled back if the block raised.
+    """
+
+    def __init__(self, writer: NotificationWriter, max_batch_size: int, flush_interval: float | None):
+        self.writer = writer
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.committed = 0
+        self._last_commit = time.monotonic()
+
+    def add(self, notification: 'Notification') -> 'Notification':
+        self.writer.add(notification)
+        self.pending += 1
+
+        due = self.flush_interval is not None and time.monotonic() - self._last_commit >= self.flush_interval
+        if self.pending >= self.max_batch_size or due:
+            self.commit()
+        return notification
+
+    def commit(self) -> None:
+        db.session.commit()
+        self.committed += self.pending
+        self.pending = 0
+        self._last_commit = time.monotonic()
+
+    def __enter__(self) -> 'NotificationBatch':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            db.session.rollback()
+        elif self.pending:
+            self.commit()
+
+
+notification_writer = NotificationWriter()
+
+
+@event.listens_for(db.session, 'before_commit')
+def _flush_pending_notifications(session):
+    notification_writer.flush(session)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_notifications(session, previous_transaction):
+    if previous_transaction.parent is None:
+        notification_writer.discard(session)
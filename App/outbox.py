@@ -0,0 +1,268 @@
+import datetime as dt
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from werkzeug.utils import import_string
+
+from App.extensions import db
+from App.models.enums import DeliveryChannel, OutboxStatus
+from App.models.notification import Notification
+from App.models.outbox_message import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_BASE = 2.0    # seconds before the first retry, doubled after every failure
+DEFAULT_BACKOFF_MAX = 300.0
+DEFAULT_LEASE_SECONDS = 60.0  # a claimed message is re-claimed if not resolved within this
+
+
+class Transport:
+    """
+    Delivers messages over external channels (SMS, email and push gateways).
+    send() gets one channel's batch and returns {message id: error or None};
+    raising fails the whole batch.
+    """
+
+    def send(self, channel: str, messages: list[dict]) -> dict[int, str | None]:
+        raise NotImplementedError
+
+
+class StubTransport(Transport):
+    """
+    Offline transport for development and tests: logs and records every message
+    instead of calling a gateway. fail_first makes the first attempts of each
+    message fail, to exercise retries.
+    """
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.0):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.sent: list[tuple[str, dict]] = []
+        self.batches: list[tuple[str, int]] = []
+        self._attempts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def send(self, channel: str, messages: list[dict]) -> dict[int, str | None]:
+        if self.delay:
+            time.sleep(self.delay)
+
+        results = {}
+        with self._lock:
+            self.batches.append((channel, len(messages)))
+            for message in messages:
+                self._attempts[message['id']] += 1
+                if self._attempts[message['id']] <= self.fail_first:
+                    results[message['id']] = 'stub failure'
+                    continue
+                self.sent.append((channel, message))
+                results[message['id']] = None
+                logger.info("[%s] %s", channel, message['payload'].get('title'))
+        return results
+
+
+TRANSPORTS = {'stub': StubTransport}
+
+
+def load_transport(app) -> Transport:
+    """OUTBOX_TRANSPORT is a registered name ('stub') or an import path to a Transport class"""
+    name = app.config.get('OUTBOX_TRANSPORT', 'stub')
+    factory = TRANSPORTS.get(name) or import_string(name)
+    return factory(**app.config.get('OUTBOX_TRANSPORT_OPTIONS', {}))
+
+
+class Outbox:
+    """
+    Writes an outbox message per new notification and configured channel
+    (OUTBOX_CHANNELS), inside the transaction that creates the notification,
+    so a message exists if and only if its notification was committed.
+    """
+
+    def __init__(self, channels: Iterable[str] = ()):
+        self.channels = tuple(channels)
+
+    def init_app(self, app) -> None:
+        channels = app.config.get('OUTBOX_CHANNELS', self.channels)
+        if isinstance(channels, str):
+            channels = [c.strip() for c in channels.split(',') if c.strip()]
+
+        valid = {c.value for c in DeliveryChannel}
+        unknown = set(channels) - valid
+        if unknown:
+            raise ValueError(f"Unknown OUTBOX_CHANNELS: {', '.join(sorted(unknown))} (expected {', '.join(sorted(valid))})")
+        self.channels = tuple(channels)
+
+    def enqueue(self, session, notifications: Iterable[Notification]) -> int:
+        """Add outbox messages for newly written notifications to the session; returns how many"""
+        if not self.channels:
+            return 0
+
+        messages = [
+            OutboxMessage(channel, notification.get_json(), notification_id=notification.id)
+            for notification in notifications
+            for channel in self.channels
+        ]
+        session.add_all(messages)
+        return len(messages)
+
+
+class OutboxWorker:
+    """
+    Drains the outbox: claims due messages, sends them per channel in batches on
+    a thread pool and records the outcome. Failed sends are retried with
+    exponential backoff (plus jitter) until max_attempts, then marked failed.
+
+    Claims are leases (next_attempt_at moves lease_seconds ahead), so several
+    workers can share the outbox and a crashed worker's messages are picked up
+    again: delivery is at least once.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._pool: ThreadPoolExecutor | None = None
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait before retrying a message that has failed 'attempts' times"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def claim(self, limit: int) -> list:
+        """Lease up to 'limit' due messages (oldest due first) and commit the lease"""
+        now = dt.datetime.utcnow()
+        claimable = db.and_(
+            OutboxMessage.status.in_([OutboxStatus.PENDING.value, OutboxStatus.SENDING.value]),
+            OutboxMessage.next_attempt_at <= now
+        )
+        due = (
+            db.select(OutboxMessage.id)
+            .where(claimable)
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(limit)
+        )
+
+        # Re-checking the condition makes a row claimed by another worker meanwhile drop out
+        rows = db.session.execute(
+            db.update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due.scalar_subquery()), claimable)
+            .values(
+                status=OutboxStatus.SENDING.value,
+                next_attempt_at=now + dt.timedelta(seconds=self.lease_seconds)
+            )
+            .returning(OutboxMessage.id, OutboxMessage.channel, OutboxMessage.payload, OutboxMessage.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    def run_once(self) -> Counter:
+        """Claim, send and record one round; returns counts of delivered/retried/failed messages"""
+        claimed = self.claim(self.batch_size * self.concurrency)
+        if not claimed:
+            return Counter()
+
+        by_channel: dict[str, list] = {}
+        for row in claimed:
+            by_channel.setdefault(row.channel, []).append(row)
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+
+        futures = []
+        for channel, rows in by_channel.items():
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                messages = [{'id': row.id, 'payload': row.payload} for row in batch]
+                futures.append((batch, self._pool.submit(self.transport.send, channel, messages)))
+
+        results: dict[int, str | None] = {}
+        for batch, future in futures:
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logger.warning("Outbox batch of %d failed: %s", len(batch), e)
+                outcome = {row.id: f"{type(e).__name__}: {e}" for row in batch}
+            for row in batch:
+                results[row.id] = outcome.get(row.id, 'no result from transport')
+
+        return self._record(claimed, results)
+
+    def _record(self, claimed: list, results: dict[int, str | None]) -> Counter:
+        now = dt.datetime.utcnow()
+        counts = Counter()
+        updates = []
+        for row in claimed:
+            error = results[row.id]
+            attempts = row.attempts + 1
+            if error is None:
+                counts['delivered'] += 1
+                updates.append({
+                    'id': row.id, 'status': OutboxStatus.DELIVERED.value, 'attempts': attempts,
+                    'last_error': None, 'delivered_at': now
+                })
+            elif attempts >= self.max_attempts:
+                counts['failed'] += 1
+                updates.append({
+                    'id': row.id, 'status': OutboxStatus.FAILED.value, 'attempts': attempts, 'last_error': error
+                })
+            else:
+                counts['retried'] += 1
+                updates.append({
+                    'id': row.id, 'status': OutboxStatus.PENDING.value, 'attempts': attempts, 'last_error': error,
+                    'next_attempt_at': now + dt.timedelta(seconds=self.backoff(attempts))
+                })
+
+        # One executemany UPDATE by primary key for the whole round
+        db.session.execute(db.update(OutboxMessage), updates)
+        db.session.commit()
+        return counts
+
+    def run(self, poll_interval: float = 1.0, stop: threading.Event | None = None) -> None:
+        """Drain until stopped, sleeping poll_interval whenever nothing is due"""
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    counts = self.run_once()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Outbox round failed")
+                    counts = Counter()
+                finally:
+                    db.session.remove()
+
+                if counts:
+                    logger.info("Outbox: %s", dict(counts))
+                else:
+                    stop.wait(poll_interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+outbox = Outbox()
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Sequence
+
+from App.utils.geo import Point, haversine_m
+
+DEFAULT_MATRIX_CACHE_SIZE = 128
+DEFAULT_TIME_LIMIT = 0.5  # seconds of local search per route
+OR_OPT_SEGMENTS = (1, 2, 3)
+NEIGHBOURS = 10  # Or-opt only tries moving a run next to its nearest few stops
+EPSILON = 1e-7  # meters; smaller gains are rounding noise
+
+
+class RoutePlanner:
+    """
+    Orders visits to a set of locations into a short open path (a van does
+    not need to return to where it started).
+
+    The path is built by nearest neighbour and then improved by 2-opt
+    (reverse a stretch) and Or-opt (move a run of 1-3 stops elsewhere,
+    either way round) until neither finds a gain or the time limit is hit.
+    Distance matrices are cached per set of locations, so re-planning the
+    same streets (another date, another start point) skips recomputing them.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_MATRIX_CACHE_SIZE, time_limit: float = DEFAULT_TIME_LIMIT):
+        self.cache_size = cache_size
+        self.time_limit = time_limit
+        self._matrices: OrderedDict[tuple[Point, ...], tuple[list[list[float]], list[list[int]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.cache_size = int(app.config.get('ROUTE_MATRIX_CACHE_SIZE', self.cache_size))
+        self.time_limit = float(app.config.get('ROUTE_TIME_LIMIT', self.time_limit))
+        with self._lock:
+            self._matrices.clear()
+
+    def matrix(self, points: Sequence[Point]) -> tuple[list[list[float]], list[list[int]]]:
+        """
+        Pairwise distances in meters and each point's nearest others.
+        Pass points in a canonical (sorted) order so equal sets share a cache entry.
+        """
+        key = tuple(points)
+        with self._lock:
+            cached = self._matrices.get(key)
+            if cached is not None:
+                self._matrices.move_to_end(key)
+                return cached
+
+        n = len(key)
+        matrix = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            row = matrix[i]
+            for j in range(i + 1, n):
+                row[j] = matrix[j][i] = haversine_m(key[i], key[j])
+        neighbours = [sorted((j for j in range(n) if j != i), key=matrix[i].__getitem__)[:NEIGHBOURS] for i in range(n)]
+
+        with self._lock:
+            self._matrices[key] = matrix, neighbours
+            while len(self._matrices) > self.cache_size:
+                self._matrices.popitem(last=False)
+        return matrix, neighbours
+
+    def plan(self, points: Sequence[Point], start: Point | None = None) -> tuple[list[int], float]:
+        """
+        Visit order for points (indices into the sorted unique points given) and its length in meters,
+        counting the leg from start when one is given
+        """
+        n = len(points)
+        if n == 0:
+            return [], 0.0
+
+        matrix, neighbours = self.matrix(points)
+        from_start = [haversine_m(start, p) for p in points] if start is not None else None
+
+        order = self._nearest_neighbour(matrix, from_start)
+        deadline = time.perf_counter() + self.time_limit
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = self._two_opt(order, matrix, from_start, deadline)
+            improved = self._or_opt(order, matrix, neighbours, from_start, deadline) or improved
+
+        return order, path_length(order, matrix, from_start)
+
+    # -- construction ----------------------------------------------------------
+
+    @staticmethod
+    def _nearest_neighbour(matrix: list[list[float]], from_start: list[float] | None) -> list[int]:
+        n = len(matrix)
+        if from_start is not None:
+            current = min(range(n), key=from_start.__getitem__)
+        else:
+            # Without a start, begin at an extreme: the point farthest from all the others
+            current = max(range(n), key=lambda i: sum(matrix[i]))
+
+        order = [current]
+        unvisited = set(range(n)) - {current}
+        while unvisited:
+            row = matrix[current]
+            current = min(unvisited, key=row.__getitem__)
+            unvisited.remove(current)
+            order.append(current)
+        return order
+
+    # -- improvement -----------------------------------------------------------
+
+    @staticmethod
+    def _two_opt(order: list[int], matrix, from_start, deadline: float) -> bool:
+        """Reverse order[i..j] wherever that shortens the path; True if anything changed"""
+        n = len(order)
+        changed = False
+
+        def cost(a, b):
+            # a is None before the first stop; -1 stands for the start point
+            if a is None:
+                return 0.0
+            return from_start[b] if a == -1 else matrix[a][b]
+
+        head = -1 if from_start is not None else None
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for i in range(n - 1):
+                prev = order[i - 1] if i > 0 else head
+                first = order[i]
+                before = cost(prev, first)
+                for j in range(i + 1, n):
+                    last = order[j]
+                    if j + 1 < n:
+                        after = order[j + 1]
+                        delta = cost(prev, last) + matrix[first][after] - before - matrix[last][after]
+                    else:
+                        delta = cost(prev, last) - before
+                    if delta < -EPSILON:
+                        order[i:j + 1] = reversed(order[i:j + 1])
+                        first = order[i]
+                        before = cost(prev, first)
+                        improved = changed = True
+        return changed
+
+    @staticmethod
+    def _or_opt(order: list[int], matrix, neighbours, from_start, deadline: float) -> bool:
+        """
+        Move runs of 1-3 consecutive stops (possibly reversed) next to one of their nearest
+        neighbours, or to either end, wherever that shortens the path; True if anything changed
+        """
+        changed = False
+        head = -1 if from_start is not None else None
+
+        def cost(a, b):
+            # a is None before the first stop and b None after the last; -1 stands for the start point
+            if a is None or b is None:
+                return 0.0
+            if a == -1:
+                return from_start[b]
+            return matrix[a][b]
+
+        position = {node: p for p, node in enumerate(order)}
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for length in OR_OPT_SEGMENTS:
+                i = 0
+                while i + length <= len(order):
+                    end = i + length  # the run is order[i:end]
+                    seg_first, seg_last = order[i], order[end - 1]
+                    prev = order[i - 1] if i > 0 else head
+                    nxt = order[end] if end < len(order) else None
+                    gain = cost(prev, seg_first) + cost(seg_last, nxt) - cost(prev, nxt)
+                    if gain <= EPSILON:
+                        i += 1
+                        continue
+
+                    # Insertion points in the path without the run: before rest[p] (p == len(rest) appends)
+                    rest = order[:i] + order[end:]
+                    candidates = {0, len(rest)}
+                    for node in (seg_first, seg_last):
+                        for other in neighbours[node]:
+                            q = position[other]
+                            if i <= q < end:
+                                continue
+                            r = q if q < i else q - length
+                            candidates.update((r, r + 1))
+                    candidates.discard(i)  # where it already is
+
+                    best, best_at, best_reversed = EPSILON, None, False
+                    for p in candidates:
+                        x = rest[p - 1] if p > 0 else head
+                        y = rest[p] if p < len(rest) else None
+                        base = cost(x, y)
+                        forward = gain - (cost(x, seg_first) + cost(seg_last, y) - base)
+                        backward = gain - (cost(x, seg_last) + cost(seg_first, y) - base)
+                        if forward > best:
+                            best, best_at, best_reversed = forward, p, False
+                        if backward > best:
+                            best, best_at, best_reversed = backward, p, True
+
+                    if best_at is None:
+                        i += 1
+                        continue
+
+                    segment = order[i:end]
+                    if best_reversed:
+                        segment.reverse()
+                    order[:] = rest[:best_at] + segment + rest[best_at:]
+                    position = {node: p for p, node in enumerate(order)}
+                    improved = changed = True
+                    if time.perf_counter() >= deadline:
+                        return changed
+        return changed
+
+
+def path_length(order: Sequence[int], matrix, from_start: list[float] | None = None) -> float:
+    total = from_start[order[0]] if from_start is not None and order else 0.0
+    return total + sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+route_planner = RoutePlanner()
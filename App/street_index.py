@@ -0,0 +1,242 @@
+import heapq
+import math
+import threading
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from App.extensions import db
+from App.models.street import Street
+from App.utils.geo import METERS_PER_DEGREE, Point, point_shape_m
+
+# Key under Session.info where created, moved or deleted streets wait for their transaction to commit
+PENDING_STREETS_KEY = 'pending_street_index'
+
+DEFAULT_CELL_SIZE = 0.005  # degrees of latitude/longitude per grid cell (~550 m of latitude)
+
+
+class StreetIndex:
+    """
+    In-memory uniform grid over street geodata for nearest-street lookups.
+
+    Each street is registered in every cell its point or polyline passes
+    through, so a query only measures the streets in the few cells around
+    it. The index is loaded from the database on first use after init_app
+    and kept current as streets are created or moved (after commit).
+    Streets without coordinates are not indexed.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], frozenset[str]] = {}
+        self._shapes: dict[str, tuple[Point, ...]] = {}
+        self._bounds: tuple[int, int, int, int] | None = None  # min/max cell row and column
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.cell_size = float(app.config.get('STREET_INDEX_CELL_SIZE', self.cell_size))
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget everything; the next query reloads from the database"""
+        with self._lock:
+            self._cells, self._shapes, self._bounds = {}, {}, None
+            self._loaded = False
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._shapes)
+
+    # -- maintenance -----------------------------------------------------------
+
+    def load(self, streets: Iterable[Street] | None = None) -> int:
+        """(Re)build from the given streets, or every street with coordinates; returns how many"""
+        if streets is None:
+            streets = db.session.execute(
+                db.select(Street).where(Street.latitude.is_not(None) | Street.path.is_not(None))
+            ).scalars()
+
+        shapes = {street.name: tuple(street.shape) for street in streets}
+        cells: dict[tuple[int, int], set[str]] = {}
+        for name, shape in shapes.items():
+            for cell in self._cells_of(shape):
+                cells.setdefault(cell, set()).add(name)
+
+        with self._lock:
+            self._shapes = {name: shape for name, shape in shapes.items() if shape}
+            self._cells = {cell: frozenset(names) for cell, names in cells.items()}
+            self._bounds = self._bounds_of(self._cells)
+            self._loaded = True
+        return len(self._shapes)
+
+    def update(self, name: str, shape: Iterable[Point]) -> None:
+        """Add, move or (with an empty shape) remove one street"""
+        shape = tuple(shape)
+        with self._lock:
+            # Cells are replaced, never mutated, so concurrent readers see a consistent set
+            cells = dict(self._cells)
+            for cell in self._cells_of(self._shapes.get(name, ())):
+                remaining = cells.get(cell, frozenset()) - {name}
+                if remaining:
+                    cells[cell] = remaining
+                else:
+                    cells.pop(cell, None)
+            for cell in self._cells_of(shape):
+                cells[cell] = cells.get(cell, frozenset()) | {name}
+
+            shapes = dict(self._shapes)
+            if shape:
+                shapes[name] = shape
+            else:
+                shapes.pop(name, None)
+            self._cells, self._shapes, self._bounds = cells, shapes, self._bounds_of(cells)
+
+    # -- queries ---------------------------------------------------------------
+
+    def nearest(self, point: Point, k: int = 1, max_distance: float | None = None) -> list[tuple[str, float]]:
+        """
+        The k streets closest to point as (name, meters), nearest first.
+        Searches rings of cells outwards and stops once no unseen cell can hold a closer street.
+        """
+        self._ensure_loaded()
+        cells, shapes, bounds = self._cells, self._shapes, self._bounds
+        if not bounds or k < 1:
+            return []
+
+        row, col = self._cell_of(point)
+        # Closest any street in ring r+1 can be: r whole cells away in the narrower direction
+        ring_gap = self.cell_size * METERS_PER_DEGREE * max(0.01, math.cos(math.radians(min(89.0, abs(point[0]) + self.cell_size))))
+        max_ring = max(abs(row - bounds[0]), abs(row - bounds[1]), abs(col - bounds[2]), abs(col - bounds[3]))
+        if max_distance is not None:
+            max_ring = min(max_ring, int(max_distance // ring_gap) + 1)
+
+        # Rings that miss the indexed area entirely are skipped, and the rest clipped to it
+        first_ring = max(bounds[0] - row, row - bounds[1], bounds[2] - col, col - bounds[3], 0)
+
+        seen: set[str] = set()
+        best: list[tuple[float, str]] = []  # max-heap of the k best, as (-distance, name)
+        for ring in range(first_ring, max_ring + 1):
+            for cell in self._ring(row, col, ring, bounds):
+                for name in cells.get(cell, ()):
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                    distance = point_shape_m(point, shapes[name])
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, name))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, name))
+            if len(best) == k and -best[0][0] <= ring * ring_gap:
+                break
+            if len(seen) == len(shapes):
+                break  # fewer than k streets qualify
+
+        return [(name, -negative) for negative, name in sorted(best, reverse=True)]
+
+    def within(self, point: Point, radius: float) -> list[tuple[str, float]]:
+        """Every street within radius meters of point as (name, meters), nearest first"""
+        self._ensure_loaded()
+        cells, shapes, bounds = self._cells, self._shapes, self._bounds
+        if not bounds:
+            return []
+
+        dlat = radius / METERS_PER_DEGREE
+        dlon = radius / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(min(89.0, abs(point[0]) + dlat)))))
+        low_row, low_col = self._cell_of((point[0] - dlat, point[1] - dlon))
+        high_row, high_col = self._cell_of((point[0] + dlat, point[1] + dlon))
+
+        # Only the part of the radius box that overlaps indexed cells
+        low_row, high_row = max(low_row, bounds[0]), min(high_row, bounds[1])
+        low_col, high_col = max(low_col, bounds[2]), min(high_col, bounds[3])
+
+        found: dict[str, float] = {}
+        for r in range(low_row, high_row + 1):
+            for c in range(low_col, high_col + 1):
+                for name in cells.get((r, c), ()):
+                    if name not in found:
+                        found[name] = point_shape_m(point, shapes[name])
+
+        return sorted(((name, d) for name, d in found.items() if d <= radius), key=lambda item: (item[1], item[0]))
+
+    # -- grid ------------------------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _cell_of(self, point: Point) -> tuple[int, int]:
+        return math.floor(point[0] / self.cell_size), math.floor(point[1] / self.cell_size)
+
+    def _cells_of(self, shape: tuple[Point, ...]) -> set[tuple[int, int]]:
+        """Cells covered by a point, or by the bounding box of each polyline segment"""
+        if len(shape) == 1:
+            return {self._cell_of(shape[0])}
+
+        cells = set()
+        for a, b in zip(shape, shape[1:]):
+            low_row, low_col = self._cell_of((min(a[0], b[0]), min(a[1], b[1])))
+            high_row, high_col = self._cell_of((max(a[0], b[0]), max(a[1], b[1])))
+            cells.update((r, c) for r in range(low_row, high_row + 1) for c in range(low_col, high_col + 1))
+        return cells
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int, bounds: tuple[int, int, int, int]):
+        """Cells exactly 'ring' cells from (row, col), inside bounds"""
+        min_row, max_row, min_col, max_col = bounds
+        if ring == 0:
+            yield row, col
+            return
+
+        cols = range(max(col - ring, min_col), min(col + ring, max_col) + 1)
+        for r in (row - ring, row + ring):
+            if min_row <= r <= max_row:
+                for c in cols:
+                    yield r, c
+        for c in (col - ring, col + ring):
+            if min_col <= c <= max_col:
+                for r in range(max(row - ring + 1, min_row), min(row + ring - 1, max_row) + 1):
+                    yield r, c
+
+    @staticmethod
+    def _bounds_of(cells) -> tuple[int, int, int, int] | None:
+        if not cells:
+            return None
+        rows = [row for row, _ in cells]
+        cols = [col for _, col in cells]
+        return min(rows), max(rows), min(cols), max(cols)
+
+
+street_index = StreetIndex()
+
+
+@event.listens_for(Street, 'after_insert')
+@event.listens_for(Street, 'after_update')
+def _queue_street_geodata(mapper, connection, street):
+    session = object_session(street)
+    if session is not None:
+        session.info.setdefault(PENDING_STREETS_KEY, {})[street.name] = tuple(street.shape)
+
+
+@event.listens_for(Street, 'after_delete')
+def _queue_street_removal(mapper, connection, street):
+    session = object_session(street)
+    if session is not None:
+        session.info.setdefault(PENDING_STREETS_KEY, {})[street.name] = ()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _index_committed_streets(session):
+    pending = session.info.pop(PENDING_STREETS_KEY, None)
+    if pending and street_index._loaded:
+        for name, shape in pending.items():
+            street_index.update(name, shape)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_streets(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_STREETS_KEY, None)
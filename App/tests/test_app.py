@@ -1,13 +1,17 @@
-import os, tempfile, pytest, logging, unittest, io
+import os, tempfile, pytest, logging, unittest, io, json, time
 from werkzeug.security import check_password_hash, generate_password_hash
 from contextlib import redirect_stdout
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from unittest import mock
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from flask import current_app
 
 from App.main import create_app
 from App.extensions import db
 from App.database import create_db
-from App.models import User
-from App.models.enums import NotificationType 
+from App.models import User, Notification, NotificationCounter, NotificationReceipt, Street
+from App.models.enums import NotificationType, NotificationCategory, NotificationPriority
 from App.controllers.user import (
     create_user,
     create_resident,
@@ -15,13 +19,17 @@ from App.controllers.user import (
     get_user_by_id,
     create_driver,
     get_driver_by_id,
-    get_all_drivers_json
-
+    get_all_drivers_json,
+    get_driver_status,
+    update_driver_status
 )
 from App.controllers.street import (
     create_street,
     get_street_by_string,
-    get_all_streets_json
+    get_all_streets_json,
+    get_nearest_streets,
+    get_streets_within,
+    set_street_geodata
 )
 from App.controllers.stop import (
     create_stop,
@@ -29,7 +37,13 @@ from App.controllers.stop import (
     get_stop_by_id,
     delete_stop,
     complete_stop,
-    stop_exists
+    stop_exists,
+    get_stops,
+    iter_stops,
+    schedule_stops,
+    plan_driver_route,
+    get_street_eta,
+    record_arrival
 )
 from App.controllers.notification import (
     create_notification,
@@ -42,10 +56,27 @@ from App.controllers.notification import (
     get_unread_count,
     mark_notification_as_read,
     mark_all_notifications_as_read,
-
-
+    get_sync_position,
+    recount_notification_counters,
+    purge_expired_notifications,
+    search_notifications,
+    SearchNotSupported,
 )
 from App.controllers.auth import login
+from App.notification_writer import notification_writer
+from App.inbox_fanout import inbox_fanout, FANOUT_ON_READ, FANOUT_ON_WRITE
+from App.jobs import PeriodicJob
+from App.models import InboxEntry, OutboxMessage
+from App.outbox import outbox, OutboxWorker, StubTransport
+from App.controllers.outbox import get_outbox_summary, requeue_failed_outbox_messages
+from App.controllers.driver_ping import ingest_pings, get_driver_pings
+from App.controllers.stop_request import stop_request_exists
+from App.location_store import location_store, Ping
+from App.driver_state import driver_state, DriverStateCache, DURABILITY_DEFERRED, DURABILITY_IMMEDIATE
+from App.eta import eta_estimator
+from App.geofences import GeofenceIndex, GEOFENCES_CHANNEL
+from App.events import hub
+from App.utils.clock import local_today
 
 
 LOGGER = logging.getLogger(__name__)
@@ -141,6 +172,123 @@ class DriverIntegrationTests(unittest.TestCase):
         self.assertIsInstance(drivers, list)
         self.assertGreaterEqual(len(drivers), 2)
 
+     def test_ingest_and_replay_driver_pings(self):
+        driver = create_driver("driver_pings", "driverpass", "Driver", "Pings")
+        lines = [
+            json.dumps({"ts": "2034-07-01T08:00:00", "lat": 10.65, "lon": -61.5, "speed": 8.0}),
+            json.dumps({"ts": "2034-07-01T08:00:05", "lat": 10.6501, "lon": -61.5}),
+            "not json",
+            json.dumps({"ts": "2034-07-01T08:00:10", "lat": 91, "lon": -61.5}),
+            json.dumps({"driverId": driver.id + 1000, "ts": "2034-07-01T08:00:10", "lat": 10, "lon": -61}),
+        ]
+        result = ingest_pings(lines)  # fleet import: every line names its driver
+        self.assertEqual(result["accepted"], 0)
+        self.assertEqual([r["line"] for r in result["rejected"]], [1, 2, 3, 4, 5])
+
+        result = ingest_pings(lines, driver_id=driver.id)
+        self.assertEqual(result["accepted"], 2)
+        self.assertEqual([r["line"] for r in result["rejected"]], [3, 4, 5])
+
+        # Unflushed pings replay from memory, then from driver_pings once flushed
+        for flushed in (False, True):
+            if flushed:
+                self.assertEqual(location_store.flush(), 2)
+            pings = get_driver_pings(driver.id, start=datetime(2034, 7, 1, 8, 0, 1))
+            self.assertEqual([(p.latitude, p.speed) for p in pings], [(10.6501, None)])
+            self.assertEqual(len(get_driver_pings(driver.id)), 2)
+
+        self.assertEqual(location_store.latest(driver.id).recorded_at, datetime(2034, 7, 1, 8, 0, 5))
+        self.assertEqual(location_store.pending_count(), 0)
+
+     def test_ping_flush_isolates_bad_rows_and_survives_outages(self):
+        driver = create_driver("driver_flush", "driverpass", "Driver", "Flush")
+        start = datetime(2034, 7, 2, 8).timestamp()
+        location_store.clear()
+
+        # A ping with no position and one for a driver that is gone do not hold back the rest
+        location_store.record([
+            Ping(driver.id, start, 10.65, -61.5),
+            Ping(driver.id, start + 5, float("nan"), -61.5),
+            Ping(10 ** 6, start + 5, 10.65, -61.5),
+            Ping(driver.id, start + 10, 10.66, -61.5),
+        ])
+        with self.assertLogs("App.location_store", level="WARNING"):
+            self.assertEqual(location_store.flush(), 2)
+        self.assertEqual(location_store.pending_count(), 0)
+        self.assertEqual(len(get_driver_pings(driver.id)), 2)
+
+        # Database unavailable: the ingesting request still succeeds and keeps its pings
+        size, limit = location_store.flush_size, location_store.max_pending
+        location_store.flush_size, location_store.max_pending = 1, 2
+        line = json.dumps({"ts": "2034-07-02T09:00:00", "lat": 10.7, "lon": -61.5})
+        try:
+            with mock.patch.object(location_store, "_write", side_effect=OperationalError("INSERT", {}, Exception("down"))):
+                with self.assertLogs("App.controllers.driver_ping", level="ERROR"):
+                    self.assertEqual(ingest_pings([line] * 3, driver_id=driver.id)["accepted"], 3)
+            self.assertEqual(location_store.pending_count(), 2)  # capped at max_pending
+            self.assertEqual(location_store.flush(), 2)
+        finally:
+            location_store.flush_size, location_store.max_pending = size, limit
+
+     def test_driver_state_is_written_behind_last_writer_wins(self):
+        driver = create_driver("driver_state", "driverpass", "Driver", "State")
+        driver_state.clear()
+
+        state = update_driver_status(driver.id, status="en_route", location="Depot")
+        self.assertEqual(get_driver_status(driver.id), state)
+        self.assertIsNone(update_driver_status(driver.id + 1000, status="en_route"))
+        with self.assertRaises(ValueError):
+            update_driver_status(driver.id, status="flying")
+
+        # Coalesced: only the last of several updates is written, by flush
+        update_driver_status(driver.id, location="Main Rd")
+        db.session.refresh(driver)
+        self.assertIsNone(driver.current_location)
+        self.assertEqual(driver_state.flush(), 1)
+        db.session.refresh(driver)
+        self.assertEqual((driver.status, driver.current_location), ("en_route", "Main Rd"))
+
+        # A newer ORM write wins over an older pending in-memory one
+        update_driver_status(driver.id, status="delivering")
+        driver.update_status("inactive", "Home")
+        self.assertEqual(get_driver_status(driver.id)["status"], "inactive")
+        self.assertEqual(driver_state.flush(), 0)
+
+        stale = driver_state.get(driver.id)._replace(status="delivering", updated_at=datetime(2000, 1, 1))
+        self.assertFalse(driver_state.apply(driver.id, stale))
+        driver_state._dirty.add(driver.id)
+        driver_state._states[driver.id] = stale
+        driver_state.flush()  # the conditional UPDATE skips the newer row
+        db.session.refresh(driver)
+        self.assertEqual(driver.status, "inactive")
+        driver_state.clear()
+
+     def test_driver_state_across_workers(self):
+        # Two caches stand in for two workers without an event broker
+        first = DriverStateCache(DURABILITY_IMMEDIATE, ttl=0.05)
+        second = DriverStateCache(DURABILITY_DEFERRED, ttl=0.05)
+        self.assertIsNone(first.get(10 ** 6))
+        self.assertIsNone(second.get(10 ** 6))
+
+        # Created after both loaded: a miss reads the row instead of reporting no driver
+        driver = create_driver("driver_workers", "driverpass", "Driver", "Workers")
+        created = second.get(driver.id).status
+        self.assertEqual(created, driver.status)
+        self.assertIsNotNone(first.update(driver.id, status="en_route", location="Depot"))
+
+        # The other worker serves its copy until the TTL runs out, then re-reads the row
+        self.assertEqual(second.get(driver.id).status, created)
+        time.sleep(0.06)
+        self.assertEqual(second.get(driver.id)[:2], ("en_route", "Depot"))
+
+        # A pending update is never replaced by an older row
+        second.update(driver.id, status="delivering")
+        time.sleep(0.06)
+        self.assertEqual(second.get(driver.id).status, "delivering")
+        self.assertEqual(second.flush(), 1)
+        time.sleep(0.06)
+        self.assertEqual(first.get(driver.id).status, "delivering")
+
 
 class StreetIntegrationTests(unittest.TestCase):
 
@@ -157,6 +305,28 @@ class StreetIntegrationTests(unittest.TestCase):
         self.assertIsInstance(streets, list)
         self.assertGreaterEqual(len(streets), 2)
 
+     def test_nearest_streets_follow_created_and_moved_streets(self):
+        # Far from anything else the tests locate
+        create_street("Geo Near St", 45.0, 45.0)
+        self.assertEqual(get_nearest_streets(45.0, 45.001, k=1)[0][0], "Geo Near St")
+
+        # The index picks up streets created and moved after it was loaded
+        create_street("Geo Lane", path=[[45.0005, 44.999], [45.0005, 45.002]])
+        nearest = get_nearest_streets(45.0006, 45.001, k=2)
+        self.assertEqual([name for name, _ in nearest], ["Geo Lane", "Geo Near St"])
+        self.assertLess(nearest[0][1], 15)
+
+        set_street_geodata(get_street_by_string("Geo Lane"), -45.0, -45.0, path=[[-45.0, -45.0], [-45.001, -45.0]])
+        self.assertEqual([name for name, _ in get_streets_within(45.0006, 45.001, 500)], ["Geo Near St"])
+
+        with self.assertRaises(ValueError):
+            get_nearest_streets(95.0, 0.0)
+        for radius in (0, -5, 50001, float("inf"), float("nan")):
+            with self.assertRaises(ValueError):
+                get_streets_within(45.0, 45.0, radius)
+        with self.assertRaises(ValueError):
+            get_nearest_streets(45.0, 45.0, max_distance=float("inf"))
+
 
 class StopIntegrationTests(unittest.TestCase):
 
@@ -184,6 +354,66 @@ class StopIntegrationTests(unittest.TestCase):
         fetched_stop = get_stop_by_id(stop.id)
         self.assertTrue(fetched_stop.has_arrived)
 
+     def test_record_arrival_is_one_transaction_and_only_once(self):
+        driver = create_driver("driver_arrive", "driverpass", "Driver", "Arrive")
+        other = create_driver("driver_other", "driverpass", "Driver", "Other")
+        street = create_street("Arrival St")
+        stop = create_stop(driver=driver, street=street, scheduled_date="2034-07-01 09:00")
+        self.assertTrue(create_resident("res_arrive", "respass", "Res", "Arrive", street).request_stop())
+
+        self.assertIsNone(record_arrival(stop.id, driver_id=other.id))
+        self.assertFalse(get_stop_by_id(stop.id).has_arrived)
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', listener)
+        try:
+            data = record_arrival(stop.id, driver_id=driver.id)
+        finally:
+            event.remove(db.session, 'after_commit', listener)
+
+        self.assertEqual(len(commits), 1)
+        self.assertEqual((data["id"], data["hasArrived"]), (stop.id, True))
+        self.assertTrue(get_stop_by_id(stop.id).has_arrived)
+        self.assertFalse(stop_request_exists("Arrival St"))
+        self.assertIsNone(record_arrival(stop.id))
+        self.assertIsNone(record_arrival(999999))
+        arrived = [n for n in get_notifications_by_street(street) if n.title == "Driver Arrived!"]
+        self.assertEqual(len(arrived), 1)
+
+     def test_missed_arrival_leaves_the_callers_work_alone(self):
+        driver = create_driver("driver_arrive_miss", "driverpass", "Driver", "Miss")
+        street = create_street("Arrival Miss St")
+        stop = create_stop(driver=driver, street=street, scheduled_date="2034-07-03 09:00")
+
+        db.session.add(Street("Arrival Pending St"))
+        self.assertIsNone(record_arrival(stop.id, driver_id=driver.id + 1000))
+        self.assertIsNone(record_arrival(999999))
+        db.session.commit()
+        self.assertIsNotNone(get_street_by_string("Arrival Pending St"))
+
+        self.assertEqual(record_arrival(stop.id)["streetName"], "Arrival Miss St")
+        self.assertEqual(get_notifications_by_street(street)[0].street_name, "Arrival Miss St")
+
+     def test_only_the_stops_driver_can_mark_arrival(self):
+        driver = create_driver("driver_api_arrive", "driverpass", "Driver", "Api")
+        create_driver("driver_api_other", "driverpass", "Driver", "Other")
+        street = create_street("Api Arrival St")
+        create_resident("res_api_arrive", "respass", "Res", "Api", street)
+        stop = create_stop(driver=driver, street=street, scheduled_date="2034-07-02 09:00")
+        client = current_app.test_client()
+
+        def patch(username, password, stop_id=stop.id):
+            headers = {"Authorization": f"Bearer {login(username, password)}"}
+            return client.patch(f'/api/stops/{stop_id}', headers=headers).status_code
+
+        self.assertEqual(patch("res_api_arrive", "respass"), 403)
+        self.assertEqual(patch("driver_api_other", "driverpass"), 403)
+        self.assertFalse(get_stop_by_id(stop.id).has_arrived)
+        self.assertEqual(patch("driver_api_arrive", "driverpass", stop_id=999999), 404)
+        self.assertEqual(patch("driver_api_arrive", "driverpass"), 200)
+        self.assertEqual(patch("driver_api_arrive", "driverpass"), 409)
+
      def test_delete_stop(self):
         driver = create_driver("driver5", "driverpass5", "Driver", "Five")
         street = create_street("Willow St")
@@ -212,6 +442,249 @@ class StopIntegrationTests(unittest.TestCase):
         self.assertTrue(stop_exists(street.name, date))
         self.assertFalse(stop_exists("Nonexistent St", date))
         self.assertFalse(stop_exists(street.name, "2099-01-01"))
+
+     def test_get_stops_filters_by_driver_street_date_and_status(self):
+        driver = create_driver("driver_range1", "driverpass", "Driver", "Range")
+        other = create_driver("driver_range2", "driverpass", "Driver", "Other")
+        street = create_street("Range St")
+        other_street = create_street("Other Range St")
+
+        morning = create_stop(driver=driver, street=street, scheduled_date="2032-03-01 07:30")
+        evening = create_stop(driver=driver, street=street, scheduled_date="2032-03-01T18:00")
+        next_day = create_stop(driver=driver, street=other_street, scheduled_date="2032-03-02")
+        create_stop(driver=other, street=street, scheduled_date="2032-03-01 09:00")
+        self.assertEqual(morning.scheduled_date, datetime(2032, 3, 1, 7, 30))
+
+        day = get_stops(driver_id=driver.id, start=datetime(2032, 3, 1), end=datetime(2032, 3, 2))
+        self.assertEqual([s.id for s in day], [morning.id, evening.id])
+
+        on_street = get_stops(street_name=street.name, start=datetime(2032, 3, 1, 8))
+        self.assertEqual([s.driver_id for s in on_street], [other.id, driver.id])
+
+        complete_stop(evening.id)
+        self.assertEqual([s.id for s in get_stops(driver_id=driver.id, status='completed')], [evening.id])
+        self.assertEqual(
+            [s.id for s in get_stops(driver_id=driver.id, status='scheduled', start=datetime(2032, 1, 1))],
+            [morning.id, next_day.id]
+        )
+        with self.assertRaises(ValueError):
+            get_stops(status='late')
+
+        # Range filters use the composite indexes
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM stop WHERE driver_id = 1 AND scheduled_date >= '2032-03-01'"
+        )).all()
+        self.assertIn('idx_stop_driver_scheduled', ' '.join(str(row[-1]) for row in plan))
+
+     def test_stops_keyset_pages_and_stream_cover_every_stop_once(self):
+        driver = create_driver("driver_pages", "driverpass", "Driver", "Pages")
+        street = create_street("Paging St")
+        for day in (3, 1, 2, 2, 5, 4, 1):  # duplicate dates exercise the id tie-break
+            create_stop(driver=driver, street=street, scheduled_date=f"2033-04-0{day}")
+
+        expected = [s.id for s in get_stops(driver_id=driver.id)]
+        self.assertEqual(len(expected), 7)
+
+        seen, after = [], None
+        while True:
+            page = get_stops(driver_id=driver.id, limit=3, after=after)
+            seen += [s.id for s in page]
+            if len(page) < 3:
+                break
+            after = (page[-1].scheduled_date, page[-1].id)
+        self.assertEqual(seen, expected)
+
+        streamed = [s.id for s in iter_stops(batch_size=2, driver_id=driver.id)]
+        self.assertEqual(streamed, expected)
+
+     def test_schedule_stops_in_bulk_reports_each_item(self):
+        driver = create_driver("driver_bulk", "driverpass", "Driver", "Bulk")
+        street = create_street("Bulk St")
+        create_stop(driver=driver, street=street, scheduled_date="2034-05-01")
+
+        results = schedule_stops(driver, [
+            {"streetName": "Bulk St", "scheduledDate": "2034-05-01"},
+            {"streetName": "Bulk St", "scheduledDate": "2034-05-02 07:30"},
+            {"streetName": "Bulk St", "scheduledDate": "2034-05-02T07:30"},
+            {"streetName": "Bulk St", "scheduledDate": "2034-05-03"},
+            {"streetName": "Unknown Bulk St", "scheduledDate": "2034-05-03"},
+            {"streetName": "Bulk St", "scheduledDate": "someday"},
+            {"streetName": "Bulk St"},
+        ])
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["exists", "created", "duplicate", "created", "invalid", "invalid", "invalid"]
+        )
+        self.assertEqual(results[1]["scheduledDate"], "2034-05-02T07:30:00")
+        self.assertIn("not found", results[4]["error"])
+
+        created = get_stops(street_name="Bulk St", start=datetime(2034, 5, 2))
+        self.assertEqual([s.id for s in created], [results[1]["stopId"], results[3]["stopId"]])
+
+        # One notification for the street's new stops
+        notification = get_notifications_by_street(street)[0]
+        self.assertEqual(notification.title, "New Stops Scheduled")
+        self.assertIn("2 stops on 2034-05-02 07:30 and 2034-05-03", notification.message)
+
+        # Missing streets are created when asked to
+        results = schedule_stops(driver, [{"streetName": "New Bulk St", "scheduledDate": "2034-05-04"}], create_streets=True)
+        self.assertEqual(results[0]["status"], "created")
+        self.assertIsNotNone(get_street_by_string("New Bulk St"))
+
+     def test_bulk_schedule_rejects_a_body_that_is_not_an_object(self):
+        create_driver("driver_bulk_api", "driverpass", "Driver", "BulkApi")
+        headers = {"Authorization": f"Bearer {login('driver_bulk_api', 'driverpass')}"}
+        client = current_app.test_client()
+
+        for body in ([{"streetName": "Bulk St", "scheduledDate": "2034-05-05"}], "x", 0):
+            self.assertEqual(client.post('/api/stops/bulk', json=body, headers=headers).status_code, 400)
+        self.assertEqual(client.post('/api/stops/bulk', json={"stops": []}, headers=headers).status_code, 400)
+
+     def test_plan_driver_route_orders_located_stops(self):
+        driver = create_driver("driver_route", "driverpass", "Driver", "Route")
+        near = create_street("Route Near St", 10.650, -61.500)
+        far = create_street("Route Far St", 10.670, -61.500)
+        middle = create_street("Route Middle St", 10.660, -61.500)
+        unlocated = create_street("Route Unlocated St")
+        create_stop(driver=driver, street=far, scheduled_date="2034-06-01 07:00")
+        create_stop(driver=driver, street=near, scheduled_date="2034-06-01 08:00")
+        create_stop(driver=driver, street=middle, scheduled_date="2034-06-01 09:00")
+        create_stop(driver=driver, street=near, scheduled_date="2034-06-01 10:00")
+        create_stop(driver=driver, street=unlocated, scheduled_date="2034-06-01 11:00")
+        create_stop(driver=driver, street=near, scheduled_date="2034-06-02 07:00")
+        complete_stop(create_stop(driver=driver, street=middle, scheduled_date="2034-06-01 12:00").id)
+
+        plan = plan_driver_route(driver.id, date(2034, 6, 1), start=(10.640, -61.500))
+        self.assertEqual(
+            [s["streetName"] for s in plan["stops"]],
+            ["Route Near St", "Route Near St", "Route Middle St", "Route Far St"]
+        )
+        self.assertEqual([s["sequence"] for s in plan["stops"]], [1, 2, 3, 4])
+        self.assertEqual(plan["stops"][1]["legDistance"], 0.0)
+        self.assertAlmostEqual(plan["distance"], 3 * 1112, delta=5)
+        self.assertEqual([s["streetName"] for s in plan["unlocated"]], ["Route Unlocated St"])
+        self.assertEqual(plan_driver_route(driver.id, date(2034, 6, 3))["stops"], [])
+
+     def test_route_defaults_to_today_in_the_stops_timezone(self):
+        driver = create_driver("driver_route_tz", "driverpass", "Driver", "RouteZone")
+        client = current_app.test_client()
+        for zone in ('Pacific/Kiritimati', 'Pacific/Pago_Pago'):  # UTC+14 and UTC-11: never the same date
+            current_app.config['TIMEZONE'] = zone
+            try:
+                response = client.get(f'/api/drivers/{driver.id}/route')
+                self.assertEqual(response.json["data"]["date"], local_today().isoformat())
+            finally:
+                current_app.config.pop('TIMEZONE')
+
+     def test_entering_a_geofence_records_the_arrival(self):
+        driver = create_driver("driver_fence", "driverpass", "Driver", "Fence")
+        street = create_street("Fence St", 20.0, 20.0)
+        today = datetime.combine(date.today(), datetime.min.time())
+        stop = create_stop(driver=driver, street=street, scheduled_date=today + timedelta(hours=9))
+        tomorrow = create_stop(driver=driver, street=street, scheduled_date=today + timedelta(days=1))
+        self.assertTrue(create_resident("res_fence", "respass", "Res", "Fence", street).request_stop())
+
+        def ping(lat, minutes):
+            return json.dumps({"ts": (today + timedelta(hours=10, minutes=minutes)).isoformat(), "lat": lat, "lon": 20.0})
+
+        result = ingest_pings([ping(20.01, 0)], driver_id=driver.id)
+        self.assertEqual(result["arrivals"], [])
+        self.assertFalse(get_stop_by_id(stop.id).has_arrived)
+
+        result = ingest_pings([ping(20.005, 1), ping(20.0003, 2), ping(20.0, 3)], driver_id=driver.id)
+        self.assertEqual(result["arrivals"], [stop.id])
+        self.assertTrue(get_stop_by_id(stop.id).has_arrived)
+        self.assertFalse(get_stop_by_id(tomorrow.id).has_arrived)
+        self.assertEqual(get_notifications_by_street(street)[0].title, "Driver Arrived!")
+        self.assertFalse(stop_request_exists("Fence St"))
+
+     def test_geofence_matches_pings_to_stops_in_the_stops_timezone(self):
+        driver = create_driver("driver_fence_tz", "driverpass", "Driver", "Zone")
+        street = create_street("Fence Zone St", 21.0, 21.0)
+        current_app.config['TIMEZONE'] = 'America/Port_of_Spain'  # UTC-4, no daylight saving
+        try:
+            today = datetime.combine(local_today(), datetime.min.time())
+            stop = create_stop(driver=driver, street=street, scheduled_date=today + timedelta(hours=21))
+
+            # 21:05 local is 01:05 UTC the next day
+            ts = today + timedelta(hours=25, minutes=5)
+            result = ingest_pings([json.dumps({"ts": ts.isoformat(), "lat": 21.0, "lon": 21.0})], driver_id=driver.id)
+            self.assertEqual(result["arrivals"], [stop.id])
+        finally:
+            current_app.config.pop('TIMEZONE')
+
+     def test_geofences_pick_up_stops_changed_by_another_worker(self):
+        driver = create_driver("driver_fence_workers", "driverpass", "Driver", "Workers")
+        street = create_street("Fence Workers St", 22.0, 22.0)
+        today = datetime.combine(local_today(), datetime.min.time())
+
+        # A second index stands in for another worker, whose commits this one never sees
+        other = GeofenceIndex(ttl=0.05)
+        self.assertEqual(other.fences(driver.id), [])
+
+        subscription = hub.subscribe([GEOFENCES_CHANNEL])
+        try:
+            stop = create_stop(driver=driver, street=street, scheduled_date=today + timedelta(hours=9))
+            # What the broker relays to every worker
+            message = subscription.get(timeout=1)
+            self.assertEqual(message["data"], {"driverIds": [driver.id]})
+        finally:
+            hub.unsubscribe(subscription)
+
+        # Without a broker the other worker keeps its set until the TTL runs out
+        self.assertEqual(other.fences(driver.id), [])
+        time.sleep(0.06)
+        self.assertEqual([fence.stop_id for fence in other.fences(driver.id)], [stop.id])
+
+     def test_street_eta_is_memoized_until_a_ping_or_stop_change(self):
+        driver = create_driver("driver_eta", "driverpass", "Driver", "Eta")
+        today = datetime.combine(date.today(), datetime.min.time())
+        first = create_stop(driver=driver, street=create_street("Eta First St", -20.000, 30.0), scheduled_date=today)
+        create_stop(driver=driver, street=create_street("Eta Second St", -20.010, 30.0), scheduled_date=today)
+        self.assertIsNone(get_street_eta("Eta Second St")["eta"])  # no position yet
+        self.assertIsNone(get_street_eta("Elm St"))  # no stop today
+
+        now = datetime.utcnow()
+        ingest_pings([json.dumps({"ts": now.isoformat(), "lat": -19.990, "lon": 30.0})], driver_id=driver.id)
+        eta = get_street_eta("Eta Second St", now=now)
+        self.assertEqual(eta["stopsBefore"], 1)
+        self.assertAlmostEqual(eta["distance"], 2224, delta=5)
+        travel = 2224 / eta_estimator.speed + eta_estimator.stop_seconds
+        self.assertAlmostEqual(eta["minutes"], travel / 60, delta=1)
+
+        memo = eta_estimator._memo[driver.id]
+        get_street_eta("Eta First St", now=now)
+        self.assertIs(eta_estimator._memo[driver.id], memo)
+
+        # A completed stop drops out of the route
+        complete_stop(first.id)
+        eta = get_street_eta("Eta Second St", now=now)
+        self.assertEqual(eta["stopsBefore"], 0)
+        self.assertIsNot(eta_estimator._memo[driver.id], memo)
+
+        # A new ping moves the starting point
+        ingest_pings([json.dumps({"ts": (now + timedelta(seconds=5)).isoformat(), "lat": -20.009, "lon": 30.0})], driver_id=driver.id)
+        self.assertAlmostEqual(get_street_eta("Eta Second St", now=now)["distance"], 111, delta=2)
+
+     def test_street_eta_from_pings_taken_by_another_worker(self):
+        driver = create_driver("driver_eta_worker", "driverpass", "Driver", "Worker")
+        current_app.config['TIMEZONE'] = 'America/Port_of_Spain'
+        try:
+            today = datetime.combine(local_today(), datetime.min.time())
+            create_stop(driver=driver, street=create_street("Eta Worker St", -21.010, 30.0), scheduled_date=today + timedelta(hours=23))
+
+            # Another worker ingested and wrote the ping; this one has nothing buffered
+            now = datetime.utcnow()
+            ingest_pings([json.dumps({"ts": now.isoformat(), "lat": -21.0, "lon": 30.0})], driver_id=driver.id)
+            location_store.flush()
+            location_store.clear()
+
+            eta = get_street_eta("Eta Worker St", now=now)
+            self.assertAlmostEqual(eta["distance"], 1112, delta=5)
+            self.assertEqual(eta["timezone"], "America/Port_of_Spain")
+            self.assertTrue(eta["eta"].endswith("-04:00"))
+        finally:
+            current_app.config.pop('TIMEZONE')
  
 
 class NotificationIntegrationTests(unittest.TestCase):
@@ -381,6 +854,22 @@ class NotificationIntegrationTests(unittest.TestCase):
             allowed = mark_notification_as_read(notif.id, user=user_a)
             self.assertTrue(allowed, "Owner could not mark their own notification as read")
 
+        def test_shared_notification_cannot_be_read_without_a_user(self):
+            street = create_street("Shared Read Rd") or get_street_by_string("Shared Read Rd")
+            reader = create_resident("shared_read_ix1", "pass", "Sha", "Red", street)
+            neighbour = create_resident("shared_read_ix2", "pass", "Neigh", "Bour", street)
+            notif = create_street_notification("Shared Read", "msg", street)
+            direct = create_user_notification("Direct Read", "msg", reader)
+
+            self.assertFalse(mark_notification_as_read(notif.id))
+            self.assertTrue(mark_notification_as_read(direct.id))
+            db.session.refresh(notif)
+            self.assertFalse(notif.is_read)
+
+            self.assertTrue(mark_notification_as_read(notif.id, user=reader))
+            inbox = {n["id"]: n for n in neighbour.get_inbox_data("all")}
+            self.assertFalse(inbox[notif.id]["isRead"])
+
         def test_street_and_user_notifications_ordered_correctly(self):
             street_name = "Order Ave"
             street = create_street(street_name) or get_street_by_string(street_name)
@@ -433,3 +922,679 @@ class NotificationIntegrationTests(unittest.TestCase):
             returned_titles = {getattr(it, "title", None) for it in items}
             self.assertTrue(returned_titles.issubset(wanted))
 
+
+        def test_street_notification_read_is_per_resident(self):
+            street_name = "Receipt Ave"
+            street = create_street(street_name) or get_street_by_string(street_name)
+            reader = create_resident("receipt_reader_ix1", "pass", "Re", "Ader", street)
+            neighbour = create_resident("receipt_neighbour_ix1", "pass", "Neigh", "Bour", street)
+
+            reader_before = get_unread_count(reader)
+            neighbour_before = get_unread_count(neighbour)
+
+            notif = create_street_notification("Shared Ping", "For the whole street.", street)
+            self.assertEqual(get_unread_count(reader), reader_before + 1)
+            self.assertEqual(get_unread_count(neighbour), neighbour_before + 1)
+
+            self.assertTrue(mark_notification_as_read(notif.id, user=reader))
+            self.assertTrue(mark_notification_as_read(notif.id, user=reader))  # idempotent
+
+            self.assertEqual(get_unread_count(reader), reader_before)
+            self.assertEqual(get_unread_count(neighbour), neighbour_before + 1)
+
+            reader_inbox = {n["id"]: n for n in reader.get_inbox_data("all")}
+            neighbour_inbox = {n["id"]: n for n in neighbour.get_inbox_data("all")}
+            self.assertTrue(reader_inbox[notif.id]["isRead"])
+            self.assertIsNotNone(reader_inbox[notif.id]["readAt"])
+            self.assertFalse(neighbour_inbox[notif.id]["isRead"])
+
+        def test_other_street_notifications_not_counted(self):
+            home = create_street("Home Ave") or get_street_by_string("Home Ave")
+            away = create_street("Away Ave") or get_street_by_string("Away Ave")
+            user = create_resident("street_scope_ix1", "pass", "Street", "Scope", home)
+
+            before = get_unread_count(user)
+            create_street_notification("Away Ping", "Not for Home Ave.", away)
+            self.assertEqual(get_unread_count(user), before)
+
+            items = get_notifications_by_user(user, include_global=True, unread_only=True, limit=200)
+            self.assertNotIn("Away Ping", {n.title for n in items})
+
+        def test_mark_all_notifications_as_read_in_bulk(self):
+            street_name = "Bulk Ave"
+            street = create_street(street_name) or get_street_by_string(street_name)
+            user = create_resident("bulk_reader_ix1", "pass", "Bulk", "Reader", street)
+            neighbour = create_resident("bulk_neighbour_ix1", "pass", "Bulk", "Neighbour", street)
+
+            for i in range(3):
+                create_street_notification(f"Bulk Street {i}", "street msg", street)
+            create_user_notification("Bulk Direct", "direct msg", user)
+
+            unread = get_unread_count(user)
+            neighbour_unread = get_unread_count(neighbour)
+            self.assertGreaterEqual(unread, 4)
+
+            count = mark_all_notifications_as_read(user)
+            self.assertEqual(count, unread)
+            self.assertEqual(get_unread_count(user), 0)
+            self.assertEqual(get_unread_count(neighbour), neighbour_unread)
+
+            # Nothing left to mark
+            self.assertEqual(mark_all_notifications_as_read(user), 0)
+
+        def test_failed_mark_all_is_an_error_not_zero(self):
+            user = create_user("bulk_fail_ix1", "pass", "Bulk", "Fail")
+            create_user_notification("Bulk Fail", "msg", user)
+            before = get_unread_count(user)
+
+            with mock.patch.object(NotificationCounter, "record_read", side_effect=OperationalError("UPDATE", {}, Exception("locked"))):
+                with self.assertRaises(OperationalError):
+                    mark_all_notifications_as_read(user)
+            self.assertEqual(get_unread_count(user), before)
+
+        def test_mark_selected_notifications_as_read(self):
+            user = create_user("bulk_select_ix1", "pass", "Bulk", "Select")
+            made = [create_user_notification(f"Select {i}", "msg", user) for i in range(3)]
+            before = get_unread_count(user)
+
+            count = mark_all_notifications_as_read(user, notification_ids=[made[0].id, made[1].id])
+            self.assertEqual(count, 2)
+            self.assertEqual(get_unread_count(user), before - 2)
+
+            db.session.refresh(made[0])
+            db.session.refresh(made[2])
+            self.assertTrue(made[0].is_read)
+            self.assertFalse(made[2].is_read)
+
+        def test_inbox_keyset_pagination(self):
+            street_name = "Page Ave"
+            street = create_street(street_name) or get_street_by_string(street_name)
+            user = create_resident("page_user_ix1", "pass", "Pa", "Ge", street)
+
+            # Same timestamp for every row: the id tie-breaker must keep pages disjoint
+            now = datetime.utcnow()
+            made = [create_street_notification(f"Page {i}", "msg", street) for i in range(5)]
+            for n in made:
+                n.created_at = now
+            db.session.commit()
+
+            seen = []
+            after = None
+            while True:
+                page = user.get_inbox_data("all", limit=2, after=after)
+                if not page:
+                    break
+                seen.extend(n["id"] for n in page)
+                last = page[-1]
+                after = (datetime.fromisoformat(last["createdAt"]), last["id"])
+
+            page_ids = [i for i in seen if i in {n.id for n in made}]
+            self.assertEqual(page_ids, sorted((n.id for n in made), reverse=True))
+            self.assertEqual(len(seen), len(set(seen)))
+
+            first = get_notifications_by_user(user, limit=2)
+            rest = get_notifications_by_user(user, limit=50, after=(first[-1].created_at, first[-1].id))
+            self.assertFalse({n.id for n in first} & {n.id for n in rest})
+
+        def test_inbox_version_tracks_relevant_changes(self):
+            home = create_street("Version Ave") or get_street_by_string("Version Ave")
+            away = create_street("Elsewhere Ave") or get_street_by_string("Elsewhere Ave")
+            user = create_resident("version_user_ix1", "pass", "Ver", "Sion", home)
+            neighbour = create_resident("version_neighbour_ix1", "pass", "Neigh", "Bour", home)
+
+            v0 = user.get_inbox_version()
+            create_street_notification("Elsewhere Ping", "other street", away)
+            self.assertEqual(user.get_inbox_version(), v0)
+
+            notif = create_street_notification("Version Ping", "my street", home)
+            v1 = user.get_inbox_version()
+            self.assertNotEqual(v1, v0)
+
+            mark_notification_as_read(notif.id, user=neighbour)
+            self.assertEqual(user.get_inbox_version(), v1)
+
+            mark_notification_as_read(notif.id, user=user)
+            self.assertNotEqual(user.get_inbox_version(), v1)
+
+        def test_inbox_since_returns_only_changes(self):
+            street = create_street("Sync Ave") or get_street_by_string("Sync Ave")
+            user = create_resident("sync_user_ix1", "pass", "Sy", "Nc", street)
+
+            old = create_street_notification("Sync Old", "before sync", street)
+            since = get_sync_position()
+            self.assertEqual(user.get_inbox_data("all", since=since), [])
+
+            new = create_street_notification("Sync New", "after sync", street)
+            mark_notification_as_read(old.id, user=user)
+
+            changed = {n["id"]: n for n in user.get_inbox_data("all", since=since)}
+            self.assertEqual(set(changed), {old.id, new.id})
+            self.assertTrue(changed[old.id]["isRead"])
+            self.assertFalse(changed[new.id]["isRead"])
+
+        def test_inbox_since_returns_folded_repeats(self):
+            window = notification_writer.coalesce_window
+            notification_writer.coalesce_window = 10 ** 9
+            try:
+                for n, mode in enumerate((FANOUT_ON_READ, FANOUT_ON_WRITE)):
+                    inbox_fanout.mode = mode
+                    street = create_street(f"Sync Fold Ave {n}") or get_street_by_string(f"Sync Fold Ave {n}")
+                    user = create_resident(f"sync_user_fold{n}", "pass", "Sy", "Fold", street)
+
+                    first = create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED)
+                    inbox_fanout.wait()
+                    mark_notification_as_read(first.id, user=user)
+                    since = get_sync_position(user)
+                    self.assertEqual(user.get_inbox_data("all", since=since), [])
+
+                    time.sleep(0.01)
+                    repeat = create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED)
+                    inbox_fanout.wait()
+                    self.assertEqual(repeat.id, first.id)
+
+                    # Same id, no longer read: the sync has to send it again
+                    changed = user.get_inbox_data("all", since=since)
+                    self.assertEqual([i["id"] for i in changed], [first.id], mode)
+                    self.assertFalse(changed[0]["isRead"])
+                    self.assertEqual(changed[0]["occurrences"], 2)
+            finally:
+                notification_writer.coalesce_window = window
+                inbox_fanout.mode = FANOUT_ON_READ
+
+        def test_unread_count_follows_a_resident_who_moves(self):
+            home = create_street("Mover Home") or get_street_by_string("Mover Home")
+            away = create_street("Mover Away") or get_street_by_string("Mover Away")
+            user = create_resident("mover_ix1", "pass", "Mo", "Ver", home)
+
+            read_home = create_street_notification("Mover Home 1", "msg", home)
+            create_street_notification("Mover Home 2", "msg", home)
+            create_street_notification("Mover Away 1", "msg", away)
+            mark_notification_as_read(read_home.id, user=user)
+
+            def scanned():
+                return len(get_notifications_by_user(user, include_global=True, unread_only=True, limit=10000))
+
+            for street in (away, home):
+                user.street_name = street.name
+                db.session.commit()
+                self.assertEqual(get_unread_count(user), scanned())
+
+            recount_notification_counters()
+            self.assertEqual(get_unread_count(user), scanned())
+
+        def test_unread_counters_match_scan_and_recount(self):
+            street = create_street("Counter Ave") or get_street_by_string("Counter Ave")
+            a = create_resident("counter_a_ix1", "pass", "Count", "A", street)
+            b = create_resident("counter_b_ix1", "pass", "Count", "B", street)
+
+            s1 = create_street_notification("Counter Street 1", "msg", street)
+            create_street_notification("Counter Street 2", "msg", street)
+            d1 = create_user_notification("Counter Direct", "msg", a)
+            create_system_notification("Counter Global", "msg")
+            mark_notification_as_read(s1.id, user=a)
+            mark_notification_as_read(d1.id, user=a)
+            mark_all_notifications_as_read(b)
+
+            def scanned(user):
+                return len(get_notifications_by_user(user, include_global=True, unread_only=True, limit=10000))
+
+            for user in (a, b):
+                self.assertEqual(get_unread_count(user), scanned(user))
+
+            # Corrupt the counters, then rebuild them from the notification tables
+            db.session.execute(db.update(NotificationCounter).values(total=999, read=0, shared_read=0))
+            db.session.commit()
+            recount_notification_counters()
+
+            for user in (a, b):
+                self.assertEqual(get_unread_count(user), scanned(user))
+                self.assertEqual(get_unread_count(user, include_global=False),
+                                 len(get_notifications_by_user(user, include_global=False, unread_only=True, limit=10000)))
+
+        def test_expired_notifications_hidden_and_purged_in_batches(self):
+            street = create_street("Expiry Rd") or get_street_by_string("Expiry Rd")
+            user = create_resident("expiry_res_ix1", "pass", "Ex", "Piry", street)
+
+            live = create_street_notification("Expiry Live", "msg", street)
+            expired = [create_street_notification(f"Expiry Old {i}", "msg", street) for i in range(3)]
+            mark_notification_as_read(expired[0].id, user=user)
+
+            expired_ids = [n.id for n in expired]
+            db.session.execute(
+                db.update(Notification)
+                .where(Notification.id.in_(expired_ids))
+                .values(expires_at=datetime.utcnow() - timedelta(hours=1))
+            )
+            db.session.commit()
+
+            inbox_ids = {n["id"] for n in user.get_inbox_data("all")}
+            self.assertIn(live.id, inbox_ids)
+            self.assertTrue(inbox_ids.isdisjoint(expired_ids))
+            self.assertNotIn(expired[1], get_notifications_by_street(street, include_expired=False))
+
+            self.assertEqual(purge_expired_notifications(batch_size=2, max_batches=1), 2)
+            self.assertEqual(purge_expired_notifications(batch_size=2), 1)
+
+            remaining = db.session.scalar(db.select(db.func.count()).where(Notification.id.in_(expired_ids)))
+            self.assertEqual(remaining, 0)
+            receipts = db.session.scalar(
+                db.select(db.func.count()).select_from(NotificationReceipt)
+                .where(NotificationReceipt.notification_id.in_(expired_ids))
+            )
+            self.assertEqual(receipts, 0)
+            self.assertEqual(
+                get_unread_count(user),
+                len(get_notifications_by_user(user, include_global=True, unread_only=True, limit=10000))
+            )
+
+        def test_periodic_purge_runs_in_its_own_process_only(self):
+            # create_app leaves jobs off unless BACKGROUND_JOBS is set
+            self.assertNotIn('periodic_jobs', current_app.extensions)
+
+            runs = []
+            def purge():
+                runs.append(purge_expired_notifications())
+                if len(runs) == 3:
+                    job.stop()
+
+            job = PeriodicJob(current_app, 'notification-purge', 0.01, purge)
+            job.run_forever()  # what `flask notifications purge --every` runs
+            self.assertEqual(len(runs), 3)
+
+        def test_read_all_rejects_a_body_that_is_not_an_object(self):
+            create_user("read_all_user_ix1", "pass", "Read", "All")
+            headers = {"Authorization": f"Bearer {login('read_all_user_ix1', 'pass')}"}
+            client = current_app.test_client()
+
+            for body in ([1, 2], "x", 0):
+                response = client.post('/api/notifications/read-all', json=body, headers=headers)
+                self.assertEqual(response.status_code, 400)
+            self.assertEqual(client.post('/api/notifications/read-all', json={"ids": []}, headers=headers).status_code, 200)
+            self.assertEqual(client.post('/api/notifications/read-all', headers=headers).status_code, 200)
+
+        def test_unread_count_excludes_expired_before_purge(self):
+            street = create_street("Expiry Count Rd") or get_street_by_string("Expiry Count Rd")
+            user = create_resident("expiry_res_ix2", "pass", "Ex", "Count", street)
+            baseline = get_unread_count(user)
+
+            live = create_street_notification("Expiry Count Live", "msg", street)
+            expired = create_street_notification("Expiry Count Old", "msg", street)
+            direct = create_user_notification("Expiry Count Direct", "msg", user)
+            self.assertEqual(get_unread_count(user), baseline + 3)
+
+            db.session.execute(
+                db.update(Notification)
+                .where(Notification.id.in_([expired.id, direct.id]))
+                .values(expires_at=datetime.utcnow() - timedelta(minutes=1))
+            )
+            db.session.commit()
+
+            self.assertEqual(get_unread_count(user), baseline + 1)
+            self.assertEqual(get_unread_count(user, include_global=False), 0)
+            self.assertEqual(
+                get_unread_count(user),
+                len(get_notifications_by_user(user, include_global=True, unread_only=True, limit=10000))
+            )
+            mark_notification_as_read(live.id, user=user)
+            self.assertEqual(get_unread_count(user), baseline)
+
+        def test_stop_and_notification_share_a_transaction(self):
+            street = create_street("Writer Way") or get_street_by_string("Writer Way")
+            driver = create_driver("writer_drv_ix1", "pass", "Write", "Behind")
+            resident = create_resident("writer_res_ix1", "pass", "Write", "Resident", street)
+            baseline = get_unread_count(resident)
+
+            # Rolled back before commit: neither the stop nor its notification is written
+            driver.schedule_stop(street, "2031-01-01", commit=False)
+            pending = create_street_notification("Writer Pending", "msg", street, commit=False)
+            self.assertIsNone(pending.id)
+            db.session.rollback()
+
+            self.assertFalse(stop_exists(street.name, "2031-01-01"))
+            self.assertEqual(db.session.scalar(db.select(db.func.count()).where(Notification.title == "Writer Pending")), 0)
+            self.assertEqual(get_unread_count(resident), baseline)
+
+            stop = create_stop(driver=driver, street=street, scheduled_date="2031-01-02")
+            self.assertIsNotNone(stop)
+            self.assertTrue(stop_exists(street.name, "2031-01-02"))
+            self.assertEqual(get_unread_count(resident), baseline + 1)
+
+        def test_notification_batch_commits_every_max_batch_size(self):
+            street = create_street("Batch Blvd") or get_street_by_string("Batch Blvd")
+            resident = create_resident("batch_res_ix1", "pass", "Bat", "Ch", street)
+            baseline = get_unread_count(resident)
+
+            with notification_writer.batch(max_batch_size=2) as batch:
+                for i in range(5):
+                    batch.add(Notification(f"Batch {i}", "msg", NotificationType.SCHEDULE, street=street))
+                self.assertEqual(batch.committed, 4)
+                self.assertEqual(batch.pending, 1)
+
+            self.assertEqual(batch.committed, 5)
+            self.assertEqual(get_unread_count(resident), baseline + 5)
+            self.assertEqual(
+                get_unread_count(resident),
+                len(get_notifications_by_user(resident, include_global=True, unread_only=True, limit=10000))
+            )
+
+        def test_repeated_street_events_coalesce_into_one_row(self):
+            street = create_street("Coalesce Ct") or get_street_by_string("Coalesce Ct")
+            other = create_street("Coalesce Alt") or get_street_by_string("Coalesce Alt")
+            resident = create_resident("coalesce_res_ix1", "pass", "Co", "Alesce", street)
+            baseline = get_unread_count(resident)
+
+            window = notification_writer.coalesce_window
+            notification_writer.coalesce_window = 10 ** 9  # keep the whole test inside one window
+            try:
+                first = create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED)
+                mark_notification_as_read(first.id, user=resident)
+                self.assertEqual(get_unread_count(resident), baseline)
+
+                repeat = create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED)
+                self.assertEqual(repeat.id, first.id)
+                self.assertEqual(repeat.occurrences, 2)
+
+                # Two more repeats buffered in one transaction fold into the same row
+                create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED, commit=False)
+                create_street_notification("Requested", "msg", street, notification_type=NotificationType.REQUESTED, commit=False)
+                db.session.commit()
+
+                # Different street or type: separate rows
+                elsewhere = create_street_notification("Requested", "msg", other, notification_type=NotificationType.REQUESTED)
+                confirmed = create_street_notification("Confirmed", "msg", street, notification_type=NotificationType.CONFIRMED)
+                schedule = [create_street_notification("Schedule", "msg", street) for _ in range(2)]
+            finally:
+                notification_writer.coalesce_window = window
+
+            row = db.session.get(Notification, first.id, populate_existing=True)
+            self.assertEqual(row.occurrences, 4)
+            self.assertGreaterEqual(row.last_seen_at, row.created_at)
+            self.assertEqual(len({first.id, elsewhere.id, confirmed.id, schedule[0].id, schedule[1].id}), 5)
+
+            # The repeat made the event unread again; counters still match a scan
+            inbox = {n["id"]: n for n in resident.get_inbox_data("all")}
+            self.assertFalse(inbox[first.id]["isRead"])
+            self.assertEqual(inbox[first.id]["occurrences"], 4)
+            self.assertEqual(get_unread_count(resident), baseline + 4)
+            self.assertEqual(
+                get_unread_count(resident),
+                len(get_notifications_by_user(resident, include_global=True, unread_only=True, limit=10000))
+            )
+
+        def test_distinct_confirmations_are_not_coalesced(self):
+            street = create_street("Confirm Ct") or get_street_by_string("Confirm Ct")
+            resident = create_resident("coalesce_res_ix2", "pass", "Con", "Firm", street)
+
+            window = notification_writer.coalesce_window
+            notification_writer.coalesce_window = 10 ** 9
+            try:
+                first = create_street_notification(
+                    "Stop Scheduled", "Bob has scheduled a stop for Confirm Ct on 2025-09-14",
+                    street, notification_type=NotificationType.CONFIRMED
+                )
+                second = create_street_notification(
+                    "Stop Scheduled", "Tucker has scheduled a stop for Confirm Ct on 2025-09-20",
+                    street, notification_type=NotificationType.CONFIRMED
+                )
+            finally:
+                notification_writer.coalesce_window = window
+
+            self.assertNotEqual(first.id, second.id)
+            messages = {n["message"] for n in resident.get_inbox_data("confirmed")}
+            self.assertIn("Bob has scheduled a stop for Confirm Ct on 2025-09-14", messages)
+            self.assertIn("Tucker has scheduled a stop for Confirm Ct on 2025-09-20", messages)
+
+        def test_full_text_search_ranks_filters_and_pages(self):
+            street = create_street("Searchable Rd") or get_street_by_string("Searchable Rd")
+            other = create_street("Quiet Rd") or get_street_by_string("Quiet Rd")
+            resident = create_resident("search_res_ix1", "pass", "Se", "Arch", other)
+
+            in_title = create_street_notification("Zanzibar delivery", "Fresh bread today", street)
+            in_message = create_street_notification("Delivery update", "The zanzibar van is late", street)
+            elsewhere = create_street_notification("Zanzibar special", "Only on Quiet Rd", other)
+
+            ids = [n["id"] for n in search_notifications("zanzibar")]
+            self.assertEqual(set(ids), {in_title.id, in_message.id, elsewhere.id})
+            self.assertLess(ids.index(in_title.id), ids.index(in_message.id))  # title hits rank higher
+
+            self.assertEqual([n["id"] for n in search_notifications("zanzibar", street_name=street.name, notification_type="schedule")][0], in_title.id)
+            self.assertEqual(search_notifications("zanzibar", start=datetime.utcnow() + timedelta(days=1)), [])
+            self.assertEqual(search_notifications('"*( OR'), [])
+
+            # Keyset pages cover every result exactly once
+            first = search_notifications("zanzibar", limit=2)
+            rest = search_notifications("zanzibar", limit=2, after=(first[-1]["rank"], first[-1]["id"]))
+            self.assertEqual([n["id"] for n in first + rest], ids)
+
+            # Scoped to what the user can see
+            self.assertEqual([n["id"] for n in search_notifications("zanzibar", user=resident)], [elsewhere.id])
+
+            # Deletes leave the index
+            db.session.delete(db.session.get(Notification, in_message.id))
+            db.session.commit()
+            self.assertNotIn(in_message.id, [n["id"] for n in search_notifications("zanzibar")])
+
+        def test_search_on_an_unsupported_backend_fails_cleanly(self):
+            create_user("search_user_ix2", "pass", "Se", "Arch")
+            headers = {"Authorization": f"Bearer {login('search_user_ix2', 'pass')}"}
+            mysql = mock.Mock(dialect=mock.Mock())
+            mysql.dialect.name = "mysql"
+
+            with mock.patch.object(db.session, "get_bind", return_value=mysql):
+                with self.assertRaises(SearchNotSupported):
+                    search_notifications("zanzibar")
+                response = current_app.test_client().get('/api/notifications/search?q=zanzibar', headers=headers)
+            self.assertEqual(response.status_code, 501)
+
+        def test_union_inbox_matches_or_filter_across_branches(self):
+            street = create_street("Union St") or get_street_by_string("Union St")
+            other = create_street("Union Alt") or get_street_by_string("Union Alt")
+            user = create_resident("union_res_ix1", "pass", "Un", "Ion", street)
+
+            # Interleave rows of every branch (and some the resident must not see) in time
+            base = datetime.utcnow() - timedelta(hours=1)
+            made = [
+                create_street_notification("Union street", "msg", street),
+                create_user_notification("Union direct", "msg", user),
+                create_system_notification("Union global", "msg"),
+                create_street_notification("Union other", "msg", other),
+            ]
+            made += [create_street_notification(f"Union street {i}", "msg", street) for i in range(3)]
+            made += [create_user_notification(f"Union direct {i}", "msg", user) for i in range(3)]
+            for i, n in enumerate(made):
+                n.created_at = base + timedelta(seconds=i % 4)  # plenty of timestamp ties
+            db.session.commit()
+
+            expected = [
+                n.id for n in db.session.execute(
+                    db.select(Notification)
+                    .where(user._visibility_filter(), Notification.not_expired())
+                    .order_by(Notification.created_at.desc(), Notification.id.desc())
+                ).scalars()
+            ]
+
+            seen, after = [], None
+            while True:
+                page = user.get_inbox_data("all", limit=3, after=after)
+                if not page:
+                    break
+                seen.extend(n["id"] for n in page)
+                after = (datetime.fromisoformat(page[-1]["createdAt"]), page[-1]["id"])
+            self.assertEqual(seen, expected)
+
+            listed, after = [], None
+            while True:
+                page = get_notifications_by_user(user, limit=3, after=after)
+                if not page:
+                    break
+                listed.extend(n.id for n in page)
+                after = (page[-1].created_at, page[-1].id)
+            self.assertEqual(listed, expected)
+
+        def test_fan_out_on_write_inbox_matches_fan_out_on_read(self):
+            street = create_street("Fanout St") or get_street_by_string("Fanout St")
+            other = create_street("Fanout Alt") or get_street_by_string("Fanout Alt")
+            early = create_street_notification("Fanout before", "already there", street)
+
+            def inbox(user, mode, **kwargs):
+                inbox_fanout.mode = mode
+                try:
+                    return [(n["id"], n["isRead"]) for n in user.get_inbox_data("all", **kwargs)]
+                finally:
+                    inbox_fanout.mode = FANOUT_ON_WRITE
+
+            inbox_fanout.mode = FANOUT_ON_WRITE
+            try:
+                resident = create_resident("fanout_res_ix1", "pass", "Fan", "Out", street)
+                driver = create_driver("fanout_drv_ix1", "pass", "Fan", "Driver")
+                inbox_fanout.wait()  # new users are backfilled in the background
+                self.assertIn(early.id, [i for i, _ in inbox(resident, FANOUT_ON_WRITE)])
+
+                direct = create_user_notification("Fanout direct", "msg", resident)
+                # Direct entries are written with the notification itself
+                self.assertIsNotNone(db.session.get(InboxEntry, (resident.id, direct.id)))
+
+                since = get_sync_position(resident)
+                shared = [
+                    create_street_notification("Fanout street", "msg", street),
+                    create_system_notification("Fanout global", "msg"),
+                    create_street_notification("Fanout other", "msg", other),
+                    create_street_notification("Fanout requested", "msg", street, notification_type=NotificationType.REQUESTED),
+                ]
+                version = resident.get_inbox_version()
+                inbox_fanout.wait()
+                # Entries that land after commit move the inbox version again
+                self.assertNotEqual(resident.get_inbox_version(), version)
+
+                mark_notification_as_read(shared[0].id, user=resident)
+                self.assertTrue(db.session.get(InboxEntry, (resident.id, shared[0].id)).is_read)
+                self.assertEqual(inbox(resident, FANOUT_ON_WRITE), inbox(resident, FANOUT_ON_READ))
+                self.assertEqual(inbox(driver, FANOUT_ON_WRITE), inbox(driver, FANOUT_ON_READ))
+                self.assertNotIn(shared[2].id, [i for i, _ in inbox(resident, FANOUT_ON_WRITE)])
+
+                changed = {i for i, _ in inbox(resident, FANOUT_ON_WRITE, since=since)}
+                self.assertEqual(changed, {shared[0].id, shared[1].id, shared[3].id})
+
+                first = inbox(resident, FANOUT_ON_WRITE, limit=2)
+                page = resident.get_inbox_data("all", limit=2)
+                after = (datetime.fromisoformat(page[-1]["createdAt"]), page[-1]["id"])
+                rest = inbox(resident, FANOUT_ON_WRITE, after=after)
+                self.assertEqual(first + rest, inbox(resident, FANOUT_ON_WRITE))
+
+                # Purging a notification takes its entries with it
+                purged_id = shared[1].id
+                shared[1].expires_at = datetime.utcnow() - timedelta(seconds=1)
+                db.session.commit()
+                purge_expired_notifications()
+                self.assertEqual(
+                    db.session.scalar(db.select(db.func.count()).select_from(InboxEntry).where(InboxEntry.notification_id == purged_id)),
+                    0
+                )
+            finally:
+                inbox_fanout.mode = FANOUT_ON_READ
+
+        def test_outbox_written_with_notification_and_drained_with_retries(self):
+            street = create_street("Outbox St") or get_street_by_string("Outbox St")
+            db.session.execute(db.delete(OutboxMessage))
+            db.session.commit()
+
+            outbox.channels = ("sms", "push")
+            try:
+                # Rolled back notifications leave nothing to deliver
+                create_street_notification("Outbox dropped", "msg", street, commit=False)
+                db.session.rollback()
+                self.assertEqual(db.session.scalar(db.select(db.func.count()).select_from(OutboxMessage)), 0)
+
+                made = [create_street_notification(f"Outbox {i}", "msg", street) for i in range(3)]
+            finally:
+                outbox.channels = ()
+
+            messages = db.session.execute(db.select(OutboxMessage)).scalars().all()
+            self.assertEqual(len(messages), 6)
+            self.assertEqual({m.notification_id for m in messages}, {n.id for n in made})
+            self.assertEqual(get_outbox_summary(), {"push": {"pending": 3}, "sms": {"pending": 3}})
+
+            transport = StubTransport(fail_first=1)
+            worker = OutboxWorker(transport, concurrency=3, batch_size=2, max_attempts=3, backoff_base=0)
+            try:
+                self.assertEqual(worker.run_once()["retried"], 6)
+                self.assertEqual(worker.run_once()["delivered"], 6)
+                self.assertEqual(worker.run_once(), {})
+            finally:
+                worker.close()
+
+            # Sends are batched per channel, at most batch_size at a time
+            self.assertTrue(all(size <= 2 for _, size in transport.batches))
+            self.assertEqual(sorted(c for c, _ in transport.sent), ["push"] * 3 + ["sms"] * 3)
+            self.assertEqual({m["payload"]["title"] for _, m in transport.sent}, {n.title for n in made})
+            db.session.expire_all()
+            self.assertTrue(all(m.status == "delivered" and m.attempts == 2 for m in db.session.execute(db.select(OutboxMessage)).scalars()))
+
+            # Exhausted messages are marked failed until requeued
+            db.session.execute(db.update(OutboxMessage).values(status="pending", attempts=0, next_attempt_at=datetime.utcnow()))
+            db.session.commit()
+            failing = OutboxWorker(StubTransport(fail_first=5), max_attempts=1, backoff_base=0)
+            try:
+                self.assertEqual(failing.run_once()["failed"], 6)
+            finally:
+                failing.close()
+            self.assertEqual(requeue_failed_outbox_messages("sms"), 3)
+            self.assertEqual(get_outbox_summary(), {"push": {"failed": 3}, "sms": {"pending": 3}})
+
+        def test_inbox_summary_groups_counts_and_finds_newest_urgent(self):
+            street = create_street("Summary St") or get_street_by_string("Summary St")
+            other = create_street("Summary Alt") or get_street_by_string("Summary Alt")
+            user = create_resident("summary_res_ix1", "pass", "Sum", "Mary", street)
+
+            create_street_notification("Summary street", "msg", street)
+            create_user_notification("Summary urgent old", "msg", user, priority=NotificationPriority.URGENT)
+            newest = create_user_notification(
+                "Summary urgent new", "msg", user,
+                category=NotificationCategory.SERVICE, priority=NotificationPriority.URGENT
+            )
+            create_street_notification("Summary hidden", "msg", other, priority=NotificationPriority.URGENT)
+            read = create_street_notification("Summary read", "msg", street, priority=NotificationPriority.LOW)
+            mark_notification_as_read(read.id, user=user)
+
+            # Brute force over the resident's visible rows
+            rows = db.session.execute(
+                db.select(Notification).where(user._visibility_filter(), Notification.not_expired())
+            ).scalars().all()
+            read_ids = set(db.session.scalars(db.select(NotificationReceipt.notification_id).where(NotificationReceipt.user_id == user.id)))
+
+            def expected(key):
+                counts = {}
+                for n in rows:
+                    bucket = counts.setdefault(getattr(n, key), {"total": 0, "unread": 0})
+                    bucket["total"] += 1
+                    bucket["unread"] += n.id not in read_ids
+                return counts
+
+            for mode in (FANOUT_ON_READ, FANOUT_ON_WRITE):
+                inbox_fanout.mode = mode
+                try:
+                    if mode == FANOUT_ON_WRITE:
+                        inbox_fanout.rebuild()
+                        db.session.commit()
+                    summary = user.get_inbox_summary()
+                finally:
+                    inbox_fanout.mode = FANOUT_ON_READ
+
+                self.assertEqual(summary["total"], len(rows))
+                self.assertEqual(summary["unread"], len([n for n in rows if n.id not in read_ids]))
+                self.assertEqual({k: v for k, v in summary["byCategory"].items() if v["total"]}, expected("category"))
+                self.assertEqual({k: v for k, v in summary["byPriority"].items() if v["total"]}, expected("priority"))
+                self.assertEqual(summary["byPriority"]["low"], {"total": 1, "unread": 0})
+                self.assertEqual(summary["latestUrgent"]["id"], newest.id)
+                self.assertIn("urgent", summary["byPriority"])
+
+            driver = create_driver("summary_drv_ix1", "pass", "Sum", "Driver")
+            driver_summary = driver.get_inbox_summary()
+            self.assertIsNone(driver_summary["latestUrgent"])
+            self.assertEqual(
+                driver_summary["total"],
+                db.session.scalar(
+                    db.select(db.func.count()).select_from(Notification)
+                    .where(Notification.type.in_(["requested", "confirmed"]), Notification.not_expired())
+                )
+            )
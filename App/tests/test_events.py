@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from App.events import (
+    EventHub,
+    EventBroker,
+    PENDING_EVENTS_KEY,
+    parse_address,
+    _publish_committed_events,
+    _discard_rolled_back_events
+)
+
+
+class TestEventHub(unittest.TestCase):
+    def setUp(self):
+        self.hub = EventHub()
+
+    def test_publish_reaches_matching_subscribers_once(self):
+        street = self.hub.subscribe([("street", "Main St"), ("global", "")])
+        other = self.hub.subscribe([("street", "Elm St")])
+
+        self.hub.publish([("street", "Main St"), ("global", "")], "notification", {"id": 1})
+
+        self.assertEqual(street.get(timeout=0.1)["data"], {"id": 1})
+        self.assertIsNone(street.get(timeout=0.01))  # deduplicated across channels
+        self.assertIsNone(other.get(timeout=0.01))
+
+    def test_unsubscribe_stops_delivery(self):
+        subscription = self.hub.subscribe([("drivers", "")])
+        self.hub.unsubscribe(subscription)
+
+        self.hub.publish([("drivers", "")], "driver_status", {"id": 1})
+        self.assertIsNone(subscription.get(timeout=0.01))
+        self.assertEqual(dict(self.hub._subscribers), {})
+
+    def test_overflow_marks_subscription(self):
+        subscription = self.hub.subscribe([("global", "")], maxsize=1)
+        self.hub.publish([("global", "")], "notification", {"id": 1})
+        self.hub.publish([("global", "")], "notification", {"id": 2})
+        self.assertTrue(subscription.overflowed)
+
+    def test_publish_on_commit_waits_for_commit(self):
+        session = Mock()
+        session.info = {}
+        hub = EventHub()
+        subscription = hub.subscribe([("global", "")])
+
+        hub.publish_on_commit(session, [("global", "")], "notification", {"id": 1})
+        self.assertIsNone(subscription.get(timeout=0.01))
+        self.assertEqual(len(session.info[PENDING_EVENTS_KEY]), 1)
+
+        # Rolled back transactions drop their events
+        _discard_rolled_back_events(session, SimpleNamespace(parent=None))
+        self.assertNotIn(PENDING_EVENTS_KEY, session.info)
+
+    def test_committed_events_are_published(self):
+        session = Mock()
+        session.info = {PENDING_EVENTS_KEY: [([("drivers", "")], "driver_status", {"id": 7})]}
+
+        from App import events
+        subscription = events.hub.subscribe([("drivers", "")])
+        try:
+            _publish_committed_events(session)
+            self.assertEqual(subscription.get(timeout=0.1)["data"], {"id": 7})
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("localhost:6390"), ("localhost", 6390))
+        self.assertEqual(parse_address(":6390"), ("localhost", 6390))
+
+
+class TestEventBroker(unittest.TestCase):
+    def test_broker_relays_between_hubs(self):
+        authkey = b"test-key"
+        broker = EventBroker(("localhost", 0), authkey)
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+
+        hubs = [EventHub(), EventHub()]
+        for hub in hubs:
+            threading.Thread(target=hub._run_broker_client, args=(broker.address, authkey), daemon=True).start()
+
+        deadline = time.time() + 5
+        while any(hub._broker is None for hub in hubs) or len(broker._connections) < 2:
+            self.assertLess(time.time(), deadline, "hubs did not connect to the broker")
+            time.sleep(0.01)
+
+        subscription = hubs[1].subscribe([("street", "Main St")])
+        hubs[0].publish([("street", "Main St")], "notification", {"id": 3})
+
+        message = subscription.get(timeout=5)
+        self.assertIsNotNone(message)
+        self.assertEqual(message["data"], {"id": 3})
+        broker.close()
+
+    def test_broker_ignores_hubs_with_the_wrong_key(self):
+        broker = EventBroker(("localhost", 0), b"test-key")
+        threading.Thread(target=broker.serve_forever, daemon=True).start()
+
+        good, bad = EventHub(), EventHub()
+        threading.Thread(target=good._run_broker_client, args=(broker.address, b"test-key"), daemon=True).start()
+        threading.Thread(target=bad._run_broker_client, args=(broker.address, b"wrong-key", 60), daemon=True).start()
+
+        deadline = time.time() + 5
+        while good._broker is None or len(broker._connections) < 1:
+            self.assertLess(time.time(), deadline, "hub did not connect to the broker")
+            time.sleep(0.01)
+
+        subscription = good.subscribe([("drivers", "")])
+        bad_subscription = bad.subscribe([("drivers", "")])
+        time.sleep(0.1)  # let the bad hub's handshake fail
+        self.assertEqual(len(broker._connections), 1)
+        self.assertIsNone(bad._broker)
+
+        good.publish([("drivers", "")], "driver_status", {"id": 4})
+        self.assertEqual(subscription.get(timeout=5)["channels"], [("drivers", "")])
+        self.assertIsNone(bad_subscription.get(timeout=0.1))
+        broker.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
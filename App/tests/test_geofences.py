@@ -0,0 +1,45 @@
+import datetime as dt
+import unittest
+
+from App.geofences import Fence, GeofenceIndex
+
+DAY = dt.date(2034, 8, 1)
+
+
+class TestGeofenceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = GeofenceIndex(radius=50, ttl=None)  # the sets below are never reloaded
+        self.index._fences[1] = [
+            self.fence(10, ((10.650, -61.500),)),
+            self.fence(11, ((10.660, -61.500), (10.660, -61.490))),
+            self.fence(12, ((10.650, -61.500),), day=DAY + dt.timedelta(days=1)),
+        ]
+
+    def fence(self, stop_id, shape, day=DAY):
+        return Fence(stop_id, f"Street {stop_id}", day, shape, self.index._bounds(shape))
+
+    def test_fires_once_on_entering(self):
+        self.assertEqual(self.index.entered(1, (10.640, -61.500), DAY), [])
+        self.assertEqual([f.stop_id for f in self.index.entered(1, (10.6502, -61.500), DAY)], [10])
+        self.assertEqual(self.index.entered(1, (10.6501, -61.500), DAY), [])  # still inside
+
+        # Leaving and coming back enters again
+        self.index.entered(1, (10.640, -61.500), DAY)
+        self.assertEqual([f.stop_id for f in self.index.entered(1, (10.650, -61.5003), DAY)], [10])
+
+    def test_polyline_fence_and_radius(self):
+        # 40 m off the middle of the street's polyline, but over 400 m from either end
+        self.assertEqual([f.stop_id for f in self.index.entered(1, (10.66036, -61.495), DAY)], [11])
+        self.assertEqual(self.index.entered(1, (10.6610, -61.495), DAY), [])
+
+    def test_only_stops_scheduled_that_day(self):
+        later = DAY + dt.timedelta(days=1)
+        self.assertEqual([f.stop_id for f in self.index.entered(1, (10.650, -61.500), later)], [12])
+
+    def test_invalidate_drops_the_fence_set(self):
+        self.index.invalidate(1)
+        self.assertNotIn(1, self.index._fences)
+
+
+if __name__ == "__main__":
+    unittest.main()
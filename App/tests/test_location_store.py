@@ -0,0 +1,48 @@
+import unittest
+
+from App.location_store import LocationStore, Ping, PingRing
+
+
+class TestPingRing(unittest.TestCase):
+    def test_keeps_the_most_recent_pings(self):
+        ring = PingRing(4)
+        for i in range(10):
+            ring.append(float(i), 10.0 + i, -61.0, float(i))
+        self.assertEqual(ring.size, 4)
+        self.assertEqual([p.ts for p in ring.since(1, 0.0)], [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual([p.ts for p in ring.since(1, 8.0)], [8.0, 9.0])
+        self.assertEqual(ring.ping(1, ring.newest).latitude, 19.0)
+
+    def test_newest_is_by_timestamp_not_arrival(self):
+        ring = PingRing(3)
+        ring.append(100.0, 1.0, 1.0, 0.0)
+        ring.append(50.0, 2.0, 2.0, 0.0)  # late ping from before the last one
+        self.assertEqual(ring.ping(1, ring.newest).ts, 100.0)
+
+        # Once the newest is overwritten the next newest takes over
+        ring.append(60.0, 3.0, 3.0, 0.0)
+        ring.append(55.0, 4.0, 4.0, 0.0)
+        self.assertEqual(ring.ping(1, ring.newest).ts, 60.0)
+
+
+class TestLocationStore(unittest.TestCase):
+    def setUp(self):
+        self.store = LocationStore(ring_size=3, flush_size=5, flush_interval=None)
+
+    def test_record_fills_rings_and_pending_batch(self):
+        pings = [Ping(1, float(t), 10.0, -61.0, None if t % 2 else 5.0) for t in range(4)]
+        pings.append(Ping(2, 1.0, 11.0, -61.0))
+        self.assertEqual(self.store.record(pings), 5)
+
+        self.assertEqual(self.store.latest(1), Ping(1, 3.0, 10.0, -61.0, None))
+        self.assertEqual([p.ts for p in self.store.recent(1)], [1.0, 2.0, 3.0])
+        self.assertIsNone(self.store.latest(3))
+        self.assertTrue(self.store.flush_due())
+
+        # Unflushed history is not limited by the ring size
+        self.assertEqual(self.store.unflushed(1, 0.0, 3.0), pings[:3])
+        self.assertEqual(self.store.unflushed(2, 0.0, 10.0), pings[4:])
+
+
+if __name__ == "__main__":
+    unittest.main()
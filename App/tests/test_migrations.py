@@ -0,0 +1,95 @@
+import datetime as dt
+import importlib.util
+import os
+import pathlib
+import tempfile
+import unittest
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from alembic.util import CommandError
+
+VERSIONS = pathlib.Path(__file__).resolve().parents[2] / 'migrations' / 'versions'
+
+
+def load_revision(revision):
+    path = next(VERSIONS.glob(f'{revision}_*.py'))
+    spec = importlib.util.spec_from_file_location(f'migration_{revision}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestTypedStopDatesMigration(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.engine = sa.create_engine(f'sqlite:///{self.path}')
+        self.migration = load_revision('ac6c08667739')
+        for revision in ('9b1a13112c68', 'a7182b77a44b'):
+            self.run_step(load_revision(revision), 'upgrade')
+
+        with self.engine.begin() as connection:
+            connection.execute(sa.text(
+                "INSERT INTO users VALUES (1, 'D', 'River', 'driver', 'x', 'driver'), (2, 'R', 'Esident', 'resident', 'x', 'resident');"
+            ))
+            connection.execute(sa.text("INSERT INTO drivers VALUES (1, 'inactive', NULL)"))
+            connection.execute(sa.text("INSERT INTO residents VALUES (2, 'Main St')"))
+            connection.execute(sa.text(
+                "INSERT INTO stop VALUES "
+                "(1, 'Main St', '2025-09-14', '2025-09-01T10:00:00', 0, 1), "
+                "(2, 'Main St', 'next tuesday', '2025-09-01 10:00', 0, 1), "
+                "(3, 'Elm St', '2025-09-15 07:30', '2025-09-01T10:00:00.123456', 1, 1)"
+            ))
+            connection.execute(sa.text("INSERT INTO stop_request VALUES (1, 'Main St', '2025-09-02', 2)"))
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def run_step(self, module, step):
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                getattr(module, step)()
+
+    def stops(self):
+        with self.engine.connect() as connection:
+            return connection.execute(sa.text("SELECT id, scheduled_date, created_at FROM stop ORDER BY id")).all()
+
+    def stop_columns(self):
+        return {column['name']: type(column['type']) for column in sa.inspect(self.engine).get_columns('stop')}
+
+    def test_bad_value_stops_the_upgrade_before_any_change(self):
+        before = self.stops()
+        with self.assertRaises(CommandError) as raised:
+            self.run_step(self.migration, 'upgrade')
+        self.assertIn('stop ids 2', str(raised.exception))
+        self.assertNotIn('stop_request', str(raised.exception))
+
+        self.assertEqual(self.stops(), before)
+        self.assertEqual(self.stop_columns()['scheduled_date'], sa.VARCHAR)
+        self.assertNotIn('scheduled_date_new', self.stop_columns())
+
+    def test_upgrade_downgrade_upgrade_round_trips(self):
+        with self.engine.begin() as connection:
+            connection.execute(sa.text("UPDATE stop SET scheduled_date = '2025-09-16' WHERE id = 2"))
+
+        self.run_step(self.migration, 'upgrade')
+        self.assertEqual(self.stop_columns()['scheduled_date'], sa.DATETIME)
+        upgraded = self.stops()
+        self.assertEqual(
+            [row.scheduled_date for row in upgraded],
+            ['2025-09-14 00:00:00.000000', '2025-09-16 00:00:00.000000', '2025-09-15 07:30:00.000000']
+        )
+
+        self.run_step(self.migration, 'downgrade')
+        self.assertEqual(self.stop_columns()['scheduled_date'], sa.VARCHAR)
+        self.assertEqual(dt.datetime.fromisoformat(self.stops()[2].created_at), dt.datetime(2025, 9, 1, 10, 0, 0, 123456))
+
+        self.run_step(self.migration, 'upgrade')
+        self.assertEqual(self.stops(), upgraded)
+
+
+if __name__ == "__main__":
+    unittest.main()
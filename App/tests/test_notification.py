@@ -2,10 +2,15 @@ import unittest
 import datetime as dt
 from unittest.mock import Mock, patch
 
-from App.models.notification import Notification
+from App.models.notification import Notification, serialize_notifications, serialize_notifications_api, JSON_COLUMNS
 from App.models.enums import NotificationType, NotificationCategory, NotificationPriority
 
 
+def _values(notification):
+    """Column tuple in JSON_COLUMNS order, as a column-only query would return it"""
+    return tuple(getattr(notification, column.key) for column in JSON_COLUMNS)
+
+
 class TestNotification(unittest.TestCase):
     def setUp(self):
         self.title = "Test Notification"
@@ -299,5 +304,48 @@ class TestNotification(unittest.TestCase):
                 self.assertEqual(n.priority, p.value)
 
 
+    def test_serialize_notifications_matches_get_json(self):
+        n = Notification(
+            title=self.title,
+            message=self.message,
+            notification_type=self.notification_type,
+            recipient=self.user,
+            street=self.street
+        )
+        n.id = 1
+        n.created_at = dt.datetime.utcnow() - dt.timedelta(minutes=90)
+        read_at = dt.datetime.utcnow()
+
+        self.assertEqual(serialize_notifications([n]), [n.get_json()])
+        self.assertEqual(serialize_notifications([(*_values(n), read_at)]), [n.get_json(read_at=read_at)])
+
+    def test_serialize_notifications_uses_one_now(self):
+        now = dt.datetime(2030, 1, 1, 12, 0)
+        rows = []
+        for minutes in (0, 5, 120):
+            n = Notification(title=self.title, message=self.message, notification_type=self.notification_type)
+            n.created_at = now - dt.timedelta(minutes=minutes)
+            rows.append(n)
+
+        ages = [item["ageInMinutes"] for item in serialize_notifications(rows, now=now)]
+        self.assertEqual(ages, [0, 5, 120])
+
+        api = serialize_notifications_api(rows, now=now)
+        self.assertEqual([item["formattedCreatedAt"] for item in api], ["Just now", "5 minutes ago", "2 hours ago"])
+
+    def test_serialize_notifications_api_from_tuples(self):
+        n = Notification(
+            title=self.title,
+            message=self.message,
+            notification_type=self.notification_type,
+            recipient=self.user
+        )
+        n.id = 1
+
+        d = serialize_notifications_api([(*_values(n), "John Doe")])[0]
+        self.assertEqual(d["recipient"], {"id": self.user.id, "name": "John Doe", "type": self.user.type})
+        self.assertIsNone(serialize_notifications_api([_values(n)])[0]["recipient"])
+
+
 if __name__ == "__main__":
     unittest.main()
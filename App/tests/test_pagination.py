@@ -0,0 +1,73 @@
+import unittest
+import datetime as dt
+
+from App.utils.pagination import (
+    encode_cursor,
+    decode_cursor,
+    parse_page_args,
+    page_response,
+    encode_rank_cursor,
+    decode_rank_cursor,
+    ranked_page_response,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
+)
+
+
+class TestPagination(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        created_at = dt.datetime(2025, 9, 14, 7, 30, 15, 123456)
+        cursor = encode_cursor(created_at, 42)
+        self.assertEqual(decode_cursor(cursor), (created_at, 42))
+
+    def test_decode_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_parse_page_args_defaults(self):
+        self.assertEqual(parse_page_args({}), (DEFAULT_PAGE_SIZE, None))
+
+    def test_parse_page_args_clamps_limit(self):
+        limit, _ = parse_page_args({"limit": str(MAX_PAGE_SIZE * 10)})
+        self.assertEqual(limit, MAX_PAGE_SIZE)
+
+    def test_parse_page_args_rejects_bad_limit(self):
+        with self.assertRaises(ValueError):
+            parse_page_args({"limit": "0"})
+        with self.assertRaises(ValueError):
+            parse_page_args({"limit": "abc"})
+
+    def test_page_response_next_cursor(self):
+        created_at = dt.datetime(2025, 1, 1, 12, 0, 0)
+        items = [{"id": i, "createdAt": created_at.isoformat()} for i in (3, 2, 1)]
+
+        page = page_response(items, 2)
+        self.assertEqual([i["id"] for i in page["data"]], [3, 2])
+        self.assertEqual(decode_cursor(page["nextCursor"]), (created_at, 2))
+
+        last = page_response(items[2:], 2)
+        self.assertIsNone(last["nextCursor"])
+
+    def test_page_response_custom_key(self):
+        items = [{"id": i, "scheduledDate": f"2025-01-0{i}T07:30:00"} for i in (1, 2, 3)]
+        page = page_response(items, 2, key="scheduledDate")
+        self.assertEqual(decode_cursor(page["nextCursor"]), (dt.datetime(2025, 1, 2, 7, 30), 2))
+
+
+    def test_rank_cursor_round_trip(self):
+        cursor = encode_rank_cursor(-3.1415926535897931, 7)
+        self.assertEqual(decode_rank_cursor(cursor), (-3.1415926535897931, 7))
+        with self.assertRaises(ValueError):
+            decode_rank_cursor(encode_cursor(dt.datetime(2025, 1, 1), 1))
+
+    def test_ranked_page_response_and_custom_decoder(self):
+        items = [{"id": i, "rank": -float(i)} for i in (9, 5, 4)]
+        page = ranked_page_response(items, 2)
+        self.assertEqual(decode_rank_cursor(page["nextCursor"]), (-5.0, 5))
+
+        _, after = parse_page_args({"after": page["nextCursor"]}, decode=decode_rank_cursor)
+        self.assertEqual(after, (-5.0, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import itertools
+import random
+import time
+import unittest
+
+from App.route_planner import RoutePlanner, path_length
+from App.utils.geo import haversine_m
+
+
+def random_points(n, seed):
+    rng = random.Random(seed)
+    return sorted((10.6 + rng.random() * 0.1, -61.55 + rng.random() * 0.1) for _ in range(n))
+
+
+def brute_force(points, start=None):
+    planner = RoutePlanner()
+    matrix, _ = planner.matrix(points)
+    from_start = [haversine_m(start, p) for p in points] if start else None
+    return min(path_length(order, matrix, from_start) for order in itertools.permutations(range(len(points))))
+
+
+class TestRoutePlanner(unittest.TestCase):
+    def test_trivial_inputs(self):
+        planner = RoutePlanner()
+        self.assertEqual(planner.plan([]), ([], 0.0))
+        self.assertEqual(planner.plan([(10.6, -61.5)]), ([0], 0.0))
+
+    def test_order_visits_every_point_once(self):
+        points = random_points(60, seed=1)
+        order, total = RoutePlanner().plan(points, start=(10.65, -61.5))
+        self.assertEqual(sorted(order), list(range(60)))
+        self.assertGreater(total, 0)
+
+    def test_improves_on_nearest_neighbour(self):
+        planner = RoutePlanner()
+        for seed in range(5):
+            points = random_points(80, seed)
+            matrix, _ = planner.matrix(points)
+            greedy = path_length(planner._nearest_neighbour(matrix, None), matrix)
+            _, total = planner.plan(points)
+            self.assertLessEqual(total, greedy)
+
+    def test_small_routes_are_near_optimal(self):
+        planner = RoutePlanner()
+        for seed in range(10):
+            points = random_points(7, seed)
+            _, total = planner.plan(points)
+            self.assertLessEqual(total, brute_force(points) * 1.1)
+
+    def test_matrices_are_cached_per_point_set(self):
+        planner = RoutePlanner(cache_size=2)
+        a, b, c = random_points(5, 1), random_points(5, 2), random_points(5, 3)
+        self.assertIs(planner.matrix(a)[0], planner.matrix(list(a))[0])
+        planner.matrix(b)
+        planner.matrix(c)  # evicts a
+        self.assertEqual(len(planner._matrices), 2)
+        self.assertNotIn(tuple(a), planner._matrices)
+
+    def test_two_hundred_stops_plan_quickly(self):
+        points = random_points(200, seed=4)
+        started = time.perf_counter()
+        order, _ = RoutePlanner(time_limit=0.5).plan(points)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(len(order), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import datetime as dt
 from unittest.mock import Mock, patch
 
-from App.models.stop import Stop
+from App.models.stop import Stop, parse_scheduled_date
 
 
 class TestStop(unittest.TestCase):
@@ -26,7 +26,7 @@ class TestStop(unittest.TestCase):
 
         self.assertEqual(stop.driver_id, 1)
         self.assertEqual(stop.street_name, "Test Street")
-        self.assertEqual(stop.scheduled_date, self.scheduled_date)
+        self.assertEqual(stop.scheduled_date, dt.datetime(2024, 1, 15, 10))
         self.assertFalse(stop.has_arrived)
         self.assertIsNotNone(stop.created_at)
 
@@ -146,8 +146,16 @@ class TestStop(unittest.TestCase):
             street=self.street,
             scheduled_date=self.scheduled_date
         )
+        self.assertIsInstance(stop.created_at, dt.datetime)
         # just check it parses
-        dt.datetime.fromisoformat(stop.created_at)
+        dt.datetime.fromisoformat(stop.get_json()["createdAt"])
+
+    def test_parse_scheduled_date(self):
+        self.assertEqual(parse_scheduled_date("2024-01-15"), dt.datetime(2024, 1, 15))
+        self.assertEqual(parse_scheduled_date("2024-01-15 07:30"), dt.datetime(2024, 1, 15, 7, 30))
+        self.assertEqual(parse_scheduled_date(dt.date(2024, 1, 15)), dt.datetime(2024, 1, 15))
+        with self.assertRaises(ValueError):
+            parse_scheduled_date("next tuesday")
 
     @patch("App.models.stop.db")
     def test_to_string_changes_with_status(self, db):
@@ -160,13 +168,13 @@ class TestStop(unittest.TestCase):
         s1 = stop.to_string()
         self.assertIn("Test Street", s1)
         self.assertIn("scheduled", s1)
-        self.assertIn(self.scheduled_date, s1)
+        self.assertIn("2024-01-15 10:00", s1)
 
         stop.has_arrived = True
         s2 = stop.to_string()
         self.assertIn("Test Street", s2)
         self.assertIn("was made", s2)
-        self.assertIn(self.scheduled_date, s2)
+        self.assertIn("2024-01-15 10:00", s2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import random
+import time
+import unittest
+
+from App.models.street import Street
+from App.street_index import StreetIndex
+from App.utils.geo import haversine_m, point_shape_m, validate_point
+
+
+def brute_force(streets, point):
+    return sorted(((s.name, point_shape_m(point, s.shape)) for s in streets), key=lambda item: (item[1], item[0]))
+
+
+class TestGeo(unittest.TestCase):
+    def test_haversine_one_degree_of_latitude(self):
+        self.assertAlmostEqual(haversine_m((10.0, -61.0), (11.0, -61.0)), 111195, delta=5)
+
+    def test_distance_to_polyline_is_perpendicular(self):
+        shape = [(0.0, 0.0), (0.0, 0.01)]
+        self.assertAlmostEqual(point_shape_m((0.001, 0.005), shape), 111.2, delta=0.5)
+        self.assertAlmostEqual(point_shape_m((0.0, 0.02), shape), haversine_m((0.0, 0.02), (0.0, 0.01)), delta=0.5)
+
+    def test_validate_point(self):
+        self.assertEqual(validate_point("10.5", -61), (10.5, -61.0))
+        for lat, lon in ((91, 0), (0, 181), (None, 0), ("x", 0)):
+            with self.assertRaises(ValueError):
+                validate_point(lat, lon)
+
+
+class TestStreetIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.streets = []
+        for i in range(400):
+            lat, lon = 10.6 + rng.random() * 0.1, -61.55 + rng.random() * 0.1
+            if i % 3:
+                self.streets.append(Street(f"Street {i}", lat, lon))
+            else:
+                self.streets.append(Street(f"Road {i}", path=[[lat, lon], [lat + 0.004, lon + 0.002], [lat + 0.006, lon - 0.003]]))
+        self.streets.append(Street("Unlocated"))
+
+        self.index = StreetIndex(cell_size=0.005)
+        self.index.load(self.streets)
+        self.points = [(10.58 + rng.random() * 0.14, -61.57 + rng.random() * 0.14) for _ in range(50)]
+
+    def test_unlocated_streets_are_not_indexed(self):
+        self.assertEqual(len(self.index), 400)
+
+    def test_nearest_matches_brute_force(self):
+        located = self.streets[:-1]
+        for point in self.points:
+            expected = brute_force(located, point)[:5]
+            found = self.index.nearest(point, k=5)
+            self.assertEqual([name for name, _ in found], [name for name, _ in expected])
+            for (_, d1), (_, d2) in zip(found, expected):
+                self.assertAlmostEqual(d1, d2)
+
+    def test_nearest_far_away_and_with_max_distance(self):
+        # Outside the indexed area the search still ends at the index bounds
+        self.assertEqual(len(self.index.nearest((0.0, 0.0), k=3)), 3)
+        self.assertEqual(self.index.nearest((0.0, 0.0), k=3, max_distance=1000), [])
+        self.assertEqual(len(self.index.nearest(self.points[0], k=1000)), 400)
+
+    def test_within_matches_brute_force(self):
+        located = self.streets[:-1]
+        for point in self.points:
+            expected = [(name, d) for name, d in brute_force(located, point) if d <= 750]
+            self.assertEqual([name for name, _ in self.index.within(point, 750)], [name for name, _ in expected])
+
+    def test_within_only_scans_indexed_cells(self):
+        # A radius box far larger than the indexed area is clipped to it
+        started = time.perf_counter()
+        self.assertEqual(len(self.index.within(self.points[0], 2e7)), 400)
+        self.assertEqual(self.index.within((-80.0, -170.0), 1000), [])
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_update_moves_and_removes_streets(self):
+        point = (1.0, 1.0)
+        self.assertNotEqual(self.index.nearest(point)[0][0], "Street 1")
+
+        self.index.update("Street 1", [(1.0, 1.0001)])
+        name, distance = self.index.nearest(point)[0]
+        self.assertEqual(name, "Street 1")
+        self.assertLess(distance, 20)
+        self.assertNotIn("Street 1", [n for n, _ in self.index.within(self.streets[1].shape[0], 1)])
+
+        self.index.update("Street 1", [])
+        self.assertNotEqual(self.index.nearest(point)[0][0], "Street 1")
+        self.assertEqual(len(self.index), 399)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import datetime as dt
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from flask import current_app, has_app_context
+
+# Stop dates are naive wall-clock times in the app's timezone (TIMEZONE, an IANA
+# name such as 'America/Port_of_Spain'; the server's own when unset). Timestamps
+# (created_at, pings, expiries) are naive UTC. These helpers move between the two.
+
+
+@lru_cache(maxsize=8)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def local_timezone() -> dt.tzinfo | None:
+    """The configured timezone; None means the server's local time"""
+    name = current_app.config.get('TIMEZONE') if has_app_context() else None
+    return _zone(name) if name else None
+
+
+def to_local(value: dt.datetime) -> dt.datetime:
+    """A naive UTC datetime as an aware datetime in the stops' timezone"""
+    return value.replace(tzinfo=dt.timezone.utc).astimezone(local_timezone())
+
+
+def local_today() -> dt.date:
+    return to_local(dt.datetime.utcnow()).date()
+
+
+def timezone_name(value: dt.datetime) -> str:
+    """IANA name of an aware datetime's zone when configured, otherwise its abbreviation"""
+    return getattr(value.tzinfo, 'key', None) or value.tzname()
+
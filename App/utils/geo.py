@@ -0,0 +1,47 @@
+import math
+from typing import Sequence
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180  # along a meridian, ~111.2 km
+
+Point = tuple[float, float]  # (latitude, longitude) in degrees
+
+
+def validate_point(latitude, longitude) -> Point:
+    """(lat, lon) as floats; raises ValueError when missing or out of range"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("'lat' and 'lon' must be numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("'lat' must be within [-90, 90] and 'lon' within [-180, 180]")
+    return latitude, longitude
+
+
+def haversine_m(a: Point, b: Point) -> float:
+    """Great-circle distance in meters"""
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def point_segment_m(p: Point, a: Point, b: Point) -> float:
+    """
+    Distance in meters from p to the segment a-b, on a local equirectangular
+    projection around p (accurate for street-length segments)
+    """
+    kx = METERS_PER_DEGREE * math.cos(math.radians(p[0]))
+    ax, ay = (a[1] - p[1]) * kx, (a[0] - p[0]) * METERS_PER_DEGREE
+    bx, by = (b[1] - p[1]) * kx, (b[0] - p[0]) * METERS_PER_DEGREE
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length2))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+def point_shape_m(p: Point, shape: Sequence[Point]) -> float:
+    """Distance in meters from p to a point (one vertex) or a polyline"""
+    if len(shape) == 1:
+        return haversine_m(p, shape[0])
+    return min(point_segment_m(p, shape[i], shape[i + 1]) for i in range(len(shape) - 1))
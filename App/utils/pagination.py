@@ -0,0 +1,103 @@
+import base64
+import datetime as dt
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: dt.datetime, id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque url-safe token."""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, int]:
+    """Decode a token produced by encode_cursor. Raises ValueError when malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return dt.datetime.fromisoformat(created_at), int(id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
+
+
+def parse_page_args(args, decode=None) -> tuple[int, tuple | None]:
+    """
+    Read '?limit=&after=' from request args.
+    Returns (limit, after) and raises ValueError on bad input.
+    'after' is decoded with decode_cursor unless another decoder is given.
+    """
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be an integer")
+
+    if limit < 1:
+        raise ValueError("'limit' must be at least 1")
+
+    after = args.get("after")
+    decode = decode or decode_cursor
+    return min(limit, MAX_PAGE_SIZE), decode(after) if after else None
+
+
+def parse_date_arg(args, name: str, end: bool = False) -> dt.datetime | None:
+    """ISO date/datetime query arg; a bare end date ('to') includes that whole day"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = dt.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO date or datetime")
+    if end and 'T' not in value and ' ' not in value:
+        parsed += dt.timedelta(days=1)
+    return parsed
+
+
+def page_response(items: list[dict], limit: int, key: str = "createdAt") -> dict:
+    """
+    Trim a 'limit + 1' result to one page and attach the next cursor.
+    Items must be serialized with 'id' and the ISO datetime sort key ('createdAt' by default).
+    """
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(dt.datetime.fromisoformat(last[key]), last["id"])
+
+    return {"data": items, "nextCursor": next_cursor}
+
+
+def encode_rank_cursor(rank: float, id: int) -> str:
+    """Encode a (rank, id) keyset position of a ranked result list."""
+    raw = f"{rank!r}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    """Decode a token produced by encode_rank_cursor. Raises ValueError when malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return float(rank), int(id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
+
+
+def ranked_page_response(items: list[dict], limit: int) -> dict:
+    """
+    page_response for ranked results (best first).
+    Items must be serialized with 'rank' (lower is better) and 'id'.
+    """
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_rank_cursor(last["rank"], last["id"])
+
+    return {"data": items, "nextCursor": next_cursor}
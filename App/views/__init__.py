@@ -7,7 +7,8 @@ from .admin import setup_admin
 from .residents import resident_views
 from .stops import stop_views
 from .street import street_views
+from .notification import notification_views
 
 
-views = [user_views, index_views, auth_views, resident_views, stop_views, street_views]
+views = [user_views, index_views, auth_views, resident_views, stop_views, street_views, notification_views]
 # blueprints must be added to this list
@@ -0,0 +1,73 @@
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, current_user as jwt_current_user
+
+from App.controllers.notification import mark_all_notifications_as_read, get_unread_count, search_notifications, SearchNotSupported
+from App.utils.pagination import parse_page_args, parse_date_arg, decode_rank_cursor, ranked_page_response
+
+
+notification_views = Blueprint('notification_views', __name__, template_folder='../templates')
+
+'''
+API Routes
+'''
+
+@notification_views.route('/api/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def unread_count_action():
+    # Badge polling: served from maintained counters, no scan over notifications
+    return jsonify({"data": {"count": get_unread_count(jwt_current_user)}}), 200
+
+@notification_views.route('/api/notifications/read-all', methods=['POST'])
+@jwt_required()
+def read_all_notifications_action():
+    # Optional body: {"ids": [1, 2, 3]} to only mark a multi-selection as read
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify(message="Body must be a JSON object"), 400
+    notification_ids = data.get('ids')
+
+    if notification_ids is not None:
+        if not isinstance(notification_ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in notification_ids
+        ):
+            return jsonify(message="'ids' must be a list of notification ids"), 400
+
+    count = mark_all_notifications_as_read(jwt_current_user, notification_ids=notification_ids)
+
+    return jsonify({
+        "message": "Notifications marked as read",
+        "data": {"count": count}
+    }), 200
+
+@notification_views.route('/api/notifications/search', methods=['GET'])
+@jwt_required()
+def search_notifications_action():
+    # ?q=<text>&type=&street=&from=<ISO date>&to=<ISO date>&limit=&after=<nextCursor>
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify(message="'q' is required"), 400
+
+    try:
+        limit, after = parse_page_args(request.args, decode=decode_rank_cursor)
+        start = parse_date_arg(request.args, 'from')
+        end = parse_date_arg(request.args, 'to', end=True)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    try:
+        items = search_notifications(
+            q,
+            user=jwt_current_user,
+            notification_type=request.args.get('type') or None,
+            street_name=request.args.get('street') or None,
+            start=start,
+            end=end,
+            limit=limit + 1,
+            after=after
+        )
+    except SearchNotSupported as e:
+        return jsonify(message=str(e)), 501
+    return jsonify(ranked_page_response(items, limit)), 200
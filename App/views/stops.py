@@ -1,13 +1,17 @@
-from flask import Blueprint, render_template, jsonify, request, send_from_directory, flash, redirect, url_for
+import json
+
+from flask import Blueprint, render_template, jsonify, request, send_from_directory, flash, redirect, url_for, Response, stream_with_context
 from flask_jwt_extended import jwt_required, current_user as jwt_current_user
 
 from .index import index_views
 
 from App.controllers.stop import (
     get_stop_by_id,
-    get_all_stops,
+    get_stops,
+    iter_stops,
     create_stop,
-    complete_stop,
+    schedule_stops,
+    record_arrival,
     delete_stop
 )
 from App.controllers.user import (
@@ -17,13 +21,17 @@ from App.controllers.street import (
     get_street_by_string,
     create_street
 )
+from App.models.stop import parse_scheduled_date
+from App.utils.pagination import DEFAULT_PAGE_SIZE, parse_page_args, parse_date_arg, page_response
 
 
 stop_views = Blueprint('stop_views', __name__, template_folder='../templates')
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 @stop_views.route('/stops', methods=['GET'])
 def get_stop_page():
-    stops = get_all_stops()
+    stops = get_stops(limit=DEFAULT_PAGE_SIZE)
     return render_template('stops.html', stops=stops)
 
 '''
@@ -32,31 +40,72 @@ API Routes
 
 @stop_views.route('/api/stops', methods=['GET'])
 def get_stops_action():
-    stops = get_all_stops()
-    stops_json = [stop.get_json() for stop in stops] if stops else []
-    return jsonify({'data': stops_json})
+    """
+    Filters: from/to (ISO date or datetime; 'to' is exclusive, a bare date
+    includes that day), driver (id), street and status ('scheduled'/'completed').
+    Pages with ?limit=&after= in schedule order; ?format=ndjson (or
+    Accept: application/x-ndjson) streams every match, one stop per line.
+    """
+    try:
+        driver_id = request.args.get('driver', type=int)
+        if request.args.get('driver') and driver_id is None:
+            raise ValueError("'driver' must be a user id")
+        filters = dict(
+            driver_id=driver_id,
+            street_name=request.args.get('street'),
+            start=parse_date_arg(request.args, 'from'),
+            end=parse_date_arg(request.args, 'to', end=True),
+            status=request.args.get('status')
+        )
+
+        if _wants_ndjson():
+            stops = iter_stops(**filters)
+            first = next(stops, None)  # bad filters fail here, before the 200 is sent
+            return Response(
+                stream_with_context(_ndjson(first, stops)),
+                mimetype=NDJSON_MIMETYPE,
+                headers={'X-Accel-Buffering': 'no'}
+            )
+
+        limit, after = parse_page_args(request.args)
+        stops = get_stops(**filters, limit=limit + 1, after=after)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    return jsonify(page_response([stop.get_json() for stop in stops], limit, key='scheduledDate'))
+
+
+def _wants_ndjson() -> bool:
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def _ndjson(first, stops):
+    if first is None:
+        return
+    yield json.dumps(first.get_json()) + "\n"
+    for stop in stops:
+        yield json.dumps(stop.get_json()) + "\n"
 
 @stop_views.route('/api/stops/<int:id>', methods=['PATCH'])
 @jwt_required()
 def complete_stop_action(id):
-    stop = get_stop_by_id(id)
-    if not stop:
-        return jsonify(message="Stop not found"), 404
-
-    if stop.has_arrived:
-        return jsonify({
-            "message": "Stop successfully marked as arrived",
-            "data": stop.get_json()
-        }), 200
-
-    if not stop.complete():
-        return jsonify(message="Stop was not marked as arrived"), 400
-
-    stop = get_stop_by_id(id)
+    if jwt_current_user.type != 'driver':
+        return jsonify(message="Only drivers can mark arrivals"), 403
+
+    data = record_arrival(id, driver_id=jwt_current_user.id)
+    if data is None:
+        stop = get_stop_by_id(id)
+        if not stop:
+            return jsonify(message="Stop not found"), 404
+        if stop.driver_id != jwt_current_user.id:
+            return jsonify(message="Stop is not scheduled for this driver"), 403
+        return jsonify(message="Stop was already marked as arrived"), 409
 
     return jsonify({
         "message": "Stop successfully marked as arrived",
-        "data": stop.get_json()
+        "data": data
     }), 200
 
 @stop_views.route('/api/stops/<int:id>', methods=['DELETE'])
@@ -74,6 +123,11 @@ def create_stop_action():
     if not street_name or not scheduled_date:
         return jsonify(message="Missing data"), 400
 
+    try:
+        scheduled_date = parse_scheduled_date(scheduled_date)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
     driver = jwt_current_user
     if not driver or driver.type != 'driver':
         return jsonify(message="Only drivers can create stops"), 403
@@ -90,3 +144,34 @@ def create_stop_action():
 
     return jsonify(message="Stop successfully created"), 201
 
+@stop_views.route('/api/stops/bulk', methods=['POST'])
+@jwt_required()
+def schedule_stops_action():
+    """
+    Schedule a list of stops at once: {"stops": [{"streetName": ..., "scheduledDate": ...}, ...]}.
+    Valid items are created together; every item gets a result (created/exists/duplicate/invalid).
+    """
+    driver = jwt_current_user
+    if not driver or driver.type != 'driver':
+        return jsonify(message="Only drivers can create stops"), 403
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify(message="Body must be a JSON object"), 400
+    items = data.get('stops')
+    if not isinstance(items, list) or not items:
+        return jsonify(message="'stops' must be a non-empty list"), 400
+
+    try:
+        results = schedule_stops(driver, items, create_streets=True)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({
+        "message": f"{created} of {len(results)} stops scheduled",
+        "created": created,
+        "data": results
+    }), 201 if created else 200
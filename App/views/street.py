@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify
-from App.controllers.street import get_all_streets_json
+from flask import Blueprint, jsonify, request
+from App.controllers.street import get_all_streets_json, get_nearest_streets, get_streets_within, get_street_by_string
+from App.controllers.stop import get_street_eta
 
 street_views = Blueprint('street_views', __name__, template_folder='../templates')
 
@@ -11,3 +12,40 @@ API Routes
 def get_streets_action():
     streets = get_all_streets_json()
     return jsonify({'data': streets}), 200
+
+@street_views.route('/api/streets/near', methods=['GET'])
+def get_streets_near_action():
+    """
+    Streets near ?lat=&lon=: the nearest ?k= (default 5), or with ?radius= (meters)
+    every street within that distance. Distances are in meters, nearest first.
+    """
+    try:
+        radius = request.args.get('radius', type=float)
+        if request.args.get('radius') and radius is None:
+            raise ValueError("'radius' must be a number of meters")
+        if radius is not None:
+            found = get_streets_within(request.args.get('lat'), request.args.get('lon'), radius)
+        else:
+            k = request.args.get('k', type=int)
+            if request.args.get('k') and k is None:
+                raise ValueError("'k' must be an integer")
+            found = get_nearest_streets(request.args.get('lat'), request.args.get('lon'), k=5 if k is None else k)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    return jsonify({'data': [{'name': name, 'distance': round(distance, 1)} for name, distance in found]}), 200
+
+@street_views.route('/api/streets/<name>/eta', methods=['GET'])
+def get_street_eta_action(name):
+    """
+    When the van is expected on a street today, from the driver's latest ping and remaining route.
+    Memoized per driver until a new ping or a stop change, so polling is cheap.
+    """
+    if not get_street_by_string(name):
+        return jsonify(message="Street not found"), 404
+
+    eta = get_street_eta(name)
+    if eta is None:
+        return jsonify(message="No stop scheduled for this street today"), 404
+
+    return jsonify({'data': eta}), 200
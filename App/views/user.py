@@ -1,15 +1,29 @@
-from flask import Blueprint, render_template, jsonify, request, send_from_directory, flash, redirect, url_for
+import datetime as dt
+import hashlib
+import json
+
+from flask import Blueprint, render_template, jsonify, request, send_from_directory, flash, redirect, url_for, make_response, Response, current_app
 from flask_jwt_extended import jwt_required, current_user as jwt_current_user
 
 from.index import index_views
 
+from App.utils.pagination import parse_page_args, parse_date_arg, page_response, encode_cursor, decode_cursor
+from App.utils.geo import validate_point
+from App.utils.clock import local_today
+from App.controllers.stop import plan_driver_route
+from App.controllers.driver_ping import ingest_pings, get_driver_pings, DEFAULT_REPLAY_LIMIT, MAX_REPLAY_LIMIT
+from App.controllers.notification import get_sync_position
+from App.events import hub
+
 from App.controllers.user import (
     create_user,
     get_all_users,
     get_all_users_json,
     get_all_drivers_json,
     get_user_by_id,
-    get_driver_by_id
+    get_driver_by_id,
+    get_driver_status,
+    update_driver_status
 )
 
 user_views = Blueprint('user_views', __name__, template_folder='../templates')
@@ -48,7 +62,81 @@ def get_user_action(id):
 def get_user_inbox():
     # Get filter from query parameters (e.g., ?filter=requested or ?filter=confirmed or ?filter=all)
     filter_param = request.args.get('filter', None)
-    return jsonify({'data': jwt_current_user.get_inbox_data(filter=filter_param)})
+
+    # Keyset pagination: ?limit=<n>&after=<nextCursor from the previous page>
+    # Incremental sync:  ?since=<syncCursor from the previous response>
+    try:
+        limit, after = parse_page_args(request.args)
+        since = decode_cursor(request.args['since']) if request.args.get('since') else None
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    # Unchanged inboxes are answered from the change version alone
+    etag = _inbox_etag(jwt_current_user)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+
+    sync_cursor = encode_cursor(*get_sync_position(jwt_current_user))
+
+    # Fetch one extra row to know whether another page exists
+    items = jwt_current_user.get_inbox_data(filter=filter_param, limit=limit + 1, after=after, since=since)
+
+    response = jsonify({**page_response(items, limit), 'syncCursor': sync_cursor})
+    response.set_etag(etag)
+    return response
+
+
+@user_views.route('/api/users/inbox/summary', methods=['GET'])
+@jwt_required()
+def get_user_inbox_summary():
+    # Home screen counts (per category and priority) and the newest urgent item in one query
+    etag = _inbox_etag(jwt_current_user)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+
+    response = jsonify({'data': jwt_current_user.get_inbox_summary()})
+    response.set_etag(etag)
+    return response
+
+
+@user_views.route('/api/users/stream', methods=['GET'])
+@jwt_required()
+def get_user_stream():
+    # Server-sent events: new notifications for the user's inbox and driver status changes
+    channels = jwt_current_user.get_stream_channels()
+    keepalive = current_app.config.get('EVENT_STREAM_KEEPALIVE', 15)
+
+    def stream():
+        subscription = hub.subscribe(channels)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = subscription.get(timeout=keepalive)
+                if subscription.overflowed:
+                    # Events were dropped: the client should refetch with ?since=
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def _inbox_etag(user) -> str:
+    """Strong ETag over the user's inbox change version and the exact request"""
+    raw = f"{user.id}|{user.get_inbox_version()}|{request.path}|{request.query_string.decode()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
 
 
 @user_views.route('/api/drivers', methods=['GET'])
@@ -63,13 +151,74 @@ def get_driver_action(id):
         return jsonify(message="Driver not found"), 404
     return jsonify({'data': driver.get_json()})
 
-@user_views.route('/api/drivers/<int:id>/status', methods=['GET'])
-def get_driver_status_action(id):
+@user_views.route('/api/drivers/<int:id>/route', methods=['GET'])
+def get_driver_route_action(id):
+    """
+    Visiting order for the driver's unfinished stops on ?date= (default today in the stops' timezone),
+    optionally starting from ?lat=&lon=
+    """
     driver = get_driver_by_id(id)
     if not driver:
         return jsonify(message="Driver not found"), 404
 
-    status_data = driver.get_status_dict()
+    try:
+        day = dt.date.fromisoformat(request.args['date']) if request.args.get('date') else local_today()
+    except ValueError:
+        return jsonify(message="'date' must be an ISO date (e.g. 2025-09-14)"), 400
+
+    start = None
+    try:
+        if request.args.get('lat') or request.args.get('lon'):
+            start = validate_point(request.args.get('lat'), request.args.get('lon'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    return jsonify({'data': plan_driver_route(driver.id, day, start)}), 200
+
+@user_views.route('/api/drivers/pings', methods=['POST'])
+@jwt_required()
+def post_driver_pings_action():
+    """
+    Batched GPS pings from the signed-in driver's van as NDJSON, one
+    {"ts", "lat", "lon", "speed"} object per line. Bad lines are skipped and reported.
+    """
+    driver = jwt_current_user
+    if not driver or driver.type != 'driver':
+        return jsonify(message="Only drivers can report locations"), 403
+
+    try:
+        result = ingest_pings(request.stream, driver_id=driver.id)
+    except ValueError as e:
+        return jsonify(message=str(e)), 413
+
+    return jsonify(result), 202
+
+@user_views.route('/api/drivers/<int:id>/pings', methods=['GET'])
+@jwt_required()
+def get_driver_pings_action(id):
+    """Replay a driver's track: ?from=&to= (ISO, 'to' exclusive) and ?limit=, oldest first"""
+    driver = get_driver_by_id(id)
+    if not driver:
+        return jsonify(message="Driver not found"), 404
+
+    try:
+        start = parse_date_arg(request.args, 'from')
+        end = parse_date_arg(request.args, 'to', end=True)
+        limit = request.args.get('limit', DEFAULT_REPLAY_LIMIT, type=int)
+        if not limit or not 1 <= limit <= MAX_REPLAY_LIMIT:
+            raise ValueError(f"'limit' must be between 1 and {MAX_REPLAY_LIMIT}")
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    pings = get_driver_pings(driver.id, start, end, limit=limit)
+    return jsonify({'data': [ping.get_json() for ping in pings]}), 200
+
+@user_views.route('/api/drivers/<int:id>/status', methods=['GET'])
+def get_driver_status_action(id):
+    # Served from the in-memory driver state: polling never queries the database
+    status_data = get_driver_status(id)
+    if not status_data:
+        return jsonify(message="Driver not found"), 404
 
     return jsonify({
         "data": status_data,
@@ -79,8 +228,7 @@ def get_driver_status_action(id):
 
 @user_views.route('/api/drivers/<int:id>/status', methods=['PUT'])
 def update_driver_status_action(id):
-    driver = get_driver_by_id(id)
-    if not driver:
+    if not get_driver_status(id):
         return jsonify(message="Driver not found"), 404
 
     data = request.json
@@ -90,11 +238,14 @@ def update_driver_status_action(id):
     if not new_status and not new_location:
         return jsonify(message="No update data provided"), 400
 
-    success = driver.update_status(driver_status=new_status, where=new_location)
-
-    if not success:
+    try:
+        status_data = update_driver_status(id, status=new_status, location=new_location)
+    except ValueError:
         return jsonify(message="Invalid status or location update"), 400
 
+    if not status_data:
+        return jsonify(message="Driver not found"), 404
+
     return jsonify({
         "data": {"message": "Status updated successfully"}
     }), 200
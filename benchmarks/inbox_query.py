@@ -0,0 +1,214 @@
+"""
+Inbox query benchmark: OR-filtered scan (before) vs. UNION ALL of indexed
+top-N branches (after), for a resident and a driver.
+
+Builds a synthetic notifications table in a throwaway SQLite database
+(5M rows by default), prints the query plan of every variant and the median
+latency of the first page and of a deep keyset page.
+
+    python benchmarks/inbox_query.py                  # 5,000,000 rows
+    python benchmarks/inbox_query.py --rows 200000    # quick run
+    python benchmarks/inbox_query.py --db /tmp/inbox.db --keep   # reuse the data set
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, event, or_, text  # noqa: E402
+
+from App.main import create_app  # noqa: E402
+from App.extensions import db  # noqa: E402
+from App.models import Driver, Notification, NotificationReceipt, Resident  # noqa: E402
+from App.models.notification import JSON_COLUMNS, SEARCH_TABLE  # noqa: E402
+from App.models.enums import NotificationType  # noqa: E402
+
+PAGE = 50
+NOW = dt.datetime(2025, 6, 1)
+
+# Share of rows per kind of notification
+MIX = [
+    ('street', NotificationType.SCHEDULE, 0.40),
+    ('street', NotificationType.REQUESTED, 0.20),
+    ('street', NotificationType.CONFIRMED, 0.15),
+    ('street', NotificationType.ARRIVED, 0.10),
+    ('direct', NotificationType.SYSTEM, 0.10),
+    ('global', NotificationType.SYSTEM, 0.05),
+]
+
+
+def populate(rows: int, streets: int, users: int, seed: int = 7) -> None:
+    db.create_all()
+
+    # Search triggers are irrelevant here and would dominate the load time
+    for suffix in ('insert', 'delete', 'update'):
+        db.session.execute(text(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}'))
+
+    street_names = [f'Street {i}' for i in range(streets)]
+    db.session.execute(text('INSERT INTO street (name) VALUES (:name)'), [{'name': n} for n in street_names])
+
+    resident = Resident('bench_resident', 'pass', 'Bench', 'Resident', street_names[0])
+    driver = Driver('bench_driver', 'pass', 'Bench', 'Driver')
+    db.session.add_all([resident, driver])
+    db.session.commit()
+
+    rng = random.Random(seed)
+    kinds = [(kind, t) for kind, t, _ in MIX]
+    weights = [w for _, _, w in MIX]
+    span = 365 * 24 * 3600
+
+    insert = Notification.__table__.insert()
+    chunk = 50_000
+    for start in range(0, rows, chunk):
+        batch = []
+        for _ in range(min(chunk, rows - start)):
+            kind, notification_type = rng.choices(kinds, weights)[0]
+            created_at = NOW - dt.timedelta(seconds=rng.randrange(span))
+            recipient_id = None
+            street_name = None
+            if kind == 'street':
+                street_name = rng.choice(street_names)
+            elif kind == 'direct':
+                recipient_id = rng.choice((resident.id, driver.id)) if rng.random() < 0.01 else rng.randrange(1000, 1000 + users)
+            batch.append({
+                'type': notification_type.value,
+                'category': 'general',
+                'priority': 'normal',
+                'title': 'Bench',
+                'message': 'Synthetic notification',
+                'recipient_id': recipient_id,
+                'street_name': street_name,
+                'is_read': False,
+                'is_global': recipient_id is None,
+                'created_at': created_at,
+                'last_seen_at': created_at,
+                'occurrences': 1,
+            })
+        db.session.execute(insert, batch)
+        db.session.commit()
+        print(f'  inserted {start + len(batch):,} rows', end='\r', flush=True)
+    print()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def or_inbox(user, after=None):
+    """The previous inbox query: one OR'ed filter, ordered and limited as a whole"""
+    if isinstance(user, Driver):
+        visible = Notification.type.in_([NotificationType.REQUESTED.value, NotificationType.CONFIRMED.value])
+    else:
+        visible = user._visibility_filter()
+
+    stmt = (
+        db.select(*JSON_COLUMNS, NotificationReceipt.read_at)
+        .outerjoin(NotificationReceipt, and_(
+            NotificationReceipt.notification_id == Notification.id,
+            NotificationReceipt.user_id == user.id,
+        ))
+        .where(visible, Notification.not_expired())
+    )
+    if after is not None:
+        stmt = stmt.where(db.tuple_(Notification.created_at, Notification.id) < db.tuple_(*after))
+    stmt = stmt.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(PAGE + 1)
+    return db.session.execute(stmt).all()
+
+
+def union_inbox(user, after=None):
+    """The current inbox query (UNION ALL of indexed branches)"""
+    return user.get_inbox_data('all', limit=PAGE + 1, after=after)
+
+
+def capture_sql(fn):
+    """Run fn once and return the last SQL statement (and parameters) it executed"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return captured[-1]
+
+
+def show_plan(label, fn):
+    statement, parameters = capture_sql(fn)
+    print(f'\n--- plan: {label}')
+    with db.engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        if db.engine.dialect.name == 'sqlite':
+            for row in raw.execute(f'EXPLAIN QUERY PLAN {statement}', parameters):
+                print('   ', row[-1])
+        else:
+            cursor = raw.cursor()
+            cursor.execute(f'EXPLAIN {statement}', parameters)
+            for (line,) in cursor.fetchall():
+                print('   ', line)
+
+
+def time_ms(fn, repeat):
+    fn()  # warm the page cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--streets', type=int, default=2_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', default=None, help='SQLite file (default: a temporary file)')
+    parser.add_argument('--keep', action='store_true', help='Keep the database file for later runs')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.gettempdir(), f'inbox-bench-{args.rows}.db')
+    fresh = not os.path.exists(path)
+    create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'TESTING': True})
+
+    try:
+        if fresh:
+            print(f'Populating {path} with {args.rows:,} notifications...')
+            populate(args.rows, args.streets, args.users)
+
+        resident = db.session.execute(db.select(Resident).filter_by(username='bench_resident')).scalar_one()
+        driver = db.session.execute(db.select(Driver).filter_by(username='bench_driver')).scalar_one()
+        deep = (NOW - dt.timedelta(days=200), 0)
+
+        cases = [
+            ('resident', resident, None),
+            ('resident, deep page', resident, deep),
+            ('driver', driver, None),
+            ('driver, deep page', driver, deep),
+        ]
+
+        for label, user, after in cases:
+            show_plan(f'{label} / before (OR)', lambda: or_inbox(user, after))
+            show_plan(f'{label} / after (UNION ALL)', lambda: union_inbox(user, after))
+
+        print(f'\n{"case":<22}{"before ms":>12}{"after ms":>12}')
+        for label, user, after in cases:
+            before = time_ms(lambda: or_inbox(user, after), args.repeat)
+            now = time_ms(lambda: union_inbox(user, after), args.repeat)
+            print(f'{label:<22}{before:>12.2f}{now:>12.2f}')
+    finally:
+        db.session.remove()
+        if not args.keep and not args.db:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
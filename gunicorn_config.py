@@ -8,9 +8,13 @@ bind = "0.0.0.0:8080"
 # The number of worker processes for handling requests.
 workers = 4
 
-# Use the 'gevent' worker type for async performance.
+# Use the 'gevent' worker type for async performance. Its monkey-patching makes the
+# event broker connection (App/events.py, plain sockets) and background threads cooperative.
 worker_class = 'gevent'
 
+# Start each worker's buffer flush jobs (see App/jobs.py); the flask CLI leaves them off.
+raw_env = ['FLASK_BACKGROUND_JOBS=true']
+
 # Log level
 loglevel = 'info'
 
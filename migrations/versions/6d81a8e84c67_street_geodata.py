@@ -0,0 +1,33 @@
+"""Street geodata
+
+Adds a reference point (latitude, longitude) and an optional polyline
+(path) to street for nearest-street lookups.
+
+Revision ID: 6d81a8e84c67
+Revises: ac6c08667739
+Create Date: 2026-10-17 19:34:25.508013
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d81a8e84c67'
+down_revision = 'ac6c08667739'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('street', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('path', sa.JSON(none_as_null=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('street', schema=None) as batch_op:
+        batch_op.drop_column('path')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
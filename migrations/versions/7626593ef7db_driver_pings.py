@@ -0,0 +1,42 @@
+"""Driver pings
+
+Append-only driver_pings table for GPS history, written in bulk by the
+location store, with a (driver_id, recorded_at) index for replay queries.
+
+Revision ID: 7626593ef7db
+Revises: 6d81a8e84c67
+Create Date: 2026-10-17 19:47:42.308323
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7626593ef7db'
+down_revision = '6d81a8e84c67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('driver_pings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('driver_id', sa.Integer(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('speed', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['driver_id'], ['drivers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('driver_pings', schema=None) as batch_op:
+        batch_op.create_index('idx_driver_pings_driver_recorded', ['driver_id', 'recorded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('driver_pings', schema=None) as batch_op:
+        batch_op.drop_index('idx_driver_pings_driver_recorded')
+
+    op.drop_table('driver_pings')
@@ -0,0 +1,29 @@
+"""Driver status clock
+
+Adds drivers.status_updated_at, the last-writer-wins clock the driver
+state cache compares before writing a coalesced status/location.
+
+Revision ID: 92ecf6eb769b
+Revises: 7626593ef7db
+Create Date: 2026-10-17 19:50:46.802753
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '92ecf6eb769b'
+down_revision = '7626593ef7db'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('drivers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('drivers', schema=None) as batch_op:
+        batch_op.drop_column('status_updated_at')
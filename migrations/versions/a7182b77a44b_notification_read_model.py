@@ -0,0 +1,212 @@
+"""Notification receipts, counters, inboxes, outbox, expiry and search
+
+Everything the notification work added on top of the baseline: per-user read
+receipts, maintained unread counters, materialized inbox entries, the
+delivery outbox, expiry and coalescing columns with the branch-shaped
+indexes, and full-text search. Existing data is carried over: direct
+notifications marked read get a receipt for their recipient, counters are
+computed from the rows, and the search index is filled. Who read a shared
+(street or global) notification was never recorded, so those start unread.
+
+Databases created with `flask init` while these tables already existed but
+before migrations did should be stamped with this revision instead of the
+baseline.
+
+Revision ID: a7182b77a44b
+Revises: 9b1a13112c68
+Create Date: 2026-10-17 19:25:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7182b77a44b'
+down_revision = '9b1a13112c68'
+branch_labels = None
+depends_on = None
+
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notifications_fts USING fts5("
+    "title, message, content='notifications', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS notifications_fts_insert AFTER INSERT ON notifications BEGIN "
+    "INSERT INTO notifications_fts(rowid, title, message) VALUES (new.id, new.title, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS notifications_fts_delete AFTER DELETE ON notifications BEGIN "
+    "INSERT INTO notifications_fts(notifications_fts, rowid, title, message) VALUES ('delete', old.id, old.title, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS notifications_fts_update AFTER UPDATE OF title, message ON notifications BEGIN "
+    "INSERT INTO notifications_fts(notifications_fts, rowid, title, message) VALUES ('delete', old.id, old.title, old.message); "
+    "INSERT INTO notifications_fts(rowid, title, message) VALUES (new.id, new.title, new.message); END",
+)
+SQLITE_SEARCH_TRIGGERS = ('notifications_fts_insert', 'notifications_fts_delete', 'notifications_fts_update')
+
+RECIPIENT_ONLY = {
+    'sqlite_where': sa.text('recipient_id IS NOT NULL'),
+    'postgresql_where': sa.text('recipient_id IS NOT NULL'),
+}
+
+
+def _carry_over_reads_and_counts():
+    """Receipts for direct notifications already marked read, then every counter from the rows"""
+    bind = op.get_bind()
+    notifications = sa.table(
+        'notifications',
+        sa.column('id', sa.Integer), sa.column('type', sa.String), sa.column('recipient_id', sa.Integer),
+        sa.column('street_name', sa.String), sa.column('is_read', sa.Boolean),
+        sa.column('created_at', sa.DateTime), sa.column('read_at', sa.DateTime),
+        sa.column('last_seen_at', sa.DateTime),
+    )
+    receipts = sa.table(
+        'notification_receipts',
+        sa.column('user_id', sa.Integer), sa.column('notification_id', sa.Integer), sa.column('read_at', sa.DateTime),
+    )
+    counters = sa.table(
+        'notification_counters',
+        sa.column('scope', sa.String), sa.column('key', sa.String), sa.column('version', sa.Integer),
+        sa.column('total', sa.Integer), sa.column('read', sa.Integer), sa.column('shared_read', sa.Integer),
+    )
+
+    bind.execute(notifications.update().values(last_seen_at=notifications.c.created_at))
+
+    direct = notifications.c.recipient_id.is_not(None)
+    bind.execute(receipts.insert().from_select(
+        ['user_id', 'notification_id', 'read_at'],
+        sa.select(
+            notifications.c.recipient_id,
+            notifications.c.id,
+            sa.func.coalesce(notifications.c.read_at, notifications.c.created_at)
+        ).where(direct, notifications.c.is_read.is_(True))
+    ))
+
+    count = sa.func.count(notifications.c.id)
+    scopes = (
+        # (scope, key, read, where, group by)
+        ('global', sa.literal(''), sa.literal(0), ~direct & notifications.c.street_name.is_(None), None),
+        ('street', notifications.c.street_name, sa.literal(0), ~direct & notifications.c.street_name.is_not(None),
+         notifications.c.street_name),
+        ('type', notifications.c.type, sa.literal(0), sa.true(), notifications.c.type),
+        ('user', sa.cast(notifications.c.recipient_id, sa.String), sa.func.sum(sa.case((notifications.c.is_read.is_(True), 1), else_=0)),
+         direct, notifications.c.recipient_id),
+    )
+    for scope, key, read, where, group_by in scopes:
+        select = sa.select(sa.literal(scope), key, sa.literal(1), count, read, sa.literal(0)).where(where)
+        if group_by is not None:
+            select = select.group_by(group_by)
+        else:
+            select = select.having(count > 0)
+        bind.execute(counters.insert().from_select(['scope', 'key', 'version', 'total', 'read', 'shared_read'], select))
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('notification_counters',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('read', sa.Integer(), nullable=False),
+    sa.Column('shared_read', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'key')
+    )
+    op.add_column('notifications', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.add_column('notifications', sa.Column('coalesce_key', sa.String(length=300), nullable=True))
+    op.add_column('notifications', sa.Column('occurrences', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('notifications', sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+    op.drop_index('idx_notifications_type', table_name='notifications')
+    op.drop_index('idx_notifications_recipient', table_name='notifications')
+    op.drop_index('idx_notifications_street', table_name='notifications')
+    op.create_index('idx_notifications_coalesce', 'notifications', ['coalesce_key'], unique=True)
+    op.create_index('idx_notifications_expires', 'notifications', ['expires_at'], unique=False)
+    op.create_index('idx_notifications_recipient', 'notifications', ['recipient_id', 'is_read'], unique=False, **RECIPIENT_ONLY)
+    op.create_index('idx_notifications_recipient_created', 'notifications', ['recipient_id', 'created_at', 'id', 'expires_at'], unique=False, **RECIPIENT_ONLY)
+    op.create_index('idx_notifications_street', 'notifications', ['street_name', 'created_at', 'id', 'recipient_id', 'expires_at'], unique=False)
+    op.create_index('idx_notifications_type', 'notifications', ['type', 'created_at', 'id', 'expires_at'], unique=False)
+    op.create_index(op.f('ix_residents_street_name'), 'residents', ['street_name'], unique=False)
+    op.create_table('inbox_entries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('is_read', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'notification_id')
+    )
+    op.create_index('idx_inbox_entries_notification', 'inbox_entries', ['notification_id'], unique=False)
+    op.create_index('idx_inbox_entries_user_created', 'inbox_entries', ['user_id', 'created_at', 'notification_id'], unique=False)
+    op.create_table('notification_receipts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('read_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'notification_id')
+    )
+    op.create_index('idx_notification_receipts_notification', 'notification_receipts', ['notification_id'], unique=False)
+    op.create_table('outbox_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=True),
+    sa.Column('channel', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_outbox_messages_due', 'outbox_messages', ['status', 'next_attempt_at', 'id'], unique=False)
+    op.create_index('idx_outbox_messages_notification', 'outbox_messages', ['notification_id'], unique=False)
+    # ### end Alembic commands ###
+
+    _carry_over_reads_and_counts()
+
+    # Full-text search over notifications (created by the model's DDL events under create_all)
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO notifications_fts(notifications_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notifications_search ON notifications "
+            "USING gin ((to_tsvector('english', coalesce(title, '') || ' ' || coalesce(message, ''))))"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in SQLITE_SEARCH_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS notifications_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_notifications_search")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('idx_outbox_messages_notification', table_name='outbox_messages')
+    op.drop_index('idx_outbox_messages_due', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
+    op.drop_index('idx_notification_receipts_notification', table_name='notification_receipts')
+    op.drop_table('notification_receipts')
+    op.drop_index('idx_inbox_entries_user_created', table_name='inbox_entries')
+    op.drop_index('idx_inbox_entries_notification', table_name='inbox_entries')
+    op.drop_table('inbox_entries')
+    op.drop_index(op.f('ix_residents_street_name'), table_name='residents')
+    op.drop_index('idx_notifications_type', table_name='notifications')
+    op.drop_index('idx_notifications_street', table_name='notifications')
+    op.drop_index('idx_notifications_recipient_created', table_name='notifications', **RECIPIENT_ONLY)
+    op.drop_index('idx_notifications_recipient', table_name='notifications', **RECIPIENT_ONLY)
+    op.drop_index('idx_notifications_expires', table_name='notifications')
+    op.drop_index('idx_notifications_coalesce', table_name='notifications')
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.drop_column('last_seen_at')
+        batch_op.drop_column('occurrences')
+        batch_op.drop_column('coalesce_key')
+        batch_op.drop_column('expires_at')
+    op.create_index('idx_notifications_street', 'notifications', ['street_name', 'created_at'], unique=False)
+    op.create_index('idx_notifications_recipient', 'notifications', ['recipient_id', 'is_read'], unique=False)
+    op.create_index('idx_notifications_type', 'notifications', ['type', 'created_at'], unique=False)
+    op.drop_table('notification_counters')
+    # ### end Alembic commands ###
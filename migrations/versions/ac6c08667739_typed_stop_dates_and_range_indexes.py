@@ -0,0 +1,110 @@
+"""Typed stop dates and range indexes
+
+stop.scheduled_date, stop.created_at and stop_request.created_at were ISO
+strings (String(27)); they become DateTime columns. Existing values are
+parsed in Python (date-only values become midnight), so every accepted ISO
+spelling ('2025-09-14', '2025-09-14 07:30', '2025-09-14T07:30:00.123456')
+converts. Every row is checked before any table is altered: if a value does
+not parse, the upgrade stops with the ids of the offending rows and leaves
+the database as it was, so they can be fixed or deleted first. Adds the (driver_id, scheduled_date) and (street_name,
+scheduled_date) indexes used by the /api/stops range filters.
+
+Revision ID: ac6c08667739
+Revises: a7182b77a44b
+Create Date: 2026-10-17 19:26:07.743756
+
+"""
+import datetime as dt
+
+from alembic import op
+from alembic.util import CommandError
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac6c08667739'
+down_revision = 'a7182b77a44b'
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    'stop': ('scheduled_date', 'created_at'),
+    'stop_request': ('created_at',),
+}
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, dt.datetime):
+        return value
+    return dt.datetime.fromisoformat(str(value).strip())
+
+
+def _to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def _converted_rows(table_name, columns, old_type, convert):
+    """Every row's converted values, plus the ids of the rows with a value that does not convert"""
+    old = sa.table(table_name, sa.column('id', sa.Integer), *(sa.column(name, old_type) for name in columns))
+
+    converted, failed = [], []
+    for row in op.get_bind().execute(sa.select(old)).all():
+        try:
+            values = {f'{name}_new': convert(getattr(row, name)) for name in columns}
+        except (TypeError, ValueError):
+            failed.append(row.id)
+            continue
+        converted.append({'row_id': row.id, **values})
+    return converted, failed
+
+
+def _convert_all(old_type, new_type, convert):
+    """Convert every table in COLUMNS, checking all of their rows before altering anything"""
+    converted, failed = {}, {}
+    for table_name, columns in COLUMNS.items():
+        converted[table_name], failed[table_name] = _converted_rows(table_name, columns, old_type, convert)
+
+    failed = {table_name: ids for table_name, ids in failed.items() if ids}
+    if failed:
+        rows = '; '.join(f"{table_name} ids {', '.join(map(str, ids))}" for table_name, ids in failed.items())
+        raise CommandError(
+            f"Cannot convert these rows' dates ({rows}): "
+            "fix or delete them, then run the upgrade again. Nothing was changed."
+        )
+
+    for table_name, columns in COLUMNS.items():
+        _convert(table_name, columns, new_type, converted[table_name])
+
+
+def _convert(table_name, columns, new_type, rows):
+    """Add typed shadow columns, copy the converted values, then swap them in"""
+    with op.batch_alter_table(table_name) as batch:
+        for name in columns:
+            batch.add_column(sa.Column(f'{name}_new', new_type, nullable=True))
+
+    new = sa.table(table_name, sa.column('id', sa.Integer), *(sa.column(f'{name}_new', new_type) for name in columns))
+    if rows:
+        op.get_bind().execute(new.update().where(new.c.id == sa.bindparam('row_id')), rows)
+
+    with op.batch_alter_table(table_name) as batch:
+        for name in columns:
+            batch.drop_column(name)
+            batch.alter_column(f'{name}_new', new_column_name=name, existing_type=new_type, nullable=False)
+
+
+def upgrade():
+    _convert_all(sa.String(length=27), sa.DateTime(), _to_datetime)
+
+    with op.batch_alter_table('stop') as batch:
+        batch.create_index('idx_stop_driver_scheduled', ['driver_id', 'scheduled_date'], unique=False)
+        batch.create_index('idx_stop_street_scheduled', ['street_name', 'scheduled_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stop') as batch:
+        batch.drop_index('idx_stop_street_scheduled')
+        batch.drop_index('idx_stop_driver_scheduled')
+
+    _convert_all(sa.DateTime(), sa.String(length=27), _to_string)
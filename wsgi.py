@@ -7,10 +7,16 @@ warnings.filterwarnings(
     category=UserWarning,
 )
 
+import csv
+import datetime as dt
+import io
+import itertools
+import json
 from typing import Optional, Iterable
 
 import click
 from flask.cli import AppGroup
+from flask_migrate import stamp
 
 from App.utils.auth import whoami
 from App.database import get_migrate
@@ -28,7 +34,10 @@ from App.controllers.initialize import initialize
 from App.controllers.street import (
     get_all_streets_json,
     get_all_streets,
-    get_street_by_string
+    get_street_by_string,
+    get_nearest_streets,
+    get_streets_within,
+    set_street_geodata
 )
 from App.controllers.user import (
     get_all_drivers_json,
@@ -36,10 +45,35 @@ from App.controllers.user import (
     register_user,
     get_driver_by_id
 )
-from App.controllers.notification import create_street_notification, create_system_notification
+from App.controllers.notification import (
+    create_street_notification,
+    create_system_notification,
+    recount_notification_counters,
+    purge_expired_notifications,
+    search_notifications,
+    rebuild_notification_search_index,
+    rebuild_inbox_entries,
+    SearchNotSupported
+)
 from App.models.enums import NotificationCategory, NotificationPriority
-from App.controllers.stop import stop_exists
-from App.controllers.stop_request import delete_stop_requests
+from App.controllers.stop import stop_exists, schedule_stops, plan_driver_route, record_arrival, get_stop_by_id
+from App.models.stop import parse_scheduled_date
+from App.utils.geo import validate_point
+from App.utils.clock import local_today
+from App.controllers.driver_ping import ingest_pings, get_driver_pings, MAX_PINGS_PER_BATCH, DEFAULT_REPLAY_LIMIT, MAX_REPLAY_LIMIT
+from App.location_store import location_store
+from App.utils.pagination import parse_date_arg
+from App.events import EventBroker, parse_address
+from App.jobs import PeriodicJob
+from App.controllers.outbox import get_outbox_summary, requeue_failed_outbox_messages
+from App.outbox import (
+    OutboxWorker,
+    load_transport,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_BACKOFF_BASE,
+)
 
 # --------------------------------------------------------------------------------------
 # App Initialization
@@ -86,6 +120,7 @@ def echo_list(items: Iterable, color: Optional[str] = None) -> None:
 @app.cli.command("init", help="Creates and initializes the database")
 def init():
     initialize()
+    stamp()  # create_all built the current schema: record it as migrated to head
     click.secho("Database initialized.", fg="green")
 
 
@@ -122,12 +157,19 @@ def driver_schedule_stop(driver_id: str, street: str, scheduled_date: str):
         click.secho(f"[ERROR]: Street '{street}' not found.", fg="red")
         return
 
+    try:
+        parse_scheduled_date(scheduled_date)
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
     # Prevent duplicate stop on same date/street
     if stop_exists(street_name=street_obj.name, scheduled_date=scheduled_date):
         click.secho(f"[ERROR]: Failed to schedule stop to '{street_obj.name}'. Already exists.", fg="red")
         return
 
-    new_stop = driver.schedule_stop(street_obj, scheduled_date)
+    # Stop and notification are committed together
+    new_stop = driver.schedule_stop(street_obj, scheduled_date, commit=False)
     if new_stop:
         create_street_notification(
             title="Stop Confirmed",
@@ -140,12 +182,64 @@ def driver_schedule_stop(driver_id: str, street: str, scheduled_date: str):
             category=NotificationCategory.SCHEDULE,
             priority=NotificationPriority.HIGH,
             expires_in_hours=168  # 1 week
-        )
+        )  # commits the stop as well
         click.secho(f"Successfully scheduled a stop to '{street_obj.name}'.", fg="green")
     else:
         click.secho(f"[ERROR]: Failed to schedule a stop to '{street_obj.name}'.", fg="red")
 
 
+@driver_cli.command(
+    "schedule-bulk",
+    help="Schedule many stops from a file: a JSON list of {streetName, scheduledDate} or CSV lines 'street,date'",
+)
+@click.argument("driver_id")
+@click.argument("file", type=click.File("r"))
+def driver_schedule_bulk(driver_id: str, file):
+    """[Driver] Plan a week of stops in one transaction."""
+    driver: Optional[Driver] = resolve_user(driver_id, "driver")
+    if not driver:
+        return
+
+    try:
+        items = read_stop_plan(file)
+        results = schedule_stops(driver, items)
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
+    colors = {"created": "green", "exists": "yellow", "duplicate": "yellow", "invalid": "red"}
+    for result in results:
+        detail = f" (stop {result['stopId']})" if "stopId" in result else f": {result['error']}" if "error" in result else ""
+        click.secho(
+            f"{result['index'] + 1}) {result['streetName']} @ {result['scheduledDate']}: {result['status']}{detail}",
+            fg=colors[result["status"]],
+        )
+
+    created = sum(1 for result in results if result["status"] == "created")
+    click.secho(f"Scheduled {created} of {len(results)} stops.", fg="green" if created else "yellow")
+
+
+def read_stop_plan(file) -> list[dict]:
+    """Parse a schedule-bulk file; raises ValueError when it is neither a JSON list nor CSV"""
+    text = file.read()
+    if text.lstrip().startswith("["):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    items = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not "".join(row).strip():
+            continue
+        if len(row) != 2:
+            raise ValueError(f"Expected 'street,date', got '{','.join(row)}'")
+        if row[0].strip().lower() in ("street", "streetname"):  # header
+            continue
+        items.append({"streetName": row[0].strip(), "scheduledDate": row[1].strip()})
+    return items
+
+
 @driver_cli.command("inbox", help="View driver inbox")
 @click.argument("driver_id")
 @click.option("--filter", "inbox_filter", default="all", help="Filter: 'all', 'requested', 'confirmed'")
@@ -174,32 +268,21 @@ def driver_mark_arrival(driver_id: str, stop_id: str):
     if not driver:
         return
 
-    if driver.mark_arrival(stop_id):
-        # Get the stop to determine the street
-        stop = Stop.query.get(stop_id)
-        if stop and stop.street:
-            create_street_notification(
-                title="Driver Arrived!",
-                message=f"'{driver.get_fullname()}' has arrived at your street.",
-                street=stop.street,
-                notification_type=NotificationType.ARRIVED,
-                category=NotificationCategory.SERVICE,
-                priority=NotificationPriority.URGENT,
-                expires_in_hours=2  # Expires in 2 hours
-            )
-
-        # Remove all stop requests for that street if successful
-        stop: Optional[Stop] = Stop.query.get(stop_id)
-
-        if not stop:
-            click.secho("[ERROR]: Failed to fetch stop.", fg="red")
-            return
-
-        delete_stop_requests(stop.street_name)
+    if not stop_id.isdigit():
+        click.secho(f"[ERROR]: Failed to find stop with id '{stop_id}'.", fg="red")
+        return
 
+    if record_arrival(int(stop_id), driver_id=driver.id):
         click.secho("Arrival recorded and residents notified.", fg="green")
+        return
+
+    stop: Optional[Stop] = get_stop_by_id(stop_id)
+    if not stop:
+        click.secho(f"[ERROR]: Failed to find stop with id '{stop_id}'.", fg="red")
+    elif stop.driver_id != driver.id:
+        click.secho(f"[ERROR]: Stop id '{stop_id}' is not scheduled for driver '{driver.id}'.", fg="red")
     else:
-        click.secho("[ERROR]: Failed to mark arrival for the provided stop id.", fg="red")
+        click.secho(f"[ERROR]: Stop id '{stop_id}' has already been completed.", fg="red")
 
 
 @driver_cli.command("stops", help="View stops for driver")
@@ -215,6 +298,87 @@ def driver_view_stops(driver_id: str):
         click.secho(f"[Created {stop.created_at}]\t{stop.id}) {stop.to_string()}", fg=colour)
 
 
+@driver_cli.command("route", help="Plan the visiting order of a driver's stops for a day")
+@click.argument("driver_id")
+@click.option("--date", "day", default=None, help="ISO date (default: today)")
+@click.option("--lat", type=float, default=None, help="Start latitude (with --lon)")
+@click.option("--lon", type=float, default=None, help="Start longitude (with --lat)")
+def driver_plan_route(driver_id: str, day: Optional[str], lat: Optional[float], lon: Optional[float]):
+    """Unfinished stops for the day in visiting order, with the distance of each leg."""
+    driver: Optional[Driver] = resolve_user(driver_id, "driver")
+    if not driver:
+        return
+
+    try:
+        day = dt.date.fromisoformat(day) if day else local_today()
+    except ValueError:
+        click.secho("[ERROR]: '--date' must be an ISO date (e.g. 2025-09-14)", fg="red")
+        return
+    try:
+        start = validate_point(lat, lon) if lat is not None or lon is not None else None
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
+    plan = plan_driver_route(driver.id, day, start)
+    if not plan["stops"] and not plan["unlocated"]:
+        click.secho(f"No unfinished stops on {plan['date']}.", fg="yellow")
+        return
+
+    for stop in plan["stops"]:
+        click.echo(f"{stop['sequence']:>3}. {stop['streetName']}\t{stop['scheduledDate']}\t+{stop['legDistance']:.0f} m")
+    click.secho(f"Total: {plan['distance'] / 1000:.2f} km", fg="green")
+    for stop in plan["unlocated"]:
+        click.secho(f"  (no coordinates) {stop['streetName']}\t{stop['scheduledDate']}", fg="yellow")
+
+
+@driver_cli.command("import-pings", help="Load GPS pings from an NDJSON file of {driverId, ts, lat, lon, speed} lines")
+@click.argument("file", type=click.File("r"))
+def driver_import_pings(file):
+    """Replay recorded van positions (any drivers) into the location history."""
+    accepted, rejected, arrivals, offset = 0, 0, 0, 0
+    while True:
+        lines = list(itertools.islice(file, MAX_PINGS_PER_BATCH))
+        if not lines:
+            break
+        result = ingest_pings(lines)
+        accepted += result["accepted"]
+        rejected += len(result["rejected"])
+        arrivals += len(result["arrivals"])
+        for item in result["rejected"]:
+            click.secho(f"line {offset + item['line']}: {item['error']}", fg="red")
+        offset += len(lines)
+
+    location_store.flush()
+    click.secho(f"Imported {accepted} pings ({rejected} rejected), {arrivals} arrivals recorded.", fg="green" if accepted else "yellow")
+
+
+@driver_cli.command("pings", help="Replay a driver's recorded GPS track")
+@click.argument("driver_id")
+@click.option("--from", "start", default=None, help="ISO date or datetime")
+@click.option("--to", "end", default=None, help="ISO date or datetime (exclusive; a bare date includes that day)")
+@click.option("--limit", default=DEFAULT_REPLAY_LIMIT, show_default=True, type=click.IntRange(1, MAX_REPLAY_LIMIT))
+def driver_replay_pings(driver_id: str, start: Optional[str], end: Optional[str], limit: int):
+    """Positions oldest first, with speed when the van reported it."""
+    driver: Optional[Driver] = resolve_user(driver_id, "driver")
+    if not driver:
+        return
+
+    try:
+        start = parse_date_arg({"from": start}, "from")
+        end = parse_date_arg({"to": end}, "to", end=True)
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
+    pings = get_driver_pings(driver.id, start, end, limit=limit)
+    if not pings:
+        click.secho("No pings recorded in that range.", fg="yellow")
+    for ping in pings:
+        speed = f"\t{ping.speed:.1f} m/s" if ping.speed is not None else ""
+        click.echo(f"{ping.recorded_at.isoformat(sep=' ', timespec='seconds')}\t{ping.latitude:.6f}, {ping.longitude:.6f}{speed}")
+
+
 @driver_cli.command("update", help="Update driver status")
 @click.argument("driver_id")
 @click.option("--status", help="One of: 'inactive', 'en_route', 'delivering'")
@@ -277,15 +441,8 @@ def resident_request_stop(resident_id: str):
     if not resident:
         return
 
+    # request_stop() already notifies drivers
     if resident.request_stop():
-        create_street_notification(
-            title="Stop Requested",
-            message=f"'{resident.get_fullname()}' has requested a stop for street '{resident.street_name}'.",
-            street=get_street_by_string(resident.street_name),
-            notification_type=NotificationType.REQUESTED,
-            category=NotificationCategory.SERVICE,
-            priority=NotificationPriority.NORMAL
-        )
         click.secho("Request was made.", fg="green")
 
 
@@ -309,6 +466,47 @@ def list_street_command(fmt: str):
         click.secho("[ERROR]: Invalid format. Use 'json' or 'string'.", fg="red")
 
 
+@street_cli.command("locate", help="Set a street's coordinates (WGS84 degrees)", context_settings={"ignore_unknown_options": True})
+@click.argument("street")
+@click.argument("latitude", type=float)
+@click.argument("longitude", type=float)
+def locate_street_command(street: str, latitude: float, longitude: float):
+    """Give a street a reference point for nearest-street lookups."""
+    street_obj: Optional[Street] = get_street_by_string(street)
+    if street_obj is None:
+        click.secho(f"[ERROR]: Street '{street}' not found.", fg="red")
+        return
+
+    try:
+        set_street_geodata(street_obj, latitude, longitude)
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+    click.secho(f"Located '{street_obj.name}' at {latitude}, {longitude}.", fg="green")
+
+
+@street_cli.command("near", help="List streets near a point", context_settings={"ignore_unknown_options": True})
+@click.argument("latitude", type=float)
+@click.argument("longitude", type=float)
+@click.option("--k", "k", default=5, show_default=True, help="How many nearest streets")
+@click.option("--radius", type=float, default=None, help="Instead: every street within this many meters")
+def near_street_command(latitude: float, longitude: float, k: int, radius: Optional[float]):
+    """Nearest streets to a point, nearest first."""
+    try:
+        if radius is not None:
+            found = get_streets_within(latitude, longitude, radius)
+        else:
+            found = get_nearest_streets(latitude, longitude, k=k)
+    except ValueError as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
+    if not found:
+        click.secho("No located streets found.", fg="yellow")
+    for name, distance in found:
+        click.echo(f"{name}\t{distance:.0f} m")
+
+
 app.cli.add_command(street_cli)  # register street group
 
 # --------------------------------------------------------------------------------------
@@ -351,3 +549,173 @@ def auth_register(username: str, password: str, firstname: str, lastname: str, r
 
 
 app.cli.add_command(auth_cli)  # register auth group
+
+# --------------------------------------------------------------------------------------
+# Notification Commands
+# --------------------------------------------------------------------------------------
+
+notification_cli = AppGroup("notifications", help="Notification maintenance commands")
+
+@notification_cli.command("recount", help="Rebuild the maintained unread counters from scratch")
+def notifications_recount():
+    """Recompute per-user, per-street and global notification counters."""
+    rows = recount_notification_counters()
+    click.secho(f"Rebuilt {rows} notification counter(s).", fg="green")
+
+
+@notification_cli.command("purge", help="Delete expired notifications in small batches")
+@click.option("--batch-size", default=500, show_default=True, type=click.IntRange(min=1), help="Notifications deleted per transaction")
+@click.option("--max-batches", default=None, type=click.IntRange(min=1), help="Stop after this many batches")
+@click.option("--pause", default=0.0, show_default=True, type=click.FloatRange(min=0), help="Seconds to sleep between batches")
+@click.option("--every", default=None, type=click.FloatRange(min=1), help="Keep running, purging every this many seconds")
+def notifications_purge(batch_size: int, max_batches: Optional[int], pause: float, every: Optional[float]):
+    """Purge expired notifications without holding the write lock for long."""
+    def purge():
+        deleted = purge_expired_notifications(batch_size=batch_size, max_batches=max_batches, pause_seconds=pause)
+        click.secho(f"Purged {deleted} expired notification(s).", fg="green")
+
+    if every is None:
+        purge()
+        return
+
+    # One dedicated process purges for the whole deployment; Ctrl-C to stop
+    click.echo(f"Purging expired notifications every {every:g}s.")
+    try:
+        PeriodicJob(app, 'notification-purge', every, purge).run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+@notification_cli.command("search", help="Full-text search over notification titles and messages")
+@click.argument("query")
+@click.option("--type", "notification_type", default=None, help="Only this notification type")
+@click.option("--street", default=None, help="Only this street")
+@click.option("--from", "start", default=None, type=click.DateTime(), help="Created on or after")
+@click.option("--to", "end", default=None, type=click.DateTime(), help="Created before")
+@click.option("--limit", default=20, show_default=True, type=click.IntRange(min=1), help="Maximum results")
+def notifications_search(query: str, notification_type: Optional[str], street: Optional[str], start, end, limit: int):
+    """Search notification history, best matches first."""
+    try:
+        results = search_notifications(
+            query,
+            notification_type=notification_type,
+            street_name=street,
+            start=start,
+            end=end,
+            limit=limit
+        )
+    except SearchNotSupported as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+
+    if not results:
+        click.secho("No matching notifications.", fg="yellow")
+        return
+
+    for n in results:
+        click.echo(f"[{n['id']}] {n['createdAt']} {n['type']} {n['streetName'] or '-'}: {n['title']} - {n['message']}")
+
+
+@notification_cli.command("reindex", help="Create (if missing) and rebuild the notification search index")
+def notifications_reindex():
+    """Backfill the full-text index, e.g. for databases created before it existed."""
+    try:
+        rebuild_notification_search_index()
+    except SearchNotSupported as e:
+        click.secho(f"[ERROR]: {e}", fg="red")
+        return
+    click.secho("Notification search index rebuilt.", fg="green")
+
+
+@notification_cli.command("rebuild-inbox", help="Materialize missing inbox entries (for INBOX_FANOUT=write)")
+def notifications_rebuild_inbox():
+    """Fill inbox_entries for every unexpired notification, e.g. after switching to fan-out on write."""
+    written = rebuild_inbox_entries()
+    click.secho(f"Wrote {written} inbox entr{'y' if written == 1 else 'ies'}.", fg="green")
+
+
+app.cli.add_command(notification_cli)  # register notifications group
+
+# --------------------------------------------------------------------------------------
+# Event Commands
+# --------------------------------------------------------------------------------------
+
+events_cli = AppGroup("events", help="Live event commands")
+
+@events_cli.command("broker", help="Run the local event broker that relays live updates between workers")
+@click.option("--address", default=None, help="host:port to listen on (defaults to EVENT_BROKER_URL)")
+def events_broker(address: Optional[str]):
+    """Relay hub events between gunicorn workers (set EVENT_BROKER_URL on the workers)."""
+    address = address or app.config.get("EVENT_BROKER_URL") or "localhost:6390"
+    authkey = str(app.config.get("EVENT_BROKER_AUTHKEY") or app.config["SECRET_KEY"]).encode()
+
+    broker = EventBroker(parse_address(address), authkey)
+    click.secho(f"Event broker listening on {address}.", fg="green")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        broker.close()
+
+
+app.cli.add_command(events_cli)  # register events group
+
+# --------------------------------------------------------------------------------------
+# Outbox Commands
+# --------------------------------------------------------------------------------------
+
+outbox_cli = AppGroup("outbox", help="External delivery (SMS/email/push) outbox commands")
+
+@outbox_cli.command("worker", help="Deliver outbox messages with a pool of sender threads")
+@click.option("--concurrency", default=DEFAULT_CONCURRENCY, show_default=True, type=click.IntRange(min=1), help="Sender threads")
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True, type=click.IntRange(min=1), help="Messages per transport call (per channel)")
+@click.option("--max-attempts", default=DEFAULT_MAX_ATTEMPTS, show_default=True, type=click.IntRange(min=1), help="Attempts before a message is marked failed")
+@click.option("--backoff", default=DEFAULT_BACKOFF_BASE, show_default=True, type=click.FloatRange(min=0), help="Seconds before the first retry (doubles per failure)")
+@click.option("--poll-interval", default=1.0, show_default=True, type=click.FloatRange(min=0.01), help="Seconds to wait when nothing is due")
+@click.option("--once", is_flag=True, help="Run a single round and exit")
+def outbox_worker(concurrency: int, batch_size: int, max_attempts: int, backoff: float, poll_interval: float, once: bool):
+    """Drain the outbox through OUTBOX_TRANSPORT (the offline stub by default)."""
+    worker = OutboxWorker(
+        load_transport(app),
+        concurrency=concurrency,
+        batch_size=batch_size,
+        max_attempts=max_attempts,
+        backoff_base=backoff
+    )
+
+    if once:
+        try:
+            counts = worker.run_once()
+        finally:
+            worker.close()
+        click.secho(
+            f"Delivered {counts['delivered']}, retrying {counts['retried']}, failed {counts['failed']}.",
+            fg="green"
+        )
+        return
+
+    click.secho(f"Outbox worker running with {concurrency} sender(s). Press Ctrl+C to stop.", fg="green")
+    try:
+        worker.run(poll_interval=poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@outbox_cli.command("status", help="Show outbox message counts per channel and status")
+def outbox_status():
+    summary = get_outbox_summary()
+    if not summary:
+        click.secho("Outbox is empty.", fg="yellow")
+        return
+
+    for channel, counts in summary.items():
+        click.echo(f"{channel}: " + ", ".join(f"{status} {count}" for status, count in counts.items()))
+
+
+@outbox_cli.command("requeue", help="Retry messages that exhausted their attempts")
+@click.option("--channel", default=None, help="Only this channel")
+def outbox_requeue(channel: Optional[str]):
+    count = requeue_failed_outbox_messages(channel)
+    click.secho(f"Requeued {count} message(s).", fg="green")
+
+
+app.cli.add_command(outbox_cli)  # register outbox group